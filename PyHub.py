@@ -1,40 +1,501 @@
+import time
+startup_started = time.perf_counter()  # 启动时间线的起点，需在导入其它模块之前记录
+import os
+import re
+import ast
 import sys
 import json
-import subprocess
-import webbrowser
+import keyword
+import builtins
+import mmap
+import array
+import bisect
+import itertools
+import shutil
+import tempfile
+import uuid
+import io
+import heapq
+import hashlib
+import functools
+import threading
+import collections
+import codecs
+import locale
 from PyQt5.QtGui import QIcon, QKeySequence
-from PyQt5.QtGui import QColor
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QColor, QTextCharFormat, QTextCursor
+from PyQt5.QtGui import QFont, QFontMetrics, QPainter, QImage, QPixmap, QDesktopServices, QPalette
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QVBoxLayout, QWidget, QPushButton,
     QTextEdit, QAction, QStatusBar, QTabWidget, QDialog, QLineEdit, QListWidget,
-    QDockWidget, QInputDialog, QLabel, QHBoxLayout, QMessageBox
+    QDockWidget, QInputDialog, QLabel, QHBoxLayout, QMessageBox, QPlainTextEdit,
+    QTreeWidget, QTreeWidgetItem, QAbstractScrollArea, QComboBox, QListWidgetItem, QDialogButtonBox,
+    QListView, QStyle
 )
 from PyQt5.Qsci import QsciScintilla, QsciLexerPython
-from PyQt5.QtCore import Qt, QProcess, QTimer
-import requests 
+from PyQt5.QtCore import (
+    Qt, QObject, QByteArray, QProcess, QProcessEnvironment, QTimer, QThread, QFileSystemWatcher, pyqtSignal,
+    QAbstractListModel, QModelIndex, QSize, QUrl, QEvent
+)
+# requests、webbrowser、multiprocessing等较重的模块在第一次使用时才导入，以加快启动速度
+
+
+# 性能监视器：用心跳定时器测量事件循环的延迟，记录主要槽函数的耗时，卡顿时在状态栏中显示原因，
+# 记录的数据可以导出为Chrome trace-event格式，在chrome://tracing或Perfetto中查看
+class PerformanceMonitor(QObject):
+    active = None  # 正在运行的监视器，关闭时为None，timed装饰器据此决定是否计时
+    HEARTBEAT_INTERVAL = 50  # 心跳间隔（毫秒）
+    STALL_THRESHOLD = 100  # 事件循环延迟超过该值（毫秒）视为卡顿
+    MAX_SPANS = 200000  # 最多保留的记录数，超过后丢弃最早的记录
+
+    def __init__(self, label, parent=None):
+        super().__init__(parent)
+        self.label = label  # 状态栏中的指示器
+        self.spans = collections.deque(maxlen=self.MAX_SPANS)  # (名称, 类别, 开始时间, 结束时间)
+        self.started = time.perf_counter()
+        self.last_beat = None
+        self.max_lag = 0.0  # 最近一次刷新指示器以来的最大延迟（毫秒）
+        self.stall_until = 0.0  # 卡顿提示保持显示到该时间
+
+        self.heartbeat = QTimer(self)
+        self.heartbeat.setTimerType(Qt.PreciseTimer)
+        self.heartbeat.setInterval(self.HEARTBEAT_INTERVAL)
+        self.heartbeat.timeout.connect(self.beat)
+
+        # 指示器每半秒刷新一次，本身不会造成明显的开销
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh_label)
+
+    def start(self):
+        PerformanceMonitor.active = self
+        self.last_beat = time.perf_counter()
+        self.heartbeat.start()
+        self.refresh_timer.start()
+        self.label.setText("Lag: 0 ms")
+        self.label.show()
+
+    def stop(self):
+        PerformanceMonitor.active = None
+        self.heartbeat.stop()
+        self.refresh_timer.stop()
+        self.label.hide()
+
+    def record(self, name, started, finished, category='slot'):
+        self.spans.append((name, category, started, finished))
+
+    # 心跳：实际间隔比定时器间隔长出的部分就是事件循环被阻塞的时间
+    def beat(self):
+        now = time.perf_counter()
+        lag = (now - self.last_beat) * 1000 - self.HEARTBEAT_INTERVAL
+        expected = self.last_beat + self.HEARTBEAT_INTERVAL / 1000
+        self.last_beat = now
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.STALL_THRESHOLD:
+            self.record('event loop stall', expected, now, 'stall')
+            cause = self.stall_cause(expected, now)
+            self.stall_until = now + 3
+            self.label.setStyleSheet("color: #F48771;")
+            self.label.setText(f"Stall: {lag:.0f} ms in {cause}")
+
+    # 找出与卡顿时间段重叠最多的记录，作为卡顿的原因
+    def stall_cause(self, start, end):
+        best, best_overlap = "unknown (not instrumented)", 0.0
+        for name, category, span_start, span_end in reversed(self.spans):
+            if span_end < start - 1:
+                break  # 更早的记录不可能与卡顿重叠
+            overlap = min(end, span_end) - max(start, span_start)
+            if category != 'stall' and overlap > best_overlap:
+                best, best_overlap = name, overlap
+        return best
+
+    def refresh_label(self):
+        if time.perf_counter() < self.stall_until:
+            return  # 卡顿提示保持显示一段时间
+        self.label.setStyleSheet("")
+        self.label.setText(f"Lag: {max(0.0, self.max_lag):.0f} ms")
+        self.max_lag = 0.0
+
+    # 导出为Chrome trace-event格式的JSON
+    def export_trace(self, file_path):
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'GUI thread'}}]
+        for name, category, started, finished in self.spans:
+            events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': 0,
+                'ts': round((started - self.started) * 1e6, 1),
+                'dur': round((finished - started) * 1e6, 1),
+            })
+        atomic_write(file_path, json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}))
+        return len(events) - 1
+
+
+# 计时装饰器：性能监视器开启时记录函数的耗时，关闭时只多一次属性查找
+# 包装后的函数接受任意参数，PyQt不再按槽函数的参数个数丢弃信号多余的参数（例如clicked的checked），
+# 连接这类信号时用lambda只传入需要的参数
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            monitor = PerformanceMonitor.active
+            if monitor is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                monitor.record(name, started, time.perf_counter())
+        return wrapper
+    return decorate
+
+# 读取一个目录下的.gitignore文件，返回规则列表 (所在目录, 正则, 是否取反, 是否只匹配目录)
+def load_gitignore(directory, rel_dir):
+    rules = []
+    try:
+        with open(os.path.join(directory, '.gitignore'), 'r', encoding='utf-8', errors='replace') as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line  # 含有斜杠的规则相对于.gitignore所在目录
+        line = line.lstrip('/')
+        if not line:
+            continue
+        pattern = ''
+        i = 0
+        while i < len(line):
+            if line.startswith('**/', i):
+                pattern += '(?:.*/)?'
+                i += 3
+            elif line.startswith('**', i):
+                pattern += '.*'
+                i += 2
+            elif line[i] == '*':
+                pattern += '[^/]*'
+                i += 1
+            elif line[i] == '?':
+                pattern += '[^/]'
+                i += 1
+            elif line[i] == '[' and ']' in line[i + 1:]:
+                end = line.index(']', i + 1)
+                pattern += '[' + line[i + 1:end].replace('!', '^', 1) + ']'
+                i = end + 1
+            else:
+                pattern += re.escape(line[i])
+                i += 1
+        if not anchored:
+            pattern = '(?:.*/)?' + pattern
+        rules.append((rel_dir, re.compile(pattern + r'\Z'), negate, dir_only))
+    return rules
+
+
+# 判断路径是否被忽略，后面的规则优先
+def is_ignored(rules, rel_path, is_dir):
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + '/'):
+                continue
+            path = rel_path[len(base) + 1:]
+        else:
+            path = rel_path
+        if regex.match(path):
+            ignored = not negate
+    return ignored
+
+
+# 扫描时总是跳过的目录
+ALWAYS_IGNORED = {'.git', '__pycache__'}
+
+
+# 索引中的一个目录：子目录名称和文件信息 {文件名: (大小, 修改时间)}
+class IndexedDirectory:
+    __slots__ = ('dirs', 'files')
+
+    def __init__(self):
+        self.dirs = set()
+        self.files = {}
+
+
+# 后台扫描线程，使用os.scandir遍历目录，结果通过信号交给界面线程合并
+# max_files是本次扫描最多加入的文件数，增量扫描时为全局上限减去索引中其余目录已有的文件数
+class IndexScanThread(QThread):
+    scanned = pyqtSignal(object)
+
+    def __init__(self, index, targets, max_files, parent=None):
+        super().__init__(parent)
+        self.root = index.root
+        self.rules = dict(index.rules)  # 已加载的.gitignore规则的副本
+        self.max_files = max_files
+        self.max_file_bytes = index.max_file_bytes
+        self.targets = targets  # [(相对目录, 是否递归)]
+        self.cancelled = False
+
+    def run(self):
+        directories = {}
+        rules_cache = {}
+        count = 0
+        stack = list(self.targets)
+        while stack and not self.cancelled:
+            rel_dir, recursive = stack.pop()
+            path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            parent_rules = []
+            if rel_dir:
+                parent = rel_dir.rpartition('/')[0]
+                parent_rules = rules_cache.get(parent, self.rules.get(parent, []))  # 继承上级目录的规则
+            rules = parent_rules + load_gitignore(path, rel_dir)
+            rules_cache[rel_dir] = rules
+            entry = IndexedDirectory()
+            try:
+                iterator = os.scandir(path)
+            except OSError:
+                continue
+            with iterator:
+                for dir_entry in iterator:
+                    child = f"{rel_dir}/{dir_entry.name}" if rel_dir else dir_entry.name
+                    try:
+                        is_dir = dir_entry.is_dir(follow_symlinks=False)
+                        if dir_entry.name in ALWAYS_IGNORED or is_ignored(rules, child, is_dir):
+                            continue
+                        if is_dir:
+                            entry.dirs.add(dir_entry.name)
+                            if recursive:
+                                stack.append((child, True))
+                        elif count < self.max_files:  # 超过文件数上限后不再加入索引
+                            stat = dir_entry.stat(follow_symlinks=False)
+                            if stat.st_size > self.max_file_bytes:  # 跳过超过大小上限的文件
+                                continue
+                            entry.files[dir_entry.name] = (stat.st_size, stat.st_mtime)
+                            count += 1
+                    except OSError:
+                        continue
+            directories[rel_dir] = entry
+        self.scanned.emit((directories, rules_cache))
+
+
+# 项目索引服务，在后台线程中建立项目目录树的内存索引，并根据文件系统事件增量更新
+# 文件浏览器、快速打开、项目搜索等功能共享同一个索引
+class ProjectIndex(QObject):
+    indexed = pyqtSignal()  # 完整扫描完成
+    updated = pyqtSignal(list, list, list)  # 增量更新：变化的目录，新增的文件，删除的文件
+    MAX_WATCHED_DIRS = 2000  # 监视的目录数上限，避免超出系统inotify限制
+
+    def __init__(self, max_files=200000, max_file_bytes=100 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.root = None  # 项目根目录
+        self.max_files = max_files  # 索引的文件数上限，对整个索引生效
+        self.max_file_bytes = max_file_bytes  # 单个文件的大小上限（字节），更大的文件不加入索引
+        self.directories = {}  # {相对目录: IndexedDirectory}，根目录为 ''
+        self.rules = {}  # {相对目录: 该目录生效的.gitignore规则}
+        self.ready = False  # 是否已完成首次扫描
+        self.scan_thread = None
+        self.update_threads = []
+        self.pending_updates = set()  # 等待增量扫描的目录
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+
+        # 文件系统事件往往成批到达，合并后再扫描
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.apply_pending_updates)
+
+    # 设置项目根目录并在后台开始扫描
+    def set_root(self, root):
+        root = os.path.abspath(root)
+        if self.scan_thread is not None:
+            self.scan_thread.cancelled = True  # 丢弃上一次未完成的扫描
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.root = root
+        self.directories = {}
+        self.rules = {}
+        self.ready = False
+        self.pending_updates.clear()
+        thread = IndexScanThread(self, [('', True)], self.max_files, self)
+        thread.scanned.connect(lambda result, thread=thread: self.scan_finished(thread, result))
+        thread.finished.connect(thread.deleteLater)
+        self.scan_thread = thread
+        thread.start()
+
+    # 完整扫描结束，在界面线程中替换索引
+    def scan_finished(self, thread, result):
+        if thread is not self.scan_thread or thread.cancelled:
+            return
+        self.scan_thread = None
+        self.directories, self.rules = result
+        self.ready = True
+        self.watch(self.directories)
+        self.indexed.emit()
+
+    # 监视目录，按深度优先监视浅层目录，直到达到上限
+    def watch(self, rel_dirs):
+        available = self.MAX_WATCHED_DIRS - len(self.watcher.directories())
+        if available <= 0:
+            return
+        paths = [self.absolute_path(rel) for rel in sorted(rel_dirs, key=lambda rel: rel.count('/'))]
+        if paths:
+            self.watcher.addPaths(paths[:available])
+
+    def directory_changed(self, path):
+        if self.root is None:
+            return
+        rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+        self.pending_updates.add('' if rel == '.' else rel)
+        self.update_timer.start()
+
+    # 增量扫描变化的目录：只重新列出这些目录本身，新出现的子目录再递归扫描
+    def apply_pending_updates(self):
+        if not self.ready or not self.pending_updates:
+            return
+        targets = [(rel, False) for rel in self.pending_updates]
+        self.pending_updates.clear()
+        # 重新列出的目录原有的文件会被扫描结果替换，不占用剩余的配额
+        replaced = sum(len(self.directories[rel].files) for rel, _ in targets if rel in self.directories)
+        thread = IndexScanThread(self, targets, self.max_files - self.file_count() + replaced, self)
+        thread.scanned.connect(lambda result, thread=thread: self.update_finished(thread, result))
+        thread.finished.connect(thread.deleteLater)
+        self.update_threads.append(thread)
+        thread.start()
 
-# 文件浏览器类，继承自QDockWidget，用户可以通过它浏览当前目录中的Python文件
+    def update_finished(self, thread, result):
+        self.update_threads.remove(thread)
+        if thread.root != self.root:
+            return
+        scanned, rules = result
+        changed_dirs, added, removed = [], [], []
+        new_subdirs = []
+        # 多个增量扫描可能同时进行，各自的配额会重叠，合并时再按全局上限截断新增的文件
+        count = self.file_count()
+        for rel, entry in scanned.items():
+            old = self.directories.get(rel)
+            if old is None and rel and rel.rpartition('/')[0] not in self.directories:
+                continue  # 父目录已被删除
+            old = old or IndexedDirectory()
+            prefix = f"{rel}/" if rel else ''
+            for name in old.dirs - entry.dirs:
+                dropped = self.drop_subtree(prefix + name)
+                count -= len(dropped)
+                removed += dropped
+            new_files = entry.files.keys() - old.files.keys()
+            available = self.max_files - count + len(old.files) - (len(entry.files) - len(new_files))
+            if len(new_files) > available:
+                new_files = sorted(new_files)
+                for name in new_files[max(available, 0):]:
+                    del entry.files[name]
+                new_files = new_files[:max(available, 0)]
+            count += len(entry.files) - len(old.files)
+            added += [prefix + name for name in new_files]
+            removed += [prefix + name for name in old.files.keys() - entry.files.keys()]
+            new_subdirs += [(prefix + name, True) for name in entry.dirs - old.dirs]
+            self.directories[rel] = entry
+            self.rules[rel] = rules[rel]
+            changed_dirs.append(rel)
+        if new_subdirs:
+            # 新目录需要递归扫描，扫描结果会再次进入update_finished
+            for rel, _ in new_subdirs:
+                self.directories.setdefault(rel, IndexedDirectory())
+            thread = IndexScanThread(self, new_subdirs, self.max_files - count, self)
+            thread.scanned.connect(lambda result, thread=thread: self.update_finished(thread, result))
+            thread.finished.connect(thread.deleteLater)
+            self.update_threads.append(thread)
+            thread.start()
+        watched = set(self.watcher.directories())
+        self.watch([rel for rel in scanned if self.absolute_path(rel) not in watched])
+        self.updated.emit(changed_dirs, added, removed)
+
+    # 从索引中删除一个目录及其所有子目录，返回被删除的文件
+    def drop_subtree(self, rel_dir):
+        removed = []
+        for rel in [rel for rel in self.directories if rel == rel_dir or rel.startswith(rel_dir + '/')]:
+            entry = self.directories.pop(rel)
+            self.rules.pop(rel, None)
+            removed += [f"{rel}/{name}" for name in entry.files]
+        return removed
+
+    # 相对路径转换为绝对路径
+    def absolute_path(self, rel_path):
+        return os.path.join(self.root, *rel_path.split('/')) if rel_path else self.root
+
+    # 列出某个目录的子目录和文件，供文件浏览器按需加载
+    def list_directory(self, rel_dir):
+        entry = self.directories.get(rel_dir)
+        if entry is None:
+            return [], []
+        return sorted(entry.dirs, key=str.lower), sorted(entry.files, key=str.lower)
+
+    # 遍历索引中的所有文件，返回 (相对路径, 大小, 修改时间)
+    def files(self):
+        for rel, entry in self.directories.items():
+            prefix = f"{rel}/" if rel else ''
+            for name, (size, mtime) in entry.files.items():
+                yield prefix + name, size, mtime
+
+    # 索引中的文件数
+    def file_count(self):
+        return sum(len(entry.files) for entry in self.directories.values())
+
+
+# 文件浏览器中的一项，目录排在文件前面
+class FileTreeItem(QTreeWidgetItem):
+    def __init__(self, name, rel_path, is_dir):
+        super().__init__([name])
+        self.rel_path = rel_path
+        self.is_dir = is_dir
+        self.loaded = False  # 目录的子项是否已经加载
+        if is_dir:
+            self.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+
+    def __lt__(self, other):
+        return (not self.is_dir, self.text(0).lower()) < (not other.is_dir, other.text(0).lower())
+
+
+# 文件浏览器类，继承自QDockWidget，用户可以通过它浏览当前项目中的文件
 class FileBrowser(QDockWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, project_index=None, directory='.'):
         super().__init__(parent)
         self.setWindowTitle("File Browser")  # 设置窗口标题为 "File Browser"
+        self.setObjectName("FileBrowser")  # 保存和恢复窗口布局时使用
         self.setGeometry(300, 100, 200, 400)  # 设置窗口大小和位置
-        self.current_directory = '.'  # 初始化当前目录为当前路径
+        self.current_directory = directory  # 初始目录，默认为当前路径
+        self.outside_project = False  # 是否正在浏览项目目录以外的目录，此时节点的rel_path为绝对路径
 
-        # 创建显示文件列表的 QListWidget
-        self.file_list_widget = QListWidget()
+        # 项目索引在后台线程中扫描目录，文件浏览器只负责显示
+        self.index = project_index or ProjectIndex(parent=self)
+        self.index.indexed.connect(self.index_ready)
+        self.index.updated.connect(self.index_updated)
+
+        # 创建显示文件树的 QTreeWidget，目录在展开时才加载子项
+        self.file_tree = QTreeWidget()
+        self.file_tree.setHeaderHidden(True)
+        self.file_tree.itemExpanded.connect(self.load_children)
         # 双击文件时，调用open_selected_file方法打开该文件
-        self.file_list_widget.itemDoubleClicked.connect(self.open_selected_file)
+        self.file_tree.itemDoubleClicked.connect(self.open_selected_file)
 
         # 添加一个按钮，允许用户返回上一级目录
         self.up_button = QPushButton("Up", self)
         self.up_button.clicked.connect(self.go_up_directory)
 
-        # 设置布局，将按钮和文件列表添加到布局中
+        # 显示索引状态
+        self.status_label = QLabel()
+
+        # 设置布局，将按钮和文件树添加到布局中
         layout = QVBoxLayout()
         layout.addWidget(self.up_button)
-        layout.addWidget(self.file_list_widget)
+        layout.addWidget(self.file_tree)
+        layout.addWidget(self.status_label)
 
         # 创建一个容器以设置布局
         container = QWidget()
@@ -43,46 +504,593 @@ class FileBrowser(QDockWidget):
 
         self.load_files()  # 加载当前目录下的文件
 
-    # 加载当前目录下的所有.py文件
+    # 在后台开始索引当前目录，完成后再显示文件树
     def load_files(self):
-        import os
-        self.file_list_widget.clear()  # 清空文件列表
-        try:
-            # 遍历当前目录中的文件，只显示.py文件
-            for file in os.listdir(self.current_directory):
-                if file.endswith('.py'):
-                    self.file_list_widget.addItem(file)
-        except Exception as e:
+        self.file_tree.clear()  # 清空文件树
+        self.outside_project = False
+        self.up_button.setEnabled(True)
+        if not os.path.isdir(self.current_directory):
             # 如果加载失败，显示错误信息
-            QMessageBox.critical(self, "Error", f"Failed to load directory:\n{e}")
+            QMessageBox.critical(self, "Error", f"Failed to load directory:\n{self.current_directory}")
+            return
+        self.status_label.setText("Indexing...")
+        if self.index.root != os.path.abspath(self.current_directory):
+            self.index.set_root(self.current_directory)
+        elif self.index.ready:
+            self.index_ready()  # 项目索引已经扫描过该目录
+
+    # 索引完成，显示顶层目录
+    def index_ready(self):
+        if self.outside_project:
+            return
+        self.file_tree.clear()
+        self.populate(self.file_tree.invisibleRootItem(), '')
+        self.status_label.setText(f"{self.index.file_count()} files")
+
+    # 将某个目录的子目录和文件添加到树节点下
+    def populate(self, parent_item, rel_dir):
+        dirs, files = self.index.list_directory(rel_dir)
+        prefix = f"{rel_dir}/" if rel_dir else ''
+        items = [FileTreeItem(name, prefix + name, True) for name in dirs]
+        items += [FileTreeItem(name, prefix + name, False) for name in files]
+        parent_item.addChildren(items)
+        if parent_item is not self.file_tree.invisibleRootItem():
+            parent_item.loaded = True
+
+    # 直接读取磁盘上的目录，将子目录和文件添加到树节点下，用于项目目录以外的目录
+    def populate_from_disk(self, parent_item, directory):
+        items = []
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    if entry.name in ALWAYS_IGNORED:
+                        continue
+                    try:
+                        items.append(FileTreeItem(entry.name, entry.path, entry.is_dir()))
+                    except OSError:
+                        continue
+        except OSError:
+            pass  # 没有权限等原因无法列出的目录显示为空
+        items.sort(key=lambda item: (not item.is_dir, item.text(0).lower()))
+        parent_item.addChildren(items)
+        if parent_item is not self.file_tree.invisibleRootItem():
+            parent_item.loaded = True
+
+    # 展开目录时按需加载子项
+    def load_children(self, item):
+        if item.is_dir and not item.loaded:
+            if self.outside_project:
+                self.populate_from_disk(item, item.rel_path)
+            else:
+                self.populate(item, item.rel_path)
+
+    # 索引增量更新后，刷新已经加载过的目录
+    def index_updated(self, changed_dirs, added, removed):
+        if self.outside_project:
+            return
+        for rel_dir in changed_dirs:
+            parent_item = self.find_loaded_item(rel_dir)
+            if parent_item is None:
+                continue
+            dirs, files = self.index.list_directory(rel_dir)
+            wanted = {(name, True) for name in dirs} | {(name, False) for name in files}
+            existing = {}
+            for i in reversed(range(parent_item.childCount())):
+                child = parent_item.child(i)
+                key = (child.text(0), child.is_dir)
+                if key in wanted:
+                    existing[key] = child
+                else:
+                    parent_item.removeChild(child)  # 已删除的文件或目录
+            prefix = f"{rel_dir}/" if rel_dir else ''
+            parent_item.addChildren([
+                FileTreeItem(name, prefix + name, is_dir) for name, is_dir in wanted - existing.keys()
+            ])
+            parent_item.sortChildren(0, Qt.AscendingOrder)
+        if self.index.ready:
+            self.status_label.setText(f"{self.index.file_count()} files")
+
+    # 找到已加载子项的目录节点，未加载的目录在展开时会读取最新的索引
+    def find_loaded_item(self, rel_dir):
+        item = self.file_tree.invisibleRootItem()
+        if not rel_dir:
+            return item
+        for name in rel_dir.split('/'):
+            for i in range(item.childCount()):
+                child = item.child(i)
+                if child.is_dir and child.text(0) == name:
+                    item = child
+                    break
+            else:
+                return None
+        return item if item.loaded else None
 
-    # 设置浏览器的当前目录
+    # 设置项目目录（打开文件夹、恢复会话），共享的项目索引随之切换到该目录
     def set_directory(self, directory):
         self.current_directory = directory
         self.load_files()  # 加载该目录下的文件
 
     # 打开选中的文件
     def open_selected_file(self, item):
-        file_path = os.path.join(self.current_directory, item.text())  # 获取文件的完整路径
-        self.parent().open_file(file_path)  # 通过父类的open_file方法打开文件
+        if not item.is_dir:
+            # 获取文件的完整路径
+            file_path = item.rel_path if self.outside_project else self.index.absolute_path(item.rel_path)
+            self.parent().open_file(file_path)  # 通过父类的open_file方法打开文件
 
-    # 返回上一级目录
+    # 返回上一级目录：只浏览，不改变项目目录
+    # 快速打开、全局搜索、TODO索引等共享项目索引，浏览上级目录时不能重新扫描，直接从磁盘列出
     def go_up_directory(self):
-        import os
         parent_dir = os.path.dirname(os.path.abspath(self.current_directory))  # 获取上一级目录路径
-        self.set_directory(parent_dir)  # 设置为上一级目录，并重新加载文件列表
+        self.current_directory = parent_dir
+        self.outside_project = True
+        self.file_tree.clear()
+        self.populate_from_disk(self.file_tree.invisibleRootItem(), parent_dir)
+        self.status_label.setText(f"Outside project: {parent_dir}")
+        self.up_button.setEnabled(os.path.dirname(parent_dir) != parent_dir)  # 已到文件系统根目录
+
+
+# 模糊匹配：query中的字符按顺序出现在text中即为匹配（不区分大小写），返回得分，不匹配时返回None
+# 连续匹配的字符和单词开头的字符得分更高，较短的文本略微优先
+def fuzzy_score(query, text):
+    lowered = text.lower()
+    score = 0.0
+    position = 0
+    previous = -2
+    for char in query.lower():
+        found = lowered.find(char, position)
+        if found < 0:
+            return None
+        if found == previous + 1:
+            score += 5  # 与上一个字符连续
+        if found == 0 or not text[found - 1].isalnum() or (text[found].isupper() and text[found - 1].islower()):
+            score += 3  # 单词开头，包括下划线之后和驼峰命名的大写字母
+        score -= (found - position) * 0.1  # 跳过的字符越多得分越低
+        previous = found
+        position = found + 1
+    return score - len(text) * 0.01
+
+
+# 在进程池中执行：按路径长度排序（匹配程度相同时短路径更可能是要找的文件），并为每个字符建立位图
+# 返回 (排序后的路径, {小写字符: 位图})，位图的第i位表示第i个路径包含该字符
+def build_path_bitmaps(paths):
+    paths = sorted(paths, key=lambda path: (len(path), path))
+    lowered = [path.lower() for path in paths]
+    positions = {}
+    for i, path in enumerate(lowered):
+        for char in set(path):
+            positions.setdefault(char, []).append(i)
+    size = len(paths) // 8 + 1
+    bitmaps = {}
+    for char, indices in positions.items():
+        buffer = bytearray(size)
+        for i in indices:
+            buffer[i >> 3] |= 1 << (i & 7)
+        bitmaps[char] = int.from_bytes(buffer, 'little')
+    return paths, lowered, bitmaps
+
+
+BIT_SELECTOR = bytes.maketrans(b'01', b'\x00\x01')  # 把位图的二进制字符串转换为itertools.compress可用的选择序列
+
+
+# 快速打开的路径索引，跟随项目索引增量更新
+# 查询时先把查询中各个字符的位图按位与，得到包含全部字符的候选路径，再从短到长对候选路径做模糊匹配
+class QuickOpenIndex(QObject):
+    built = pyqtSignal(object, object)  # 内部使用：根目录，建立索引的任务
+    MAX_SCORED = 2000  # 每次查询最多计算得分的匹配路径数，保证每次按键的耗时有上限
+    REBUILD_RATIO = 0.2  # 删除的路径超过该比例时重新建立索引
+    REBUILD_ADDED = 1000  # 一次新增的路径超过该数量时重新建立索引
+    BASENAME_BONUS = 10  # 查询能匹配文件名时的加分
+    RECENT_BOOST = 10  # 最近打开的文件的加分，越近打开加分越多
+
+    def __init__(self, project_index, parent=None):
+        super().__init__(parent)
+        self.project_index = project_index
+        self.paths = []  # 相对路径，位置即位图中的位
+        self.lowered = []  # 小写的相对路径，与paths一一对应，匹配时不必忽略大小写
+        self.positions = {}  # {相对路径: 位置}
+        self.bitmaps = {}  # {小写字符: 位图}
+        self.removed = set()  # 已删除的路径的位置，重新建立索引前保留在位图中
+        self.last_search = None  # (小写的查询, 匹配的位置, 已检查到的位置)，索引变化后作废
+        self.ready = False
+        self.building = None  # 正在进行的建立索引任务
+        self.queued = []  # 建立索引期间到达的增量更新
+        self.built.connect(self.build_finished)
+        project_index.indexed.connect(self.rebuild)
+        project_index.updated.connect(self.apply_update)
+
+    # 在进程池中重新建立索引
+    @timed('quick_open.rebuild')
+    def rebuild(self):
+        root = self.project_index.root
+        self.queued = []
+        self.building = get_process_pool().submit(build_path_bitmaps, [rel for rel, _, _ in self.project_index.files()])
+        when_pool_done(self.building, lambda future: self.built.emit(root, future))
+
+    @timed('quick_open.build_finished')
+    def build_finished(self, root, future):
+        if future is not self.building or root != self.project_index.root:
+            return
+        self.building = None
+        try:
+            self.load(future.result())
+        except Exception:
+            return
+        for added, removed in self.queued:
+            self.apply_update([], added, removed)
+        self.queued = []
+
+    # 载入build_path_bitmaps的结果
+    def load(self, result):
+        self.paths, self.lowered, self.bitmaps = result
+        self.positions = {path: i for i, path in enumerate(self.paths)}
+        self.removed = set()
+        self.last_search = None
+        self.ready = True
+
+    # 增量更新：删除的路径只做标记，新增的路径追加到末尾并设置各个字符位图中对应的位
+    @timed('quick_open.apply_update')
+    def apply_update(self, changed_dirs, added, removed):
+        if self.building is not None:
+            self.queued.append((added, removed))
+            return
+        if not self.ready:
+            return
+        if len(added) > self.REBUILD_ADDED:
+            self.rebuild()
+            return
+        self.last_search = None
+        for path in removed:
+            position = self.positions.get(path)
+            if position is not None:
+                self.removed.add(position)
+        for path in added:
+            position = self.positions.get(path)
+            if position is not None:
+                self.removed.discard(position)  # 删除后又恢复的文件
+                continue
+            position = len(self.paths)
+            self.paths.append(path)
+            self.lowered.append(path.lower())
+            self.positions[path] = position
+            bit = 1 << position
+            for char in set(self.lowered[position]):
+                self.bitmaps[char] = self.bitmaps.get(char, 0) | bit
+        if len(self.removed) > len(self.paths) * self.REBUILD_RATIO:
+            self.rebuild()
+
+    # 把最近打开的文件转换为项目内的相对路径，不在项目目录下的文件（包括Windows上位于其它盘符的文件）返回None
+    def relative_path(self, file_path):
+        root = self.project_index.root
+        try:
+            if os.path.commonpath([os.path.abspath(file_path), os.path.abspath(root)]) != os.path.abspath(root):
+                return None
+            return os.path.relpath(file_path, root).replace(os.sep, '/')
+        except ValueError:
+            return None
+
+    # 模糊匹配得分，能匹配文件名时优先，matcher用于在计算得分前判断能否匹配小写的文件名
+    def score(self, query, path, matcher):
+        name = path.rpartition('/')[2]
+        if matcher(name.lower()):
+            return fuzzy_score(query, name) + self.BASENAME_BONUS
+        return fuzzy_score(query, path)
+
+    # 查询匹配的文件，返回得分最高的相对路径，recent为最近打开的文件的绝对路径（最近的在前）
+    def search(self, query, recent, limit=50):
+        boosts = {}
+        for rank, file_path in enumerate(recent):
+            path = self.relative_path(file_path)
+            position = self.positions.get(path)
+            if position is not None and position not in self.removed:
+                boosts[path] = self.RECENT_BOOST * (1 - rank / len(recent))
+        query = query.replace(' ', '')
+        if not query:
+            return list(boosts)[:limit]
+        lowered = query.lower()
+        candidates = None
+        for char in set(lowered):
+            bitmap = self.bitmaps.get(char)
+            if bitmap is None:
+                return []
+            candidates = bitmap if candidates is None else candidates & bitmap
+        # 与代码片段搜索相同，先用正则表达式在C层检查字符是否按顺序出现，只为按顺序包含全部字符的路径计算得分
+        # 匹配预先转换为小写的路径，不使用re.IGNORECASE，匹配速度快约三倍
+        matcher = re.compile(''.join(f"[^{re.escape(char)}]*{re.escape(char)}" for char in lowered)).match
+        scores = {}
+        for path, boost in boosts.items():
+            if matcher(self.lowered[self.positions[path]]):
+                scores[path] = self.score(query, path, matcher) + boost
+        # 继续输入时新查询以上一次的查询开头，能匹配新查询的路径一定能匹配上一次的查询：
+        # 上一次已检查过的范围内只需重新检查上一次匹配的路径，再从上一次停止的位置继续查找
+        matched = []  # 按顺序包含全部字符的路径的位置，从小到大
+        previous, scanned = [], -1
+        if self.last_search is not None and lowered.startswith(self.last_search[0]):
+            previous, scanned = self.last_search[1], self.last_search[2]
+        for position in previous:
+            if matcher(self.lowered[position]):
+                matched.append(position)
+                path = self.paths[position]
+                if path not in scores:
+                    scores[path] = self.score(query, path, matcher)
+                if len(matched) >= self.MAX_SCORED:
+                    scanned = position
+                    break
+        else:
+            # 从最低位开始，即从最短的路径开始按顺序检查候选路径，只有匹配的路径计入上限：
+            # 位图转换为选择序列后用itertools.compress取出候选路径和位置，在C层用matcher过滤，Python循环只处理匹配的路径
+            start = scanned + 1
+            selector = bin(candidates)[:1:-1].encode('ascii').translate(BIT_SELECTOR)[start:]
+            hits = itertools.compress(itertools.compress(itertools.count(start), selector),
+                                      map(matcher, itertools.compress(itertools.islice(self.lowered, start, None), selector)))
+            for position in hits:
+                if position in self.removed:
+                    continue
+                matched.append(position)
+                path = self.paths[position]
+                if path not in scores:
+                    scores[path] = self.score(query, path, matcher)
+                if len(matched) >= self.MAX_SCORED:
+                    break
+            scanned = matched[-1] if len(matched) >= self.MAX_SCORED else len(self.paths)
+        self.last_search = (lowered, matched, scanned)
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+
+# 快速打开面板：输入文件名的一部分，回车打开第一个结果，上下键选择其它结果
+class QuickOpenDialog(QDialog):
+    MAX_RESULTS = 50
+
+    def __init__(self, index, recent_files, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.recent_files = recent_files  # 最近打开的文件，最近的在前
+        self.setWindowTitle("Go to File")
+        self.resize(600, 400)
+
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Type to search files...")
+        self.search_input.textChanged.connect(lambda text: self.update_results())
+        self.search_input.returnPressed.connect(self.open_current)
+        self.results_list = QListWidget(self)
+        self.results_list.itemActivated.connect(self.open_current)
+        self.status_label = QLabel(self)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.search_input)
+        layout.addWidget(self.results_list)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+        self.update_results()
+
+    # 按输入框的内容更新结果列表
+    @timed('quick_open.update_results')
+    def update_results(self):
+        self.results_list.clear()
+        if not self.index.ready:
+            self.status_label.setText("Project is still being indexed...")
+            return
+        started = time.perf_counter()
+        paths = self.index.search(self.search_input.text(), self.recent_files, self.MAX_RESULTS)
+        elapsed = (time.perf_counter() - started) * 1000
+        for path in paths:
+            directory, _, name = path.rpartition('/')
+            item = QListWidgetItem(f"{name}  —  {directory}" if directory else name)
+            item.setData(Qt.UserRole, path)
+            item.setToolTip(path)
+            self.results_list.addItem(item)
+        if self.results_list.count():
+            self.results_list.setCurrentRow(0)
+        self.status_label.setText(f"{len(paths)} matches in {len(self.index.positions)} files ({elapsed:.1f} ms)")
+
+    # 输入框不处理上下键，转交给结果列表移动选择
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            QApplication.sendEvent(self.results_list, event)
+        else:
+            super().keyPressEvent(event)
+
+    # 通过编辑器的open_file打开选中的文件
+    def open_current(self):
+        item = self.results_list.currentItem()
+        if item is None:
+            return
+        self.accept()
+        tab = self.parent().open_file(self.index.project_index.absolute_path(item.data(Qt.UserRole)))
+        if tab is not None:
+            self.parent().tabs.setCurrentWidget(tab)
+            tab.setFocus()
+
+
+# 代码片段中的占位符：${1:默认值}、$1，$0 是展开后光标最终的位置
+SNIPPET_PLACEHOLDER = re.compile(r'\$\{(\d+):([^}]*)\}|\$(\d+)')
+
+
+# 展开代码片段的占位符，返回 (文本, 带默认值的占位符 [(起始, 结束)], 空占位符 [位置], 最终位置)
+# 位置为UTF-8字节偏移量，与QScintilla的位置一致；没有 $0 时最终位置在片段末尾
+def expand_snippet(body):
+    pieces = []
+    length = 0
+    fields = []
+    stops = []
+    final = None
+    last = 0
+    for match in SNIPPET_PLACEHOLDER.finditer(body):
+        literal = body[last:match.start()]
+        pieces.append(literal)
+        length += len(literal.encode('utf-8'))
+        last = match.end()
+        if match.group(1) is not None and match.group(2):
+            default = match.group(2)
+            pieces.append(default)
+            fields.append((length, length + len(default.encode('utf-8'))))
+            length += len(default.encode('utf-8'))
+        elif (match.group(1) or match.group(3)) == '0':
+            final = length
+        else:
+            stops.append(length)
+    literal = body[last:]
+    pieces.append(literal)
+    length += len(literal.encode('utf-8'))
+    return ''.join(pieces), fields, stops, length if final is None else final
+
+
+# 代码片段库：保存在SQLite数据库中，第一次使用时才打开数据库并把全部片段载入内存，
+# 触发词按字母顺序排列，用二分查找做前缀匹配，模糊匹配在内存中逐个计算
+class SnippetStore:
+    DEFAULT_SNIPPETS = [
+        ('hello', "Print Hello, World!", "print('Hello, World!')"),
+        ('fori', "for loop over a range", "for ${1:i} in range(${2:10}):\n    $0"),
+        ('main', "Main guard", "if __name__ == '__main__':\n    ${1:main()}"),
+        ('def', "Function", "def ${1:name}($2):\n    ${3:pass}"),
+        ('cls', "Class", "class ${1:Name}:\n    def __init__(self$2):\n        ${3:pass}"),
+        ('try', "try/except", "try:\n    ${1:pass}\nexcept ${2:Exception} as e:\n    ${3:raise}"),
+    ]
+
+    def __init__(self, path=None):
+        self.path = path  # 数据库文件，默认位于数据目录
+        self.connection = None
+        self.snippets = None  # {触发词: (说明, 内容)}，载入后才有
+        self.triggers = []  # 排好序的触发词
+
+    # 第一次使用时打开数据库，新建的数据库写入默认的代码片段
+    def ensure_loaded(self):
+        if self.snippets is not None:
+            return
+        import sqlite3
+        path = self.path or os.path.join(data_path(), 'snippets.db')
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS snippets "
+                "(name TEXT PRIMARY KEY, description TEXT NOT NULL DEFAULT '', body TEXT NOT NULL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            seeded = self.connection.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            if seeded is None:
+                self.connection.executemany("INSERT OR IGNORE INTO snippets VALUES (?, ?, ?)", self.DEFAULT_SNIPPETS)
+                self.connection.execute("INSERT INTO meta VALUES ('seeded', '1')")
+        rows = self.connection.execute("SELECT name, description, body FROM snippets").fetchall()
+        self.snippets = {name: (description, body) for name, description, body in rows}
+        self.triggers = sorted(self.snippets)
+
+    # 按触发词查找代码片段，返回 (说明, 内容)
+    def get(self, trigger):
+        self.ensure_loaded()
+        return self.snippets.get(trigger)
+
+    # 以prefix开头的触发词
+    def complete(self, prefix, limit=50):
+        self.ensure_loaded()
+        return prefix_matches(self.triggers, prefix, limit)
+
+    # 搜索代码片段：前缀匹配的在前，其余按模糊匹配的得分排序
+    def search(self, query, limit=200):
+        self.ensure_loaded()
+        if not query:
+            return self.triggers[:limit]
+        results = self.complete(query, limit)
+        if len(results) < limit:
+            found = set(results)
+            # 先用正则表达式在C层筛选出按顺序包含全部字符的触发词，只为这些触发词计算得分
+            # 每个字符之前用排除该字符的字符类，匹配时不会回溯
+            pattern = ''.join(f"[^{re.escape(char)}]*{re.escape(char)}" for char in query)
+            matcher = re.compile(pattern, re.IGNORECASE).match
+            scored = []
+            for trigger in filter(matcher, self.triggers):
+                if trigger not in found:
+                    scored.append((-fuzzy_score(query, trigger), trigger))
+            scored.sort()
+            results.extend(trigger for _, trigger in scored[:limit - len(results)])
+        return results
+
+    # 保存代码片段，修改触发词时删除原来的片段
+    def save(self, trigger, description, body, old_trigger=None):
+        self.ensure_loaded()
+        with self.connection:
+            if old_trigger and old_trigger != trigger:
+                self.connection.execute("DELETE FROM snippets WHERE name = ?", (old_trigger,))
+            self.connection.execute("INSERT OR REPLACE INTO snippets VALUES (?, ?, ?)",
+                                    (trigger, description, body))
+        if old_trigger and old_trigger != trigger:
+            self.remove_from_index(old_trigger)
+        if trigger not in self.snippets:
+            bisect.insort(self.triggers, trigger)
+        self.snippets[trigger] = (description, body)
+
+    def delete(self, trigger):
+        self.ensure_loaded()
+        with self.connection:
+            self.connection.execute("DELETE FROM snippets WHERE name = ?", (trigger,))
+        self.remove_from_index(trigger)
+
+    def remove_from_index(self, trigger):
+        if self.snippets.pop(trigger, None) is not None:
+            del self.triggers[bisect.bisect_left(self.triggers, trigger)]
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            self.snippets = None
+
+
+# 代码片段编辑对话框：触发词、说明和多行内容
+class SnippetEditDialog(QDialog):
+    def __init__(self, trigger='', description='', body='', parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Edit Snippet" if trigger else "Add Snippet")
+        self.resize(480, 360)
+        self.trigger_input = QLineEdit(trigger)
+        self.trigger_input.setPlaceholderText("Trigger word, e.g. fori")
+        self.description_input = QLineEdit(description)
+        self.description_input.setPlaceholderText("Description")
+        self.body_input = QPlainTextEdit(body)
+        self.body_input.setPlaceholderText("Snippet text. Use ${1:default} for placeholders and $0 for the final cursor.")
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.validate)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.trigger_input)
+        layout.addWidget(self.description_input)
+        layout.addWidget(self.body_input)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+    # 触发词只能由字母、数字和下划线组成，与编辑器中识别触发词的规则一致
+    def validate(self):
+        if not re.fullmatch(r'\w+', self.trigger_input.text()):
+            QMessageBox.warning(self, "Snippet", "The trigger must be a single word (letters, digits, _).")
+        elif not self.body_input.toPlainText():
+            QMessageBox.warning(self, "Snippet", "The snippet text is empty.")
+        else:
+            self.accept()
+
+    def values(self):
+        return self.trigger_input.text(), self.description_input.text(), self.body_input.toPlainText()
 
 
 # 代码片段管理器类，继承自QDialog，用于管理用户自定义的代码片段
+# 片段保存在SnippetStore中，在编辑器中输入触发词后按Tab键展开
 class SnippetManager(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, store, parent=None):
         super().__init__(parent)
+        self.store = store  # 代码片段库
         self.setWindowTitle("Code Snippets")  # 设置窗口标题
-        self.setGeometry(100, 100, 300, 400)  # 设置窗口大小和位置
+        self.setGeometry(100, 100, 400, 500)  # 设置窗口大小和位置
 
-        # 创建代码片段列表
+        # 搜索框，按触发词模糊匹配
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Search snippets...")
+        self.search_input.textChanged.connect(self.load_snippets)
+
+        # 创建代码片段列表，双击插入到编辑器中
         self.snippets_list = QListWidget(self)
-        self.load_snippets()  # 加载默认的代码片段
+        self.snippets_list.itemActivated.connect(self.insert_snippet)
+        self.load_snippets()  # 加载代码片段
+
+        # 插入片段按钮
+        insert_button = QPushButton("Insert", self)
+        insert_button.clicked.connect(self.insert_snippet)
 
         # 添加片段按钮，点击时调用add_snippet方法
         add_button = QPushButton("Add Snippet", self)
@@ -98,285 +1106,3439 @@ class SnippetManager(QDialog):
 
         # 布局，将按钮和列表添加到布局中
         layout = QVBoxLayout()
+        layout.addWidget(self.search_input)
         layout.addWidget(self.snippets_list)
+        layout.addWidget(insert_button)
         layout.addWidget(add_button)
         layout.addWidget(edit_button)
         layout.addWidget(delete_button)
         self.setLayout(layout)
 
-    # 加载默认的代码片段
+    # 按搜索框的内容加载代码片段
     def load_snippets(self):
-        self.snippets_list.addItems([
-            "print('Hello, World!')",
-            "for i in range(10):",
-            "if __name__ == '__main__':"
-        ])
+        self.snippets_list.clear()
+        for trigger in self.store.search(self.search_input.text()):
+            description, body = self.store.get(trigger)
+            item = QListWidgetItem(f"{trigger}  —  {description}" if description else trigger)
+            item.setData(Qt.UserRole, trigger)
+            item.setToolTip(body)
+            self.snippets_list.addItem(item)
+        if self.snippets_list.count():
+            self.snippets_list.setCurrentRow(0)
+
+    def current_trigger(self):
+        item = self.snippets_list.currentItem()
+        return item.data(Qt.UserRole) if item else None
+
+    # 把选中的代码片段插入到当前编辑器的光标处
+    def insert_snippet(self):
+        trigger = self.current_trigger()
+        editor = self.parent().tabs.currentWidget()
+        if trigger and isinstance(editor, CodeEditor):
+            editor.insert_snippet(self.store.get(trigger)[1])
+            editor.setFocus()
+            self.close()
 
     # 添加新的代码片段
     def add_snippet(self):
-        new_snippet, ok = QInputDialog.getText(self, "Add Snippet", "Snippet:")  # 弹出输入对话框
-        if ok and new_snippet:
-            self.snippets_list.addItem(new_snippet)  # 将新片段添加到列表中
+        dialog = SnippetEditDialog(parent=self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.store.save(*dialog.values())
+            self.load_snippets()
+
+    # 编辑选中的代码片段
+    def edit_snippet(self):
+        trigger = self.current_trigger()
+        if trigger:
+            dialog = SnippetEditDialog(trigger, *self.store.get(trigger), parent=self)
+            if dialog.exec_() == QDialog.Accepted:
+                self.store.save(*dialog.values(), old_trigger=trigger)
+                self.load_snippets()
+
+    # 删除选中的代码片段
+    def delete_snippet(self):
+        trigger = self.current_trigger()
+        if trigger:
+            self.store.delete(trigger)
+            self.load_snippets()
+
+
+# 资源管理器列出的文件类型：扩展名 -> 类别
+RESOURCE_KINDS = {f".{extension}": kind for kind, extensions in (
+    ('Images', 'png jpg jpeg gif bmp ico webp tif tiff ppm svg'),
+    ('Data', 'csv tsv json jsonl xml txt dat parquet feather h5 hdf5 npy npz pkl pickle sqlite db xlsx xls'),
+    ('Config', 'ini cfg toml yaml yml conf env properties qss'),
+    ('Other', 'css js html htm ui qrc ttf otf woff woff2 wav mp3 ogg mp4'),
+) for extension in extensions.split()}
+# 不能在编辑器中打开的资源，双击时交给系统默认程序
+RESOURCE_BINARY = {'.parquet', '.feather', '.h5', '.hdf5', '.npy', '.npz', '.pkl', '.pickle', '.sqlite', '.db',
+                   '.xlsx', '.xls', '.ttf', '.otf', '.woff', '.woff2', '.wav', '.mp3', '.ogg', '.mp4'}
+THUMBNAIL_FORMATS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.tif', '.tiff', '.ppm'}  # Pillow能解码的图片
+
+
+# 在线程池中执行：用Pillow生成图片的缩略图，返回PNG数据
+def make_thumbnail(path, size):
+    from PIL import Image
+    with Image.open(path) as image:
+        image.draft('RGB', (size, size))  # JPEG直接按缩小后的尺寸解码
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+# 缩略图的磁盘缓存，按 路径+修改时间+尺寸 索引，总大小超过上限时删除最久未使用的缩略图
+# 在多个线程中使用，索引由锁保护
+class ThumbnailCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = None  # OrderedDict{文件名: 大小}，按最近使用排序，第一次使用时从目录中读取
+        self.total = 0
+
+    def key(self, path, mtime, size):
+        return hashlib.sha1(f"{path}\0{mtime}\0{size}".encode('utf-8')).hexdigest() + '.png'
+
+    # 按修改时间（即最近使用时间）读取已有的缩略图，调用时需持有锁
+    def load_entries(self):
+        files = []
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        self.entries = collections.OrderedDict((name, size) for _, name, size in files)
+        self.total = sum(self.entries.values())
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        with self.lock:
+            if self.entries is None:
+                self.load_entries()
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)  # 下次启动时按修改时间恢复使用顺序
+        except OSError:
+            return None
+        return data
+
+    # 缩略图随时可以重新生成，写入时不需要atomic_write那样的fsync
+    def put(self, name, data):
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+        with self.lock:
+            if self.entries is None:
+                self.load_entries()
+            self.total += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old_name, old_size = self.entries.popitem(last=False)
+                self.total -= old_size
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except OSError:
+                    pass
+
+
+# 在线程池中生成缩略图，最新的请求最先处理，滚动时已经移出视野的旧请求排在后面并最终被丢弃
+# 滚动期间暂停提交新任务，解码不与界面线程争抢CPU，停止滚动后再生成停留在视野中的缩略图
+class ThumbnailLoader(QObject):
+    loaded = pyqtSignal(object, object)  # 键 (路径, 修改时间)，QImage，无法生成时为None
+    done = pyqtSignal(object, object)  # 内部使用：键，生成任务
+    MAX_QUEUE = 256  # 等待生成的请求数上限
+    HOLD_MS = 150  # 停止滚动后恢复生成的延迟
+
+    def __init__(self, cache, size, workers=4, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.size = size  # 缩略图的边长
+        self.workers = workers
+        self.executor = None
+        self.queue = collections.OrderedDict()  # {键: None}，从末尾取出
+        self.running = set()
+        self.done.connect(self.finish)
+
+        self.hold_timer = QTimer(self)
+        self.hold_timer.setSingleShot(True)
+        self.hold_timer.setInterval(self.HOLD_MS)
+        self.hold_timer.timeout.connect(self.pump)
+
+    # 暂停提交新任务，直到一段时间内没有再调用
+    def hold(self):
+        self.hold_timer.start()
+
+    def request(self, key):
+        if key in self.running:
+            return
+        self.queue[key] = None
+        self.queue.move_to_end(key)
+        while len(self.queue) > self.MAX_QUEUE:
+            self.queue.popitem(last=False)
+        self.pump()
+
+    def pump(self):
+        if self.hold_timer.isActive():
+            return
+        if self.executor is None:
+            import concurrent.futures
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        while self.queue and len(self.running) < self.workers:
+            key, _ = self.queue.popitem()
+            self.running.add(key)
+            future = self.executor.submit(self.load, key)
+            future.add_done_callback(lambda future, key=key: self.done.emit(key, future))
+
+    # 在线程池中执行：先查磁盘缓存，没有时再解码原图
+    def load(self, key):
+        path, mtime = key
+        name = self.cache.key(path, mtime, self.size)
+        data = self.cache.get(name)
+        if data is None:
+            data = make_thumbnail(path, self.size)
+            self.cache.put(name, data)
+        image = QImage()
+        image.loadFromData(data, 'PNG')  # QImage可以在非界面线程中创建，QPixmap不可以
+        return image
+
+    def finish(self, key, future):
+        self.running.discard(key)
+        image = None
+        if not future.cancelled():
+            try:
+                image = future.result()
+            except Exception:
+                pass  # 没有安装Pillow或图片无法解码，保留默认图标
+        self.loaded.emit(key, image)
+        self.pump()
+
+    def shutdown(self):
+        self.queue.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 资源列表的数据模型，只在视图绘制某一行时才请求该行的缩略图，一万个文件也只加载可见的几十个
+class ResourceModel(QAbstractListModel):
+    MEMORY_THUMBNAILS = 2000  # 内存中保留的缩略图数
+
+    def __init__(self, project_index, loader, icon, parent=None):
+        super().__init__(parent)
+        self.project_index = project_index
+        self.loader = loader
+        self.icon = icon  # 缩略图生成之前和其它资源使用的图标
+        self.resources = []  # 按路径排序的全部资源
+        self.info = {}  # {相对路径: (大小, 修改时间, 类别)}
+        self.rows = []  # 通过过滤的资源，按路径排序
+        self.filter_text = ''
+        self.filter_kind = None
+        self.thumbnails = collections.OrderedDict()  # {(路径, 修改时间): QPixmap或None}
+        loader.loaded.connect(self.thumbnail_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        rel = self.rows[index.row()]
+        size, mtime, kind = self.info[rel]
+        if role == Qt.DisplayRole:
+            directory, _, name = rel.rpartition('/')
+            return f"{name}  ({directory})" if directory else name
+        if role == Qt.ToolTipRole:
+            return f"{rel}\n{kind}, {size / 1024:.1f} KB"
+        if role == Qt.DecorationRole:
+            if os.path.splitext(rel)[1].lower() not in THUMBNAIL_FORMATS:
+                return self.icon
+            key = (self.project_index.absolute_path(rel), mtime)
+            if key in self.thumbnails:
+                self.thumbnails.move_to_end(key)
+                return self.thumbnails[key] or self.icon
+            self.loader.request(key)  # 只排队，不等待
+            return self.icon
+        if role == Qt.UserRole:
+            return self.project_index.absolute_path(rel)
+        return None
+
+    def thumbnail_loaded(self, key, image):
+        self.thumbnails[key] = QPixmap.fromImage(image) if image is not None and not image.isNull() else None
+        while len(self.thumbnails) > self.MEMORY_THUMBNAILS:
+            self.thumbnails.popitem(last=False)
+        row = self.row_of(os.path.relpath(key[0], self.project_index.root).replace(os.sep, '/'))
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def row_of(self, rel):
+        row = bisect.bisect_left(self.rows, rel)
+        return row if row < len(self.rows) and self.rows[row] == rel else None
+
+    def accepts(self, rel):
+        return ((self.filter_kind is None or self.info[rel][2] == self.filter_kind)
+                and self.filter_text in rel.lower())
+
+    # 项目索引完成完整扫描，重新列出全部资源
+    def set_files(self, files):
+        self.beginResetModel()
+        self.info = {}
+        for rel, size, mtime in files:
+            kind = RESOURCE_KINDS.get(os.path.splitext(rel)[1].lower())
+            if kind is not None:
+                self.info[rel] = (size, mtime, kind)
+        self.resources = sorted(self.info)
+        self.rows = [rel for rel in self.resources if self.accepts(rel)]
+        self.endResetModel()
+
+    def set_filter(self, text, kind):
+        self.beginResetModel()
+        self.filter_text = text.lower()
+        self.filter_kind = kind
+        self.rows = [rel for rel in self.resources if self.accepts(rel)]
+        self.endResetModel()
+
+    # 项目索引增量更新：逐行插入和删除，保持滚动位置
+    def apply_update(self, changed_dirs, added, removed):
+        for rel in removed:
+            if self.info.pop(rel, None) is None:
+                continue
+            del self.resources[bisect.bisect_left(self.resources, rel)]
+            row = self.row_of(rel)
+            if row is not None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.rows[row]
+                self.endRemoveRows()
+        for rel_dir in changed_dirs:
+            entry = self.project_index.directories.get(rel_dir)
+            if entry is None:
+                continue
+            prefix = f"{rel_dir}/" if rel_dir else ''
+            for name, (size, mtime) in entry.files.items():
+                kind = RESOURCE_KINDS.get(os.path.splitext(name)[1].lower())
+                if kind is None:
+                    continue
+                rel = prefix + name
+                old = self.info.get(rel)
+                self.info[rel] = (size, mtime, kind)
+                if old is None:
+                    bisect.insort(self.resources, rel)
+                    if self.accepts(rel):
+                        row = bisect.bisect_left(self.rows, rel)
+                        self.beginInsertRows(QModelIndex(), row, row)
+                        self.rows.insert(row, rel)
+                        self.endInsertRows()
+                elif old[:2] != (size, mtime):
+                    row = self.row_of(rel)
+                    if row is not None:
+                        self.dataChanged.emit(self.index(row), self.index(row))
+
+
+# 资源管理器类，继承自QDockWidget，列出项目中的图片、数据文件和配置文件等非Python资源
+class ResourceManager(QDockWidget):
+    THUMBNAIL_SIZE = 48
+
+    def __init__(self, project_index, cache_mb=64, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Resource Manager")  # 设置窗口标题
+        self.setObjectName("ResourceManager")  # 保存和恢复窗口布局时使用
+        self.setGeometry(400, 100, 250, 400)  # 设置窗口大小和位置
+        self.project_index = project_index
+
+        # 缩略图在线程池中生成，保存在大小有上限的磁盘缓存中
+        cache = ThumbnailCache(data_path('thumbnails'), cache_mb * 1024 * 1024)
+        workers = max(1, min(4, (os.cpu_count() or 2) - 1))  # 留一个核给界面线程
+        self.loader = ThumbnailLoader(cache, self.THUMBNAIL_SIZE, workers, self)
+        icon = self.style().standardIcon(QStyle.SP_FileIcon)
+        self.model = ResourceModel(project_index, self.loader, icon, self)
+
+        # 过滤输入框和类别选择
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter resources...")
+        self.filter_input.textChanged.connect(self.apply_filter)
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItems(["All", "Images", "Data", "Config", "Other"])
+        self.kind_combo.currentIndexChanged.connect(self.apply_filter)
+
+        # 资源列表，所有行高度相同，视图只为可见的行请求数据
+        self.resource_list = QListView()
+        self.resource_list.setModel(self.model)
+        self.resource_list.setUniformItemSizes(True)
+        self.resource_list.setIconSize(QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        self.resource_list.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.resource_list.activated.connect(self.open_resource)
+        self.resource_list.verticalScrollBar().valueChanged.connect(self.loader.hold)
+        self.status_label = QLabel()
+        self.model.modelReset.connect(self.update_status)
+        self.model.rowsInserted.connect(self.update_status)
+        self.model.rowsRemoved.connect(self.update_status)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.filter_input)
+        filter_layout.addWidget(self.kind_combo)
+        layout = QVBoxLayout()
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.resource_list)
+        layout.addWidget(self.status_label)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)  # 设置资源列表为DockWidget的主部件
+
+        project_index.indexed.connect(self.load_resources)
+        project_index.updated.connect(self.model.apply_update)
+        if project_index.ready:
+            self.load_resources()
+
+    # 从项目索引中加载资源
+    @timed('resource_manager.load_resources')
+    def load_resources(self):
+        self.model.set_files(self.project_index.files())
+
+    def apply_filter(self):
+        kind = self.kind_combo.currentText()
+        self.model.set_filter(self.filter_input.text(), None if kind == "All" else kind)
+
+    def update_status(self):
+        self.status_label.setText(f"{len(self.model.rows)} of {len(self.model.resources)} resources")
+
+    # 文本资源在编辑器中打开，图片等二进制资源交给系统默认程序
+    def open_resource(self, index):
+        path = index.data(Qt.UserRole)
+        extension = os.path.splitext(path)[1].lower()
+        if extension in RESOURCE_BINARY or RESOURCE_KINDS.get(extension) == 'Images':
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+        else:
+            self.parent().open_file(path)
+
+    def shutdown(self):
+        self.loader.shutdown()
+
+
+TODO_PATTERN = re.compile(r'\b(TODO|FIXME|XXX)\b[:(]?\s*(.*)')
+TODO_MAX_SIZE = 2 * 1024 * 1024  # 超过该大小的文件不扫描标记
+TODO_MAX_PER_FILE = 500  # 每个文件最多记录的标记数
+
+
+# 在文本中查找TODO/FIXME/XXX标记，返回 [[行号, 列号, 标记, 说明]]，行号从1开始，列号从0开始
+def find_todos(text):
+    todos = []
+    line_no, last = 1, 0
+    for match in TODO_PATTERN.finditer(text):
+        start = match.start()
+        line_no += text.count('\n', last, start)
+        last = start
+        column = start - text.rfind('\n', 0, start) - 1
+        note = match.group(2).strip().rstrip('*/-> ').strip()  # 去掉块注释和HTML注释的结尾
+        todos.append([line_no, column, match.group(1), note])
+        if len(todos) >= TODO_MAX_PER_FILE:
+            break
+    return todos
+
+
+# 在进程池中执行：扫描一批文件中的标记，返回 [(相对路径, 大小, 修改时间, 内容哈希, 标记列表)]
+# 内容与上次扫描时相同（只有修改时间变化）时标记列表为None，沿用上次的结果
+def scan_todo_files(root, entries):
+    results = []
+    for rel, size, mtime, old_hash in entries:
+        try:
+            with open(os.path.join(root, *rel.split('/')), 'rb') as file:
+                data = file.read(TODO_MAX_SIZE + 1)
+        except OSError:
+            results.append((rel, size, mtime, None, []))
+            continue
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == old_hash:
+            todos = None
+        elif len(data) > TODO_MAX_SIZE or b'\0' in data[:8192]:
+            todos = []  # 二进制文件
+        else:
+            todos = find_todos(data.decode('utf-8', errors='replace'))
+        results.append((rel, size, mtime, digest, todos))
+    return results
+
+
+# 在进程池中执行：读取上次保存的标记索引，文件不存在或属于其它目录时返回空索引
+def load_todo_cache(cache_path, root):
+    try:
+        with open(cache_path, encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('root') == root else {}
+
+
+# 标记索引服务，在进程池中扫描项目文件中的TODO/FIXME/XXX标记
+# 首次扫描从上次保存的索引开始，只重新扫描大小或修改时间变化的文件；之后根据项目索引的增量更新和打开的标签页的编辑更新
+class TodoIndex(QObject):
+    changed = pyqtSignal(object)  # {相对路径: 标记列表}，文件被删除或不再有标记时为空列表
+    reset = pyqtSignal()  # 项目根目录变化，之前的标记全部作废
+    progress = pyqtSignal(int)  # 剩余的扫描批数
+    loaded = pyqtSignal(object, object)  # 内部使用：根目录，读取索引的任务
+    batch_done = pyqtSignal(object, object)  # 内部使用：根目录，扫描任务
+    BATCH_FILES = 256  # 每批扫描的文件数
+    LIVE_DELAY = 500  # 停止输入后重新查找标记的延迟（毫秒）
+
+    def __init__(self, project_index, parent=None):
+        super().__init__(parent)
+        self.project_index = project_index
+        self.root = None
+        self.entries = {}  # {相对路径: [大小, 修改时间, 内容哈希, 标记列表]}
+        self.live = {}  # {编辑器: (相对路径, 标记列表)}，标签页中尚未保存的内容优先于文件中的内容
+        self.ready = False  # 上次保存的索引是否已读取
+        self.dirty = False  # 是否有尚未保存的变化
+        self.futures = []
+        self.pending = set()  # 等待重新查找标记的编辑器
+        self.loaded.connect(self.cache_loaded)
+        self.batch_done.connect(self.collect_batch)
+        project_index.indexed.connect(self.index_ready)
+        project_index.updated.connect(self.index_updated)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.LIVE_DELAY)
+        self.timer.timeout.connect(self.scan_pending)
+
+    # 保存索引的文件，每个项目根目录一个
+    def cache_path(self):
+        name = hashlib.sha1(self.root.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(data_path('todos'), f"{name}.json")
+
+    # 项目索引完成完整扫描，根目录变化时先在后台读取该目录上次保存的索引
+    def index_ready(self):
+        root = self.project_index.root
+        if root == self.root:
+            if self.ready:
+                self.reconcile(self.project_index.files())
+            return
+        self.save()
+        self.cancel()
+        self.root = root
+        self.entries = {}
+        self.ready = False
+        self.reset.emit()
+        future = get_process_pool().submit(load_todo_cache, self.cache_path(), root)
+        when_pool_done(future, lambda future, root=root: self.loaded.emit(root, future))
+
+    @timed('todo_index.cache_loaded')
+    def cache_loaded(self, root, future):
+        if root != self.root or future.cancelled():
+            return
+        try:
+            self.entries = future.result()
+        except Exception:
+            self.entries = {}
+        self.ready = True
+        self.changed.emit({rel: entry[3] for rel, entry in self.entries.items() if entry[3]})
+        self.reconcile(self.project_index.files())
+
+    # 对比索引中的文件和项目中的文件，删除已不存在的文件，扫描新增和修改过的文件
+    @timed('todo_index.reconcile')
+    def reconcile(self, files, complete=True):
+        seen = set()
+        stale = []
+        for rel, size, mtime in files:
+            seen.add(rel)
+            entry = self.entries.get(rel)
+            if entry is None or entry[0] != size or entry[1] != mtime:
+                stale.append((rel, size, mtime, entry[2] if entry else None))
+        if complete:
+            self.drop([rel for rel in self.entries if rel not in seen])
+        self.scan(stale)
+
+    # 项目索引增量更新：删除的文件由项目索引给出，只比较变化的目录中的文件
+    def index_updated(self, changed_dirs, added, removed):
+        if not self.ready:
+            return  # 读取完上次的索引后会完整比较一次
+        self.drop(removed)
+        files = []
+        for rel_dir in changed_dirs:
+            entry = self.project_index.directories.get(rel_dir)
+            if entry is None:
+                continue
+            prefix = f"{rel_dir}/" if rel_dir else ''
+            files += [(prefix + name, size, mtime) for name, (size, mtime) in entry.files.items()]
+        self.reconcile(files, complete=False)
+
+    def drop(self, removed):
+        changes = {}
+        for rel in removed:
+            entry = self.entries.pop(rel, None)
+            if entry is not None and entry[3]:
+                changes[rel] = []
+        if removed:
+            self.dirty = True
+        if changes:
+            self.changed.emit(changes)
+
+    # 分批提交扫描任务，过大的文件直接记录为没有标记
+    def scan(self, stale):
+        pool = None
+        batch = []
+        for rel, size, mtime, old_hash in stale:
+            if size > TODO_MAX_SIZE:
+                self.store(rel, [size, mtime, None, []])
+                continue
+            batch.append((rel, size, mtime, old_hash))
+            if len(batch) >= self.BATCH_FILES:
+                pool = pool or get_process_pool()
+                self.submit(pool, batch)
+                batch = []
+        if batch:
+            self.submit(pool or get_process_pool(), batch)
+        self.progress.emit(len(self.futures))
+
+    def submit(self, pool, batch):
+        future = pool.submit(scan_todo_files, self.root, batch)
+        when_pool_done(future, lambda future, root=self.root: self.batch_done.emit(root, future))
+        self.futures.append(future)
+
+    # 合并一批扫描结果，只通知标记真正变化的文件
+    @timed('todo_index.collect_batch')
+    def collect_batch(self, root, future):
+        if future in self.futures:
+            self.futures.remove(future)
+        if root != self.root or future.cancelled():
+            return
+        try:
+            results = future.result()
+        except Exception:
+            results = []
+        changes = {}
+        for rel, size, mtime, digest, todos in results:
+            if todos is None:
+                todos = self.entries[rel][3] if rel in self.entries else []
+            if self.store(rel, [size, mtime, digest, todos]):
+                changes[rel] = self.todos(rel)
+        self.progress.emit(len(self.futures))
+        if changes:
+            self.changed.emit(changes)
+
+    # 更新一个文件的记录，返回标记是否变化
+    def store(self, rel, entry):
+        old = self.entries.get(rel)
+        self.entries[rel] = entry
+        self.dirty = True
+        return (old[3] if old else []) != entry[3]
+
+    # 文件当前的标记，打开的标签页中有未保存的修改时使用标签页中的内容
+    def todos(self, rel):
+        for live_rel, todos in self.live.values():
+            if live_rel == rel:
+                return todos
+        entry = self.entries.get(rel)
+        return entry[3] if entry else []
+
+    # 所有有标记的文件：{相对路径: 标记列表}
+    def all_todos(self):
+        result = {rel: entry[3] for rel, entry in self.entries.items() if entry[3]}
+        for rel, todos in self.live.values():
+            if todos:
+                result[rel] = todos
+            else:
+                result.pop(rel, None)
+        return result
+
+    # 编辑器内容变化后安排重新查找标记
+    def schedule(self, editor):
+        self.pending.add(editor)
+        self.timer.start()
+
+    def forget(self, editor):
+        self.pending.discard(editor)
+        entry = self.live.pop(editor, None)
+        if entry is not None:
+            self.changed.emit({entry[0]: self.todos(entry[0])})
+
+    # 在打开的标签页中查找标记，内容与已保存的文件相同时改回使用文件的扫描结果
+    @timed('todo_index.scan_pending')
+    def scan_pending(self):
+        changes = {}
+        for editor in list(self.pending):
+            self.pending.discard(editor)
+            rel = self.relative_path(editor.file_path)
+            if rel is None:
+                continue
+            text = editor.text()
+            if content_hash(text) == editor.saved_hash:
+                if self.live.pop(editor, None) is None:
+                    continue
+            else:
+                todos = find_todos(text)
+                old = self.live.get(editor)
+                if old is not None and old[1] == todos:
+                    continue
+                self.live[editor] = (rel, todos)
+            changes[rel] = self.todos(rel)
+        if changes:
+            self.changed.emit(changes)
+
+    # 编辑器保存了文件，目录监视不报告文件内容的变化，由编辑器通知后重新扫描该文件
+    def file_saved(self, file_path):
+        rel = self.relative_path(file_path)
+        if rel is None or not self.ready:
+            return
+        for editor, (live_rel, _) in list(self.live.items()):
+            if live_rel == rel:
+                del self.live[editor]  # 保存后标签页与文件内容相同
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        self.reconcile([(rel, stat.st_size, stat.st_mtime)], complete=False)
+
+    # 项目中的文件的相对路径，不在项目中的文件（包括Windows上位于其它盘符的文件）返回None
+    def relative_path(self, file_path):
+        if not file_path or self.root is None:
+            return None
+        try:
+            rel = os.path.relpath(file_path, self.root)
+        except ValueError:  # Windows上文件与项目位于不同盘符
+            return None
+        if rel.startswith('..') or os.path.isabs(rel):
+            return None
+        return rel.replace(os.sep, '/')
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    # 保存索引，下次打开同一个目录时只需扫描变化的文件
+    def save(self):
+        if self.root is None or not self.ready or not self.dirty:
+            return
+        try:
+            atomic_write(self.cache_path(), json.dumps({'root': self.root, 'files': self.entries}))
+            self.dirty = False
+        except OSError:
+            pass
+
+    def shutdown(self):
+        self.cancel()
+        self.save()
+
+
+# 任务管理器类，继承自QDockWidget，显示项目中的TODO/FIXME/XXX标记和手动添加的任务
+class TaskManager(QDockWidget):
+    def __init__(self, todo_index, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Task Manager")  # 设置窗口标题
+        self.setObjectName("TaskManager")  # 保存和恢复窗口布局时使用
+        self.setGeometry(600, 100, 300, 400)  # 设置窗口大小和位置
+        self.todo_index = todo_index
+        self.file_items = {}  # {相对路径: 文件项}
+        self.sorted_files = []  # 按路径排序的文件，用于确定新文件项的插入位置
+
+        # 任务列表，第一项为手动添加的任务，其后按文件分组显示标记，双击或单击标记跳转到对应的行
+        self.task_list = QTreeWidget()
+        self.task_list.setHeaderHidden(True)
+        self.task_list.itemActivated.connect(self.open_task)
+        self.task_list.itemClicked.connect(self.open_task)
+        self.manual_item = QTreeWidgetItem(["My Tasks"])
+        self.task_list.addTopLevelItem(self.manual_item)
+        self.manual_item.setHidden(True)
+        self.status_label = QLabel()
+        self.add_task_button = QPushButton("Add Task", self)  # 添加任务按钮
+        self.add_task_button.clicked.connect(self.add_task)  # 按钮点击时，添加任务
+        # 刷新按钮，重新索引项目目录，发现在编辑器之外修改过的文件
+        self.refresh_button = QPushButton("Refresh", self)
+        self.refresh_button.clicked.connect(self.refresh)
+
+        # 设置布局，将任务列表和按钮放入布局
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.add_task_button)
+        buttons_layout.addWidget(self.refresh_button)
+        layout = QVBoxLayout()
+        layout.addWidget(self.task_list)
+        layout.addWidget(self.status_label)
+        layout.addLayout(buttons_layout)
+
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        todo_index.changed.connect(self.apply_changes)
+        todo_index.reset.connect(self.clear_files)
+        todo_index.progress.connect(self.update_status)
+        self.apply_changes(todo_index.all_todos())
+        self.update_status(len(todo_index.futures))
+
+    # 添加任务
+    def add_task(self):
+        task_text, ok = QInputDialog.getText(self, "New Task", "Task description:")  # 弹出输入框
+        if ok and task_text:
+            QTreeWidgetItem(self.manual_item, [task_text])  # 将任务添加到任务列表中
+            self.manual_item.setHidden(False)
+            self.manual_item.setExpanded(True)
+
+    # 只替换标记变化的文件项
+    @timed('task_manager.apply_changes')
+    def apply_changes(self, changes):
+        for rel, todos in changes.items():
+            item = self.file_items.pop(rel, None)
+            if item is not None:
+                index = bisect.bisect_left(self.sorted_files, rel)
+                del self.sorted_files[index]
+                self.task_list.takeTopLevelItem(index + 1)
+            if not todos:
+                continue
+            path = self.todo_index.project_index.absolute_path(rel)
+            item = QTreeWidgetItem([f"{rel} ({len(todos)})"])
+            for line_no, column, tag, note in todos:
+                child = QTreeWidgetItem(item, [f"{line_no}: {tag} {note}".rstrip()])
+                child.setData(0, Qt.UserRole, (path, line_no, column))
+            index = bisect.bisect_left(self.sorted_files, rel)
+            self.sorted_files.insert(index, rel)
+            self.task_list.insertTopLevelItem(index + 1, item)  # 第0项为手动添加的任务
+            self.file_items[rel] = item
+        self.update_status(len(self.todo_index.futures))
+
+    def refresh(self):
+        index = self.todo_index.project_index
+        if index.root is not None and index.ready:
+            index.set_root(index.root)  # 完整扫描后只重新扫描修改时间变化的文件
+
+    def clear_files(self):
+        for _ in self.sorted_files:
+            self.task_list.takeTopLevelItem(1)
+        self.file_items.clear()
+        self.sorted_files = []
+
+    def update_status(self, pending):
+        count = sum(item.childCount() for item in self.file_items.values())
+        text = f"{count} markers in {len(self.file_items)} files"
+        self.status_label.setText(f"{text} (scanning, {pending} batches left...)" if pending else text)
+
+    # 打开标记所在的文件并跳转到对应的行，文件项和手动添加的任务没有位置
+    def open_task(self, item):
+        location = item.data(0, Qt.UserRole)
+        if location is not None:
+            self.parent().open_file_at(*location)
+
+
+# 查找替换对话框，继承自QDialog，允许用户查找和替换代码中的文本
+class FindReplaceDialog(QDialog):
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor  # 保存传入的编辑器实例，QsciScintilla
+        self.setWindowTitle("Find and Replace")  # 设置窗口标题
+        self.setGeometry(300, 300, 400, 150)  # 设置窗口大小和位置
+
+        # 创建查找和替换输入框
+        find_label = QLabel("Find:")
+        self.find_input = QLineEdit()
+        replace_label = QLabel("Replace:")
+        self.replace_input = QLineEdit()
+
+        # 匹配大小写按钮
+        self.case_checkbox = QPushButton("Match Case")
+        self.case_checkbox.setCheckable(True)  # 使按钮可切换
+
+        # 全词匹配和正则表达式按钮
+        self.word_checkbox = QPushButton("Whole Word")
+        self.word_checkbox.setCheckable(True)
+        self.regex_checkbox = QPushButton("Regex")
+        self.regex_checkbox.setCheckable(True)
+
+        # 查找、替换和全部替换按钮
+        find_button = QPushButton("Find")
+        find_button.clicked.connect(lambda: self.find_text())
+        replace_button = QPushButton("Replace")
+        replace_button.clicked.connect(lambda: self.replace_text())
+        replace_all_button = QPushButton("Replace All")
+        replace_all_button.clicked.connect(lambda: self.replace_all_text())
+
+        # 设置布局
+        layout = QVBoxLayout()
+
+        # 查找输入框布局
+        find_layout = QHBoxLayout()
+        find_layout.addWidget(find_label)
+        find_layout.addWidget(self.find_input)
+        layout.addLayout(find_layout)
+
+        # 替换输入框布局
+        replace_layout = QHBoxLayout()
+        replace_layout.addWidget(replace_label)
+        replace_layout.addWidget(self.replace_input)
+        layout.addLayout(replace_layout)
+
+        # 选项布局
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(self.case_checkbox)
+        options_layout.addWidget(self.word_checkbox)
+        options_layout.addWidget(self.regex_checkbox)
+        layout.addLayout(options_layout)
+
+        # 按钮布局
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(find_button)
+        buttons_layout.addWidget(replace_button)
+        buttons_layout.addWidget(replace_all_button)
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+
+    # 根据当前选项创建替换引擎，正则表达式无效时提示并返回None
+    def create_engine(self):
+        try:
+            return ReplaceEngine(
+                self.find_input.text(),
+                self.replace_input.text(),
+                regex=self.regex_checkbox.isChecked(),
+                whole_word=self.word_checkbox.isChecked(),
+                match_case=self.case_checkbox.isChecked()
+            )
+        except re.error as e:
+            QMessageBox.warning(self, "Find", f"Invalid regular expression:\n{e}")
+            return None
+
+    # 当前选中范围在编辑器文本中的字符位置，QScintilla 的位置以UTF-8字节计算
+    def selection_span(self):
+        start = self.editor.SendScintilla(QsciScintilla.SCI_GETSELECTIONSTART)
+        end = self.editor.SendScintilla(QsciScintilla.SCI_GETSELECTIONEND)
+        first = self.editor.SendScintilla(QsciScintilla.SCI_COUNTCHARACTERS, 0, start)
+        return first, first + self.editor.SendScintilla(QsciScintilla.SCI_COUNTCHARACTERS, start, end)
+
+    # 查找文本：与替换、全部替换使用同一个编译后的正则表达式，从选中内容的末尾开始查找，到达末尾后从头开始
+    @timed('find_text')
+    def find_text(self):
+        find_str = self.find_input.text()  # 获取查找文本
+        if not find_str:
+            return
+        engine = self.create_engine()
+        if engine is None:
+            return
+
+        text = self.editor.text()
+        position = self.selection_span()[1]
+        match = engine.pattern.search(text, position)
+        if match is not None and match.end() == position:
+            match = engine.pattern.search(text, position + 1)  # 光标处的空匹配，跳过一个字符继续查找
+        if match is None:
+            match = engine.pattern.search(text)
+        if match is None:
+            QMessageBox.information(self, "Find", f"'{find_str}' not found.")  # 未找到时提示
+            return
+
+        # 选中匹配的范围
+        start = len(text[:match.start()].encode('utf-8'))
+        end = start + len(match.group().encode('utf-8'))
+        self.editor.ensureLineVisible(self.editor.lineIndexFromPosition(start)[0])
+        self.editor.SendScintilla(QsciScintilla.SCI_SETSEL, start, end)
+
+    # 替换文本
+    @timed('replace_text')
+    def replace_text(self):
+        if not self.find_input.text():
+            return
+        engine = self.create_engine()
+        if engine is None:
+            return
+
+        # 当前选中的范围恰好是一个匹配时进行替换，在整个文本中匹配，使前后断言和查找时一致
+        start, end = self.selection_span()
+        match = engine.pattern.match(self.editor.text(), start)
+        if match and match.end() == end:
+            self.editor.replaceSelectedText(engine.replacement(match))
+
+        # 查找下一个匹配项
+        self.find_text()
+
+    # 替换所有匹配的文本：一次扫描算出全部替换结果，预览确认后作为一次编辑应用
+    @timed('replace_all_text')
+    def replace_all_text(self):
+        if not self.find_input.text():
+            return
+        engine = self.create_engine()
+        if engine is None:
+            return
+
+        text = self.editor.text()
+        result = engine.run(text)
+        if not result.count:
+            QMessageBox.information(self, "Replace All", "No occurrences found.")
+            return
+
+        # 显示替换预览
+        preview = ReplacePreviewDialog(result, self)
+        if preview.exec_() != QDialog.Accepted:
+            return
+
+        # 保存当前光标位置
+        current_pos = self.editor.getCursorPosition()
+        result.apply(self.editor)
+
+        # 显示替换结果
+        QMessageBox.information(self, "Replace All", f"Replaced {result.count} occurrences.")
+
+        # 恢复光标位置
+        line = min(current_pos[0], self.editor.lines() - 1)
+        self.editor.setCursorPosition(line, min(current_pos[1], self.editor.lineLength(line)))
+
+
+# 全部替换引擎，支持普通文本和re正则表达式
+class ReplaceEngine:
+    def __init__(self, find_str, replace_str, regex=False, whole_word=False, match_case=False):
+        pattern = find_str if regex else re.escape(find_str)
+        if whole_word:
+            pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+        flags = re.MULTILINE if regex else 0
+        if not match_case:
+            flags |= re.IGNORECASE
+        self.pattern = re.compile(pattern, flags)
+        self.replace_str = replace_str
+        self.regex = regex
+        if regex:
+            self.pattern.sub(replace_str, '')  # 提前检查替换模板中的分组引用
+
+    # 计算一次匹配的替换文本，正则模式下支持 \1、\g<name> 等分组引用
+    def replacement(self, match):
+        return match.expand(self.replace_str) if self.regex else self.replace_str
+
+    # 一次扫描文本，返回全部替换结果
+    def run(self, text):
+        pieces = []
+        spans = []  # [(起始位置, 结束位置, 替换文本)]
+        last = 0
+        for match in self.pattern.finditer(text):
+            start, end = match.span()
+            replacement = self.replacement(match)
+            pieces.append(text[last:start])
+            pieces.append(replacement)
+            spans.append((start, end, replacement))
+            last = end
+        pieces.append(text[last:])
+        return ReplaceResult(text, ''.join(pieces), spans)
+
+
+# 全部替换的结果
+class ReplaceResult:
+    PREVIEW_LINES = 500  # 预览中最多显示的改动行数
+
+    def __init__(self, old_text, new_text, spans):
+        self.old_text = old_text
+        self.new_text = new_text
+        self.spans = spans
+        self.count = len(spans)
+
+    # 作为一次编辑应用到编辑器：只替换第一个到最后一个匹配之间的范围，整个操作只占一个撤销步骤
+    def apply(self, editor):
+        first = self.spans[0][0]
+        tail = len(self.old_text) - self.spans[-1][1]
+        replacement = self.new_text[first:len(self.new_text) - tail].encode('utf-8')
+        # QScintilla 的位置以UTF-8字节计算
+        start = len(self.old_text[:first].encode('utf-8'))
+        end = start + len(self.old_text[first:len(self.old_text) - tail].encode('utf-8'))
+        editor.beginUndoAction()
+        editor.SendScintilla(QsciScintilla.SCI_SETTARGETSTART, start)
+        editor.SendScintilla(QsciScintilla.SCI_SETTARGETEND, end)
+        editor.SendScintilla(QsciScintilla.SCI_REPLACETARGET, len(replacement), replacement)
+        editor.endUndoAction()
+
+    # 生成预览差异：列出前若干处改动的行，改动前以"-"开头，改动后以"+"开头
+    def preview(self):
+        text = self.old_text
+        lines = []
+        line_no = 1
+        counted_to = 0
+        i = 0
+        while i < len(self.spans) and len(lines) < self.PREVIEW_LINES:
+            start = self.spans[i][0]
+            line_start = text.rfind('\n', 0, start) + 1
+            line_end = text.find('\n', self.spans[i][1])
+            line_end = len(text) if line_end < 0 else line_end
+            # 同一行（或跨行匹配涉及的行）中的所有匹配合并显示
+            new_line = []
+            last = line_start
+            while i < len(self.spans) and self.spans[i][0] <= line_end:
+                span_start, span_end, replacement = self.spans[i]
+                new_line.append(text[last:span_start])
+                new_line.append(replacement)
+                last = span_end
+                if span_end > line_end:
+                    line_end = text.find('\n', span_end)
+                    line_end = len(text) if line_end < 0 else line_end
+                i += 1
+            new_line.append(text[last:line_end])
+            line_no += text.count('\n', counted_to, line_start)
+            counted_to = line_start
+            lines.append(f"@@ line {line_no}")
+            lines += ['-' + line for line in text[line_start:line_end].split('\n')]
+            lines += ['+' + line for line in ''.join(new_line).split('\n')]
+        if i < len(self.spans):
+            lines.append(f"... {len(self.spans) - i} more occurrences")
+        return '\n'.join(lines)
+
+
+# 全部替换预览对话框，确认后才应用替换
+class ReplacePreviewDialog(QDialog):
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Replace All Preview")  # 设置窗口标题
+        self.setGeometry(300, 300, 700, 450)  # 设置窗口大小和位置
+
+        count_label = QLabel(f"{result.count} occurrences will be replaced.")
+        diff_view = QPlainTextEdit()
+        diff_view.setReadOnly(True)
+        diff_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        diff_view.setFont(QFont("Consolas", 10))
+        diff_view.setPlainText(result.preview())
+
+        apply_button = QPushButton("Apply")
+        apply_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+
+        # 设置布局
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(apply_button)
+        buttons_layout.addWidget(cancel_button)
+        layout = QVBoxLayout()
+        layout.addWidget(count_label)
+        layout.addWidget(diff_view)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+
+# 后台进程池，项目搜索等CPU密集的任务在其中执行，首次使用时才创建
+_process_pool = None
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        import multiprocessing
+        import concurrent.futures
+        # 使用spawn方式创建子进程，避免在已启动Qt线程的进程中fork
+        _process_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 2,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+
+# 进程池中的任务完成时，在进程池的线程中调用notify（通常是发出信号，由界面线程处理结果）
+# 进程池关闭后才完成或被取消的任务不再通知：窗口正在关闭，接收信号的对象可能已被删除
+def when_pool_done(future, notify):
+    pool = _process_pool
+
+    def done(future):
+        if pool is not _process_pool:
+            return
+        try:
+            notify(future)
+        except RuntimeError:
+            pass  # 接收信号的对象已被删除
+    future.add_done_callback(done)
+
+
+# 关闭后台进程池，取消尚未开始的任务，不等待正在运行的任务，窗口可以立即关闭
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        pool, _process_pool = _process_pool, None  # 先置空，使之后完成的任务都不再通知
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# 原子写入文件：先写入同目录下的临时文件，再用os.replace替换，写入中途失败不会损坏原文件
+# text为bytes时按二进制写入
+def atomic_write(file_path, text):
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.pyhub-', suffix='.tmp', dir=directory)
+    try:
+        if isinstance(text, bytes):
+            file = os.fdopen(fd, 'wb')
+        else:
+            file = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        with file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)  # 保留原文件的权限
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+SEARCH_CHUNK_SIZE = 8 * 1024 * 1024  # 大文件按块读取，每块的大小
+SEARCH_MMAP_THRESHOLD = 1024 * 1024  # 超过该大小的文件使用mmap读取
+SEARCH_MAX_MATCHES = 1000  # 每个文件最多返回的匹配数
+
+
+# 编译项目搜索使用的字节正则表达式，每个工作进程中缓存
+@functools.lru_cache(maxsize=16)
+def compile_search_pattern(find_str, regex, whole_word, match_case):
+    pattern = find_str.encode('utf-8') if regex else re.escape(find_str.encode('utf-8'))
+    if whole_word:
+        pattern = rb'(?<!\w)(?:' + pattern + rb')(?!\w)'
+    return re.compile(pattern, re.MULTILINE | (0 if match_case else re.IGNORECASE))
+
+
+# 在一块文本中查找，返回 [(行号, 列号, 行内容)]
+def search_buffer(buffer, pattern, first_line, matches):
+    line_no = first_line
+    counted_to = 0
+    for match in pattern.finditer(buffer):
+        start = match.start()
+        line_no += buffer.count(b'\n', counted_to, start)
+        counted_to = start
+        line_start = buffer.rfind(b'\n', 0, start) + 1
+        line_end = buffer.find(b'\n', start)
+        line = buffer[line_start:line_end if line_end >= 0 else len(buffer)]
+        matches.append((line_no, start - line_start, line[:300].decode('utf-8', errors='replace').rstrip()))
+        if len(matches) >= SEARCH_MAX_MATCHES:
+            break
+    return first_line + buffer.count(b'\n')
+
+
+# 在进程池中执行：搜索一批文件，返回 [(文件路径, 匹配列表)]，跳过二进制文件
+def search_files(paths, find_str, regex, whole_word, match_case):
+    pattern = compile_search_pattern(find_str, regex, whole_word, match_case)
+    results = []
+    for path in paths:
+        matches = []
+        try:
+            with open(path, 'rb') as file:
+                head = file.read(8192)
+                if b'\0' in head or not head:
+                    continue  # 空文件或二进制文件
+                size = os.fstat(file.fileno()).st_size
+                if size <= SEARCH_MMAP_THRESHOLD:
+                    search_buffer(head + file.read(), pattern, 1, matches)
+                else:
+                    # 大文件使用mmap按块读取，每块在换行处截断，避免一行被拆到两块中
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        position = 0
+                        line_no = 1
+                        while position < size and len(matches) < SEARCH_MAX_MATCHES:
+                            end = min(position + SEARCH_CHUNK_SIZE, size)
+                            if end < size:
+                                newline = mapped.find(b'\n', end)
+                                end = size if newline < 0 else newline + 1
+                            line_no = search_buffer(mapped[position:end], pattern, line_no, matches)
+                            position = end
+        except (OSError, ValueError):
+            continue
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+# 在进程池中执行：替换一个文件中的全部匹配并原子写入，返回替换次数
+# 使用与search_files相同的字节正则表达式（\w和忽略大小写只针对ASCII字符），替换的正是搜索结果中列出的匹配
+def replace_in_file(path, find_str, replace_str, regex, whole_word, match_case):
+    pattern = compile_search_pattern(find_str, regex, whole_word, match_case)
+    with open(path, 'rb') as file:
+        data = file.read()
+    if b'\0' in data[:8192]:
+        return 0  # 二进制文件，搜索时同样跳过
+    template = replace_str.encode('utf-8')
+    if regex:
+        data, count = pattern.subn(template, data)  # 支持 \1、\g<name> 等分组引用
+    else:
+        data, count = pattern.subn(lambda match: template, data)  # 普通文本不解析转义
+    if count:
+        atomic_write(path, data)
+    return count
+
+
+# 一次项目搜索：把文件分批交给进程池，结果按文件逐个通过信号返回
+class ProjectSearch(QObject):
+    file_found = pyqtSignal(str, list)  # 文件路径，匹配列表
+    finished = pyqtSignal(int, int, float, bool)  # 匹配的文件数，匹配数，耗时，是否被取消
+    batch_done = pyqtSignal(object)  # 内部使用：进程池线程中完成的任务转交给界面线程
+    BATCH_FILES = 64  # 每批最多的文件数
+    BATCH_BYTES = 16 * 1024 * 1024  # 每批文件的总大小上限
+
+    def __init__(self, files, options, parent=None):
+        super().__init__(parent)
+        self.options = options  # (查找文本, 正则, 全词, 大小写)
+        self.files = files  # [(绝对路径, 大小)]
+        self.futures = []
+        self.pending = 0
+        self.cancelled = False
+        self.file_count = 0
+        self.match_count = 0
+        self.started_at = time.perf_counter()
+        self.batch_done.connect(self.collect_batch)
+
+    def start(self):
+        pool = get_process_pool()
+        batch, batch_bytes = [], 0
+        for path, size in self.files:
+            batch.append(path)
+            batch_bytes += size
+            if len(batch) >= self.BATCH_FILES or batch_bytes >= self.BATCH_BYTES:
+                self.submit(pool, batch)
+                batch, batch_bytes = [], 0
+        if batch:
+            self.submit(pool, batch)
+        if not self.futures:
+            self.finish()
+
+    def submit(self, pool, batch):
+        future = pool.submit(search_files, batch, *self.options)
+        when_pool_done(future, self.batch_done.emit)
+        self.futures.append(future)
+        self.pending += 1
+
+    def collect_batch(self, future):
+        self.pending -= 1
+        if not self.cancelled and not future.cancelled():
+            try:
+                results = future.result()
+            except Exception:
+                results = []
+            for path, matches in results:
+                self.file_count += 1
+                self.match_count += len(matches)
+                self.file_found.emit(path, matches)
+        if self.pending == 0:
+            self.finish()
+
+    # 取消搜索，未开始的批次直接取消，正在执行的批次结果将被丢弃
+    def cancel(self):
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+
+    def finish(self):
+        self.finished.emit(self.file_count, self.match_count,
+                           time.perf_counter() - self.started_at, self.cancelled)
+
+
+# 在文件中查找的停靠窗口，结果按文件分组显示
+class FindInFilesDock(QDockWidget):
+    replace_done = pyqtSignal(str, object)  # 进程池中一个文件替换完成：文件路径，替换任务
+
+    def __init__(self, parent=None):
+        super().__init__("Find in Files", parent)
+        self.replace_done.connect(self.collect_replace)
+        self.setObjectName("FindInFilesDock")
+        self.search = None  # 当前进行中的搜索
+        self.last_options = None  # 上一次搜索的选项，供在文件中替换使用
+
+        # 查找和替换输入框
+        self.find_input = QLineEdit()
+        self.find_input.setPlaceholderText("Find in project...")
+        self.find_input.returnPressed.connect(self.start_search)
+        self.replace_input = QLineEdit()
+        self.replace_input.setPlaceholderText("Replace with...")
+
+        # 选项按钮
+        self.case_checkbox = QPushButton("Match Case")
+        self.case_checkbox.setCheckable(True)
+        self.word_checkbox = QPushButton("Whole Word")
+        self.word_checkbox.setCheckable(True)
+        self.regex_checkbox = QPushButton("Regex")
+        self.regex_checkbox.setCheckable(True)
+
+        # 搜索、取消和替换按钮
+        self.search_button = QPushButton("Search")
+        self.search_button.clicked.connect(self.start_search)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.cancel_button.setEnabled(False)
+        self.replace_button = QPushButton("Replace in Files")
+        self.replace_button.clicked.connect(self.replace_in_files)
+
+        # 结果列表，双击匹配行打开文件并跳转
+        self.results = QTreeWidget()
+        self.results.setHeaderHidden(True)
+        self.results.itemActivated.connect(self.open_result)
+        self.status_label = QLabel()
+
+        # 设置布局
+        options_layout = QHBoxLayout()
+        for widget in (self.case_checkbox, self.word_checkbox, self.regex_checkbox,
+                       self.search_button, self.cancel_button, self.replace_button):
+            options_layout.addWidget(widget)
+        layout = QVBoxLayout()
+        layout.addWidget(self.find_input)
+        layout.addWidget(self.replace_input)
+        layout.addLayout(options_layout)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status_label)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+    # 当前的搜索选项
+    def options(self):
+        return (self.find_input.text(), self.regex_checkbox.isChecked(),
+                self.word_checkbox.isChecked(), self.case_checkbox.isChecked())
+
+    # 开始搜索项目索引中的所有文件
+    def start_search(self):
+        options = self.options()
+        if not options[0]:
+            return
+        if options[1]:
+            try:
+                re.compile(options[0])
+            except re.error as e:
+                QMessageBox.warning(self, "Find in Files", f"Invalid regular expression:\n{e}")
+                return
+        index = self.parent().project_index
+        if not index.ready:
+            self.status_label.setText("Project is still being indexed...")
+            return
+        self.cancel_search()
+        self.results.clear()
+        self.last_options = options
+        files = [(index.absolute_path(rel), size) for rel, size, _ in index.files()]
+        self.search = ProjectSearch(files, options, self)
+        self.search.file_found.connect(self.add_file_result)
+        self.search.finished.connect(self.search_finished)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText(f"Searching {len(files)} files...")
+        self.search.start()
+
+    def cancel_search(self):
+        if self.search is not None:
+            self.search.cancel()
+
+    # 添加一个文件的搜索结果
+    def add_file_result(self, path, matches):
+        root = self.parent().project_index.root
+        file_item = QTreeWidgetItem([f"{os.path.relpath(path, root)} ({len(matches)})"])
+        file_item.setData(0, Qt.UserRole, (path, matches[0][0], matches[0][1]))
+        for line_no, column, line in matches:
+            child = QTreeWidgetItem(file_item, [f"{line_no}: {line.strip()}"])
+            child.setData(0, Qt.UserRole, (path, line_no, column))
+        self.results.addTopLevelItem(file_item)
+
+    def search_finished(self, file_count, match_count, elapsed, cancelled):
+        state = "cancelled" if cancelled else "done"
+        self.status_label.setText(f"{match_count} matches in {file_count} files ({elapsed:.2f}s, {state})")
+        self.cancel_button.setEnabled(False)
+        self.search.deleteLater()
+        self.search = None
+
+    # 打开结果对应的文件并跳转到匹配行
+    def open_result(self, item):
+        path, line_no, column = item.data(0, Qt.UserRole)
+        self.parent().open_file_at(path, line_no, column)
+
+    # 在搜索到的文件中执行替换，每个文件原子写入，完成后重新载入已打开的标签页
+    # 有未保存修改的标签页会被自动保存写回旧内容，需要先保存或关闭
+    def replace_in_files(self):
+        if self.last_options is None or self.search is not None or not self.results.topLevelItemCount():
+            return
+        paths = [self.results.topLevelItem(i).data(0, Qt.UserRole)[0]
+                 for i in range(self.results.topLevelItemCount())]
+        find_str, regex, whole_word, match_case = self.last_options
+        replace_str = self.replace_input.text()
+        if regex:
+            try:
+                compile_search_pattern(find_str, regex, whole_word, match_case).sub(replace_str.encode('utf-8'), b'')
+            except re.error as e:
+                QMessageBox.warning(self, "Replace in Files", f"Invalid replacement:\n{e}")
+                return
+        modified = self.parent().modified_files(paths)
+        if modified:
+            QMessageBox.warning(self, "Replace in Files", "Save or close these files before replacing:\n" +
+                                "\n".join(modified))
+            return
+        answer = QMessageBox.question(
+            self, "Replace in Files",
+            f"Replace '{find_str}' with '{replace_str}' in {len(paths)} files?"
+        )
+        if answer != QMessageBox.Yes:
+            return
+        self.replace_pending = len(paths)
+        self.replace_count = 0
+        self.replace_errors = []
+        self.replace_skipped = []  # 替换期间被修改、没有重新载入的标签页
+        self.replace_button.setEnabled(False)
+        self.status_label.setText(f"Replacing in {len(paths)} files...")
+        pool = get_process_pool()
+        for path in paths:
+            future = pool.submit(replace_in_file, path, find_str, replace_str, regex, whole_word, match_case)
+            when_pool_done(future, lambda future, path=path: self.replace_done.emit(path, future))
+
+    # 一个文件替换完成，重新载入该文件的标签页，全部完成后显示结果
+    def collect_replace(self, path, future):
+        self.replace_pending -= 1
+        try:
+            count = future.result()
+        except Exception as e:
+            self.replace_errors.append(f"{path}: {e}")
+        else:
+            self.replace_count += count
+            if count and not self.parent().reload_file(path):
+                self.replace_skipped.append(path)
+        if self.replace_pending:
+            return
+        self.replace_button.setEnabled(True)
+        self.results.clear()
+        self.status_label.setText(f"Replaced {self.replace_count} occurrences.")
+        if self.replace_errors:
+            QMessageBox.critical(self, "Replace in Files",
+                                 "Failed to replace in files:\n" + "\n".join(self.replace_errors))
+        if self.replace_skipped:
+            QMessageBox.warning(self, "Replace in Files", "These files were edited during the replace and were not "
+                                "reloaded, saving them will overwrite the replacement:\n" +
+                                "\n".join(self.replace_skipped))
+
+
+# 按数值排序的结果项，每一列的排序键保存在SORT_ROLE中
+class SortableItem(QTreeWidgetItem):
+    SORT_ROLE = Qt.UserRole + 1
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn()
+        key = self.data(column, self.SORT_ROLE)
+        other_key = other.data(column, self.SORT_ROLE)
+        if key is None or other_key is None:
+            return self.text(column) < other.text(column)
+        return key < other_key
+
+
+# 性能分析结果的停靠窗口，显示最近一次Run with Profiler或Run with Memory Trace的结果，
+# 可以与之前保存的同类结果比较，双击结果项跳转到对应的代码行
+class ProfileDock(QDockWidget):
+    COLUMNS = {
+        'profile': ["Function", "Location", "Calls", "Own ms", "Cumulative ms", "Δ ms"],
+        'memory': ["Location", "Size KiB", "Blocks", "Δ KiB"],
+    }
+
+    def __init__(self, parent=None):
+        super().__init__("Profiler", parent)
+        self.setObjectName("ProfileDock")
+        self.stats = None  # 当前显示的结果
+        self.stats_path = None  # 当前结果保存的文件
+        self.run_tab = None  # 运行的标签页，用于跳转未保存的代码
+        self.script_name = None  # 运行时使用的脚本名
+
+        self.summary_label = QLabel("Use Run with Profiler or Run with Memory Trace.")
+        self.compare_box = QComboBox()
+        self.compare_box.currentIndexChanged.connect(self.compare_changed)
+        self.results = QTreeWidget()
+        self.results.setRootIsDecorated(False)
+        self.results.setSortingEnabled(True)
+        self.results.itemActivated.connect(self.open_result)
+
+        # 设置布局
+        compare_layout = QHBoxLayout()
+        compare_layout.addWidget(self.summary_label, 1)
+        compare_layout.addWidget(QLabel("Compare with:"))
+        compare_layout.addWidget(self.compare_box)
+        layout = QVBoxLayout()
+        layout.addLayout(compare_layout)
+        layout.addWidget(self.results)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+    # 显示一次运行的结果
+    def show_stats(self, stats, stats_path, tab, script_name):
+        self.stats = stats
+        self.stats_path = stats_path
+        self.run_tab = tab
+        self.script_name = script_name
+        if stats['mode'] == 'profile':
+            self.summary_label.setText(f"{stats['total'] * 1000:.1f} ms total, "
+                                       f"{len(stats['entries'])} functions")
+        else:
+            self.summary_label.setText(f"{stats['current'] / 1024:.1f} KiB allocated, "
+                                       f"{stats['peak'] / 1024:.1f} KiB peak")
+        self.results.setSortingEnabled(False)  # 批量添加时不排序
+        self.results.clear()
+        self.results.setColumnCount(len(self.COLUMNS[stats['mode']]))  # 切换模式时去掉多余的列
+        self.results.setHeaderLabels(self.COLUMNS[stats['mode']])
+        for entry in stats['entries']:
+            self.results.addTopLevelItem(self.create_item(stats['mode'], entry))
+        self.results.setSortingEnabled(True)
+        self.results.sortByColumn(4 if stats['mode'] == 'profile' else 1, Qt.DescendingOrder)
+        self.results.resizeColumnToContents(0)
+        self.load_saved_profiles()
+
+    def create_item(self, mode, entry):
+        location = f"{os.path.basename(entry['file'])}:{entry['line']}" if entry['line'] else entry['file']
+        if mode == 'profile':
+            calls = str(entry['calls']) if entry['calls'] == entry['primitive_calls'] \
+                else f"{entry['calls']}/{entry['primitive_calls']}"  # 递归调用显示为 总次数/原始调用次数
+            values = [(entry['function'], None), (location, None), (calls, entry['calls']),
+                      (f"{entry['own'] * 1000:.2f}", entry['own']),
+                      (f"{entry['cumulative'] * 1000:.2f}", entry['cumulative'])]
+        else:
+            values = [(location, None), (f"{entry['size'] / 1024:.1f}", entry['size']),
+                      (str(entry['count']), entry['count'])]
+        item = SortableItem([text for text, _ in values] + [""])
+        for column, (_, key) in enumerate(values):
+            if key is not None:
+                item.setData(column, SortableItem.SORT_ROLE, key)
+        item.setData(0, Qt.UserRole, entry)
+        item.setToolTip(0 if mode == 'memory' else 1, entry['file'])
+        return item
+
+    # 列出之前保存的同类结果，最新的在前
+    def load_saved_profiles(self):
+        self.compare_box.blockSignals(True)
+        self.compare_box.clear()
+        self.compare_box.addItem("(none)", None)
+        directory = data_path('profiles')
+        suffix = f"-{self.stats['mode']}-"
+        for name in sorted(os.listdir(directory), reverse=True):
+            path = os.path.join(directory, name)
+            if suffix in name and name.endswith('.json') and path != self.stats_path:
+                self.compare_box.addItem(name[:-len('.json')], path)
+        self.compare_box.blockSignals(False)
+
+    # 比较的键：性能分析按函数，内存跟踪按分配位置
+    @staticmethod
+    def entry_key(mode, entry):
+        if mode == 'profile':
+            return entry['file'], entry['line'], entry['function']
+        return entry['file'], entry['line']
+
+    # 选择比较的结果后计算每一项的差值，基准中没有的项显示为new
+    def compare_changed(self, index):
+        path = self.compare_box.itemData(index)
+        baseline = {}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    baseline_stats = json.load(file)
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Profiler", f"Failed to load saved profile:\n{e}")
+                return
+            baseline = {self.entry_key(baseline_stats['mode'], entry): entry
+                        for entry in baseline_stats['entries']}
+        mode = self.stats['mode']
+        field, scale = ('cumulative', 1000) if mode == 'profile' else ('size', 1 / 1024)
+        column = self.results.columnCount() - 1
+        self.results.setSortingEnabled(False)
+        for i in range(self.results.topLevelItemCount()):
+            item = self.results.topLevelItem(i)
+            entry = item.data(0, Qt.UserRole)
+            if not path:
+                item.setText(column, "")
+                item.setData(column, SortableItem.SORT_ROLE, None)
+                continue
+            old = baseline.get(self.entry_key(mode, entry))
+            if old is None:
+                item.setText(column, "new")
+                item.setData(column, SortableItem.SORT_ROLE, float('inf'))
+                continue
+            delta = (entry[field] - old[field]) * scale
+            item.setText(column, f"{delta:+.2f}")
+            item.setData(column, SortableItem.SORT_ROLE, delta)
+        self.results.setSortingEnabled(True)
+
+    # 跳转到结果对应的代码行，运行的标签页仍然打开时跳转到该标签页，否则打开文件
+    def open_result(self, item):
+        entry = item.data(0, Qt.UserRole)
+        if not entry['line']:
+            return  # 内置函数没有源代码位置
+        editor = self.parent()
+        tabs = [editor.tabs.widget(i) for i in range(editor.tabs.count())]
+        if entry['file'] == self.script_name and any(tab is self.run_tab for tab in tabs):
+            editor.tabs.setCurrentWidget(self.run_tab)
+            self.run_tab.setCursorPosition(entry['line'] - 1, 0)
+            self.run_tab.ensureLineVisible(entry['line'] - 1)
+            self.run_tab.setFocus()
+        elif os.path.isfile(entry['file']):
+            editor.open_file_at(entry['file'], entry['line'])
+
+# 运行列表停靠窗口，显示每次运行的状态、耗时、CPU占用和峰值内存，可以单独停止某次运行
+class RunsDock(QDockWidget):
+    COLUMNS = ["Run", "Status", "Elapsed", "CPU", "Peak Memory"]
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__("Runs", parent)
+        self.setObjectName("RunsDock")
+        self.scheduler = scheduler
+        self.items = {}  # {会话: 列表项}
+
+        self.runs = QTreeWidget()
+        self.runs.setRootIsDecorated(False)
+        self.runs.setHeaderLabels(self.COLUMNS)
+        self.runs.itemActivated.connect(self.open_output)
+        self.runs.currentItemChanged.connect(self.update_buttons)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_selected)
+        self.clear_button = QPushButton("Clear Finished")
+        self.clear_button.clicked.connect(self.parent().clear_finished_runs)
+        self.limit_label = QLabel(f"Up to {scheduler.limit} concurrent runs")
+
+        # 设置布局
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.limit_label, 1)
+        button_layout.addWidget(self.stop_button)
+        button_layout.addWidget(self.clear_button)
+        layout = QVBoxLayout()
+        layout.addWidget(self.runs)
+        layout.addLayout(button_layout)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        scheduler.changed.connect(self.refresh)
+        self.refresh()
+
+    # 按调度器中的会话更新列表
+    def refresh(self):
+        for session in list(self.items):
+            if session not in self.scheduler.sessions:
+                item = self.items.pop(session)
+                self.runs.takeTopLevelItem(self.runs.indexOfTopLevelItem(item))
+        for session in self.scheduler.sessions:
+            item = self.items.get(session)
+            if item is None:
+                item = QTreeWidgetItem(self.runs)
+                self.items[session] = item
+            elapsed = session.elapsed()
+            texts = [
+                session.title if session.tab is not None else f"{session.title} (closed)",
+                session.state if session.exit_code is None else f"{session.state} ({session.exit_code})",
+                "" if elapsed is None else f"{elapsed:.1f}s",
+                "" if session.cpu_percent is None or session.state != 'running' else f"{session.cpu_percent:.0f}%",
+                "" if session.peak_memory is None else f"{session.peak_memory / 1048576:.1f} MiB",
+            ]
+            for column, text in enumerate(texts):
+                item.setText(column, text)
+        self.update_buttons()
+
+    def selected_session(self):
+        return self.session_for(self.runs.currentItem())
+
+    def session_for(self, item):
+        for session, session_item in self.items.items():
+            if session_item is item:
+                return session
+        return None
+
+    def update_buttons(self):
+        session = self.selected_session()
+        self.stop_button.setEnabled(session is not None and session.is_active())
+
+    def stop_selected(self):
+        session = self.selected_session()
+        if session is not None:
+            session.stop()
+
+    # 双击切换到该次运行的输出面板和标签页
+    def open_output(self, item):
+        session = self.session_for(item)
+        if session is not None:
+            self.parent().show_run_output(session)
+
+# 在进程池中执行：用ast解析源代码，返回 (全部符号, 顶层符号, 导入 {别名: 模块}, 星号导入的模块)
+# 代码有语法错误时返回None，调用方继续使用上一次成功解析的结果
+def extract_symbols(source):
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    names = set()
+    imports = {}
+    star_imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store):
+            names.add(node.attr)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                name = alias.asname or alias.name.split('.')[0]
+                names.add(name)
+                imports[name] = alias.name if alias.asname else name
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                if alias.name == '*':
+                    star_imports.append(node.module)
+                else:
+                    names.add(alias.asname or alias.name)
+                    imports[alias.asname or alias.name] = f"{node.module}.{alias.name}"  # 可能是子模块
+    top_level = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            top_level.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                top_level.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    return sorted(names), sorted(top_level), imports, star_imports
+
+
+# 在进程池中执行：读取并解析一个项目模块
+def extract_file_symbols(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            return extract_symbols(file.read())
+    except OSError:
+        return None
+
+
+# 一个文件或缓冲区的符号表，名称列表已排序，便于二分查找前缀
+class SymbolTable:
+    __slots__ = ('names', 'top_level', 'imports', 'star_imports', 'version')
+
+    def __init__(self, result, version):
+        self.names, self.top_level, self.imports, self.star_imports = result
+        self.version = version  # 缓冲区内容的哈希或文件的修改时间
+
+
+# 在有序列表中查找以prefix开头的名称
+def prefix_matches(sorted_names, prefix, limit):
+    start = bisect.bisect_left(sorted_names, prefix)
+    matches = []
+    for name in itertools.islice(sorted_names, start, start + limit):
+        if not name.startswith(prefix):
+            break
+        matches.append(name)
+    return matches
+
+
+# 符号索引：在后台进程中用ast解析打开的文件和它们导入的项目模块，按前缀提供代码补全
+class SymbolIndex(QObject):
+    parsed = pyqtSignal(object, object, object)  # 内部使用：键，解析任务，版本
+    REPARSE_DELAY = 500  # 停止输入后重新解析的延迟（毫秒）
+    MAX_COMPLETIONS = 50
+
+    def __init__(self, project_index, parent=None):
+        super().__init__(parent)
+        self.project_index = project_index
+        self.tables = {}  # {编辑器或模块文件路径: SymbolTable}
+        self.requested = {}  # {键: 最近一次提交解析的版本}，旧版本的结果会被丢弃
+        self.module_paths = {}  # {(目录, 模块名): 模块文件路径}
+        self.builtin_names = sorted(set(dir(builtins)) | set(keyword.kwlist))
+        self.pending = set()  # 等待重新解析的编辑器
+        self.parsed.connect(self.store_table)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.REPARSE_DELAY)
+        self.timer.timeout.connect(self.parse_pending)
+
+    # 编辑器内容变化后安排重新解析
+    def schedule(self, editor):
+        self.pending.add(editor)
+        self.timer.start()
+
+    def forget(self, editor):
+        self.pending.discard(editor)
+        self.tables.pop(editor, None)
+        self.requested.pop(editor, None)
+
+    # 只解析内容真正变化过的编辑器
+    def parse_pending(self):
+        for editor in list(self.pending):
+            self.pending.discard(editor)
+            text = editor.text()
+            version = content_hash(text)
+            if self.requested.get(editor) == version:
+                continue
+            self.submit(editor, version, extract_symbols, text)
+
+    def submit(self, key, version, function, argument):
+        self.requested[key] = version
+        future = get_process_pool().submit(function, argument)
+        when_pool_done(future, lambda future: self.parsed.emit(key, future, version))
+
+    # 保存解析结果，并解析其中导入的项目模块
+    @timed('symbol_index.store_table')
+    def store_table(self, key, future, version):
+        if self.requested.get(key) != version or future.cancelled():
+            return  # 已有更新的解析任务，或编辑器已关闭
+        try:
+            result = future.result()
+        except Exception:
+            return
+        if result is None:
+            return  # 语法错误，保留上一次的结果
+        table = SymbolTable(result, version)
+        self.tables[key] = table
+        if isinstance(key, CodeEditor):
+            base = os.path.dirname(key.file_path) if key.file_path else None
+        else:
+            base = os.path.dirname(key)  # 模块文件，从所在目录解析相对的导入
+        for module in list(table.imports.values()) + table.star_imports:
+            path = self.resolve_module(module, base)
+            if path is None:
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self.requested.get(path) != mtime:
+                self.submit(path, mtime, extract_file_symbols, path)
+
+    # 在文件所在目录和项目根目录中查找模块对应的文件
+    def resolve_module(self, module, base):
+        roots = [root for root in (base, self.project_index.root) if root]
+        key = (tuple(roots), module)
+        if key not in self.module_paths:
+            parts = module.split('.')
+            found = None
+            for root in roots:
+                for candidate in (os.path.join(root, *parts) + '.py',
+                                  os.path.join(root, *parts, '__init__.py')):
+                    if os.path.isfile(candidate):
+                        found = candidate
+                        break
+                if found:
+                    break
+            self.module_paths[key] = found
+        return self.module_paths[key]
+
+    # 查询补全：module_alias 不为空时补全该模块的成员，否则补全当前文件、星号导入的模块和内置名称
+    def completions(self, editor, prefix, module_alias=None):
+        table = self.tables.get(editor)
+        base = os.path.dirname(editor.file_path) if editor.file_path else None
+        if module_alias is not None:
+            module = table.imports.get(module_alias) if table else None
+            path = self.resolve_module(module, base) if module else None
+            module_table = self.tables.get(path)
+            if module_table is None:
+                return []
+            return prefix_matches(module_table.top_level, prefix, self.MAX_COMPLETIONS)
+        sources = [self.builtin_names]
+        if table is not None:
+            sources.append(table.names)
+            for module in table.star_imports:
+                module_table = self.tables.get(self.resolve_module(module, base))
+                if module_table is not None:
+                    sources.append(module_table.top_level)
+        matches = set()
+        for names in sources:
+            matches.update(prefix_matches(names, prefix, self.MAX_COMPLETIONS))
+        matches.discard(prefix)
+        return sorted(matches)[:self.MAX_COMPLETIONS]
+
+
+# 在进程池中执行：检查源代码的语法错误，安装了pyflakes时再检查未定义的名称、未使用的导入等问题
+# 返回按位置排序的 [(行号, 列号, 严重程度, 消息)]，行号从1开始，列号为从0开始的字符偏移
+def lint_source(source, filename):
+    try:
+        tree = ast.parse(source, filename)
+        compile(tree, filename, 'exec', dont_inherit=True)  # ast.parse不报告的错误，例如函数外的return
+    except SyntaxError as e:
+        return [(e.lineno or 1, max((e.offset or 1) - 1, 0), 'error', e.msg)]
+    except ValueError as e:
+        return [(1, 0, 'error', str(e))]  # 源代码中有空字符
+    try:
+        from pyflakes import checker
+    except ImportError:
+        return []  # pyflakes是可选的
+    messages = checker.Checker(tree, filename=filename).messages
+    lines = re.split(r'\r\n|\r|\n', source)
+    return sorted((message.lineno, character_column(lines, message.lineno, message.col), 'warning',
+                   message.message % message.message_args) for message in messages)
+
+
+# pyflakes的列号来自ast的col_offset，是该行UTF-8编码中的字节偏移，转换为字符偏移
+def character_column(lines, line_no, column):
+    if not 0 < line_no <= len(lines):
+        return column
+    return len(lines[line_no - 1].encode('utf-8')[:column].decode('utf-8', 'replace'))
+
+
+# 后台语法检查：停止输入后在进程池中检查，结果按内容哈希缓存在每个编辑器上，
+# 内容回到检查过的版本（例如撤销）时直接使用缓存的结果，切换标签页不会重新检查
+class LintChecker(QObject):
+    checked = pyqtSignal(object, object, object)  # 内部使用：编辑器，检查任务，版本
+    CACHE_SIZE = 8  # 每个编辑器缓存的检查结果数
+
+    def __init__(self, delay=400, parent=None):
+        super().__init__(parent)
+        self.cache = {}  # {编辑器: OrderedDict{内容哈希: 检查结果}}
+        self.running = {}  # {编辑器: (版本, 检查任务)}，每个编辑器最多一个
+        self.pending = set()  # 等待检查的编辑器
+        self.checked.connect(self.store_result)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)  # 停止输入后再检查
+        self.timer.timeout.connect(self.check_pending)
+
+    # 编辑器内容变化后安排检查
+    def schedule(self, editor):
+        self.pending.add(editor)
+        self.timer.start()
+
+    def forget(self, editor):
+        self.pending.discard(editor)
+        self.cache.pop(editor, None)
+        self.cancel(editor)
+
+    # 取消编辑器正在进行的检查，尚未开始的任务直接从进程池中移除，已开始的任务结果会被丢弃
+    def cancel(self, editor):
+        entry = self.running.pop(editor, None)
+        if entry is not None:
+            entry[1].cancel()
+
+    @timed('lint.check_pending')
+    def check_pending(self):
+        for editor in list(self.pending):
+            self.pending.discard(editor)
+            text = editor.text()
+            version = content_hash(text)
+            cache = self.cache.setdefault(editor, collections.OrderedDict())
+            if version in cache:
+                cache.move_to_end(version)
+                self.cancel(editor)
+                editor.show_diagnostics(cache[version])
+                continue
+            entry = self.running.get(editor)
+            if entry is not None and entry[0] == version:
+                continue  # 相同的内容正在检查
+            self.cancel(editor)
+            future = get_process_pool().submit(lint_source, text, editor.file_path or '<untitled>')
+            self.running[editor] = (version, future)
+            when_pool_done(future, lambda future, editor=editor, version=version:
+                                     self.checked.emit(editor, future, version))
+
+    # 保存检查结果并显示在编辑器上，已被取消或已有更新任务的结果直接丢弃
+    @timed('lint.store_result')
+    def store_result(self, editor, future, version):
+        entry = self.running.get(editor)
+        if entry is None or entry[1] is not future:
+            return
+        del self.running[editor]
+        try:
+            diagnostics = future.result()
+        except Exception:
+            return
+        cache = self.cache[editor]
+        cache[version] = diagnostics
+        while len(cache) > self.CACHE_SIZE:
+            cache.popitem(last=False)
+        editor.show_diagnostics(diagnostics)
+
+
+# 编译后的主题：样式表和词法分析器颜色
+class Theme:
+    def __init__(self, name, stylesheet, paper, color, styles):
+        self.name = name
+        self.stylesheet = stylesheet  # 样式表文本
+        self.paper = paper  # 编辑器背景颜色，None表示使用词法分析器的默认颜色
+        self.color = color  # 编辑器文字颜色，None表示使用词法分析器的默认颜色
+        self.styles = styles  # 各个样式的文字颜色 {样式: QColor}
+
+
+# 主题引擎：主题保存在themes目录下的JSON文件中，第一次使用时编译并缓存，文件修改后重新编译
+class ThemeEngine:
+    DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'themes')
+
+    def __init__(self, directory=DIRECTORY):
+        self.directory = directory
+        self.cache = {}  # {文件路径: (修改时间, 主题)}
+
+    # 全部可用的主题 {名称: 主题}，无法加载的主题文件会被跳过
+    def themes(self):
+        try:
+            file_names = sorted(os.listdir(self.directory))
+        except OSError:
+            return {}
+        themes = {}
+        for file_name in file_names:
+            if file_name.endswith('.json'):
+                theme = self.load(os.path.join(self.directory, file_name))
+                if theme is not None:
+                    themes[theme.name] = theme
+        return themes
+
+    def theme(self, name):
+        return self.themes().get(name)
+
+    def load(self, path):
+        try:
+            mtime = os.path.getmtime(path)
+            cached = self.cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(path, 'r', encoding='utf-8') as file:
+                theme = self.compile(json.load(file))
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            return None
+        self.cache[path] = (mtime, theme)
+        return theme
+
+    # 把主题文件中的样式规则拼接为样式表，把样式名转换为QsciLexerPython的样式编号
+    @staticmethod
+    def compile(data):
+        rules = []
+        for selector, properties in data.get('stylesheet', {}).items():
+            body = ' '.join(f"{key}: {value};" for key, value in properties.items())
+            rules.append(f"{selector} {{ {body} }}")
+        lexer = data.get('lexer', {})
+        styles = {getattr(QsciLexerPython, style): QColor(color) for style, color in lexer.get('styles', {}).items()}
+        paper = QColor(lexer['paper']) if 'paper' in lexer else None
+        color = QColor(lexer['color']) if 'color' in lexer else None
+        return Theme(data['name'], '\n'.join(rules), paper, color, styles)
+
+
+#主题切换
+class ThemeSwitcher(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Theme Switcher")  # 设置窗口标题
+        self.setGeometry(500, 300, 200, 100)  # 设置窗口大小和位置
+        # 创建主题列表
+        self.theme_list = QListWidget(self)
+        self.theme_list.addItems(sorted(parent.theme_engine.themes()))  # themes目录中的全部主题
+        current = self.theme_list.findItems(parent.current_theme, Qt.MatchExactly)
+        if current:
+            self.theme_list.setCurrentItem(current[0])
+
+        # 切换按钮
+        self.switch_button = QPushButton("Switch", self)
+        # 设置布局
+        layout = QVBoxLayout()
+        layout.addWidget(self.theme_list)
+        layout.addWidget(self.switch_button)
+        self.setLayout(layout)
+
+        # 切换按钮点击事件
+        self.switch_button.clicked.connect(self.apply_theme)
+
+    def apply_theme(self):
+        if self.theme_list.currentItem() is None:
+            return
+        selected_theme = self.theme_list.currentItem().text()  # 获取当前选中的主题
+        self.parent().apply_theme(selected_theme)  # 由主窗口应用并记录主题
+        self.close()  # 关闭窗口
+
+
+# 控制台输出视图，基于纯文本控件，输出先进入缓冲区，再按帧率定时批量刷新到界面
+class ConsoleView(QPlainTextEdit):
+    FLUSH_INTERVAL = 16  # 刷新间隔（毫秒），约每秒60帧
+    COLORS = {'stdout': '#FFFFFF', 'stderr': '#F48771', 'info': '#9CDCFE'}  # 各输出流的颜色
+
+    def __init__(self, max_lines=10000, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)  # 控制台不需要撤销历史
+        self.setMaximumBlockCount(max_lines)  # 环形缓冲区：超过行数上限时自动丢弃最早的行
+        self.pending = []  # 等待刷新的输出片段 [流名称, 文本]
+        self.pending_lines = 0  # 缓冲区中的行数
+        self.at_line_start = True  # 最后写入的内容是否以换行结尾
+
+        # 每个输出流只创建一次字符格式，避免富文本解析的开销
+        self.formats = {}
+        for stream, color in self.COLORS.items():
+            text_format = QTextCharFormat()
+            text_format.setForeground(QColor(color))
+            self.formats[stream] = text_format
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
+
+    # 设置保留的最大行数
+    def set_max_lines(self, max_lines):
+        self.setMaximumBlockCount(max_lines)
+
+    # 原样写入一段输出
+    def write(self, text, stream='stdout'):
+        if not text:
+            return
+        if self.pending and self.pending[-1][0] == stream:
+            self.pending[-1][1] += text  # 与上一段属于同一个流时直接合并
+        else:
+            self.pending.append([stream, text])
+        self.pending_lines += text.count('\n')
+        self.at_line_start = text.endswith('\n')
+        if self.pending_lines > self.maximumBlockCount() > 0:
+            self.trim_pending()
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    # 以新的一行写入一条消息
+    def append(self, text, stream='info'):
+        self.write(('' if self.at_line_start else '\n') + text + '\n', stream)
+
+    # 缓冲区超过行数上限时，丢弃反正会被环形缓冲区淘汰的内容，使界面不会落后于进程
+    def trim_pending(self):
+        excess = self.pending_lines - self.maximumBlockCount()
+        while excess > 0 and self.pending:
+            stream, text = self.pending[0]
+            count = text.count('\n')
+            if count <= excess:
+                self.pending.pop(0)
+                excess -= count
+                self.pending_lines -= count
+            else:
+                cut = 0
+                for _ in range(excess):
+                    cut = text.index('\n', cut) + 1
+                self.pending[0][1] = text[cut:]
+                self.pending_lines -= excess
+                excess = 0
+
+    # 将缓冲区内容一次性插入到文档末尾
+    @timed('console.flush')
+    def flush(self):
+        if not self.pending:
+            return
+        scrollbar = self.verticalScrollBar()
+        follow = scrollbar.value() >= scrollbar.maximum()  # 视图在底部时才自动滚动
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        for stream, text in self.pending:
+            cursor.insertText(text, self.formats[stream])
+        cursor.endEditBlock()
+        self.pending = []
+        self.pending_lines = 0
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
+
+
+# 控制台命令，在独立的QProcess中异步执行，按行输出结果
+class ShellCommand(QObject):
+    output = pyqtSignal(int, str, str)  # 任务编号，输出的若干完整行，输出流名称
+    finished = pyqtSignal(int, int, float)  # 任务编号，退出码，耗时（秒）
+
+    def __init__(self, job_id, command, parent=None):
+        super().__init__(parent)
+        self.job_id = job_id  # 任务编号
+        self.command = command  # 命令文本
+        self.encoding = locale.getpreferredencoding(False)  # 命令行程序按系统编码输出
+        self.buffers = {QProcess.StandardOutput: b'', QProcess.StandardError: b''}  # 未满一行的输出
+        self.streams = {QProcess.StandardOutput: 'stdout', QProcess.StandardError: 'stderr'}
+        self.max_slice = 0.0  # 单次处理输出占用界面线程的最长时间（秒）
+        self.started_at = time.perf_counter()
+
+        self.process = QProcess(self)
+        self.process.readyReadStandardOutput.connect(
+            lambda: self.read_channel(QProcess.StandardOutput))
+        self.process.readyReadStandardError.connect(
+            lambda: self.read_channel(QProcess.StandardError))
+        self.process.finished.connect(self.process_finished)
+        self.process.errorOccurred.connect(self.process_error)
+
+        # 通过系统shell执行命令
+        if os.name == 'nt':
+            self.process.setProgram('cmd')
+            self.process.setNativeArguments(f'/c {command}')
+        else:
+            self.process.setProgram('/bin/sh')
+            self.process.setArguments(['-c', command])
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.process.start()
+
+    # 命令是否仍在运行
+    def is_running(self):
+        return self.process.state() != QProcess.NotRunning
+
+    # 取消命令，先尝试正常终止，2秒后仍未退出则强制结束
+    def cancel(self):
+        if self.is_running():
+            self.process.terminate()
+            QTimer.singleShot(2000, self.force_kill)
+
+    def force_kill(self):
+        if self.is_running():
+            self.process.kill()
+
+    # 读取某个通道的输出，只发送完整的行，不完整的部分留到下次
+    def read_channel(self, channel):
+        started = time.perf_counter()
+        self.process.setReadChannel(channel)
+        data = self.buffers[channel] + bytes(self.process.readAll())
+        lines = data.split(b'\n')
+        self.buffers[channel] = lines.pop()
+        if lines:
+            text = '\n'.join(line.rstrip(b'\r').decode(self.encoding, errors='replace') for line in lines)
+            self.output.emit(self.job_id, text, self.streams[channel])
+        self.max_slice = max(self.max_slice, time.perf_counter() - started)
+
+    # 输出剩余的不完整行
+    def flush(self):
+        for channel, rest in self.buffers.items():
+            if rest:
+                self.output.emit(self.job_id, rest.decode(self.encoding, errors='replace'),
+                                 self.streams[channel])
+                self.buffers[channel] = b''
+
+    def process_finished(self, exit_code, exit_status):
+        self.read_channel(QProcess.StandardOutput)
+        self.read_channel(QProcess.StandardError)
+        self.flush()
+        if exit_status == QProcess.CrashExit:
+            exit_code = -1  # 被取消或崩溃
+        self.finished.emit(self.job_id, exit_code, time.perf_counter() - self.started_at)
+
+    def process_error(self, error):
+        if error == QProcess.FailedToStart:
+            self.output.emit(self.job_id, f"Error: {self.process.errorString()}", 'stderr')
+            self.finished.emit(self.job_id, -1, time.perf_counter() - self.started_at)
+
+
+# 输出流解码器，跨数据块被截断的多字节字符会保留到下一块数据到达后再解码
+class StreamDecoder:
+    def __init__(self, encoding='utf-8'):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    # 解码一块数据，QByteArray 支持缓冲区协议，可直接传入而无需先转换为bytes
+    def feed(self, data):
+        return self.decoder.decode(data)
+
+    # 进程结束时输出剩余的不完整字节
+    def flush(self):
+        return self.decoder.decode(b'', True)
+
+
+# 运行Python子进程使用的环境变量，统一使用UTF-8输出，与StreamDecoder保持一致
+def python_process_environment():
+    environment = QProcessEnvironment.systemEnvironment()
+    environment.insert('PYTHONIOENCODING', 'utf-8')
+    return environment
+
+
+# 每秒的时钟滴答数，/proc中的CPU时间以此为单位
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+# 读取进程已使用的CPU时间（秒）和峰值常驻内存（字节），无法读取时返回None
+# Linux直接读取/proc，其它平台使用psutil（未安装时不采样）
+def process_usage(pid):
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as file:
+            fields = file.read().rsplit(b')', 1)[1].split()  # 进程名中可能有空格和括号
+        peak = None
+        with open(f'/proc/{pid}/status', 'rb') as file:
+            for line in file:
+                if line.startswith(b'VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+                    break
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, peak  # utime + stime
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        memory = process.memory_info()
+    except psutil.Error:
+        return None
+    # Windows提供峰值工作集，macOS只有当前常驻内存，采样时取最大值作为峰值
+    return times.user + times.system, getattr(memory, 'peak_wset', memory.rss)
+
+# 快速运行模式默认预先导入的模块
+DEFAULT_PRELOAD_MODULES = ['numpy', 'pandas']
+
+
+# 预热解释器池，快速运行模式下使用，预先启动若干个已导入常用模块的Python进程
+class WarmInterpreterPool(QObject):
+    WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_worker.py')
+
+    def __init__(self, size=2, preload=(), parent=None):
+        super().__init__(parent)
+        self.size = max(1, size)  # 池中保持的空闲进程数
+        self.preload = list(preload)  # 预先导入的模块
+        self.idle = []  # 空闲的工作进程
+        for _ in range(self.size):
+            self.spawn()
+
+    # 启动一个新的工作进程并放入空闲列表
+    def spawn(self):
+        process = QProcess(self)
+        process.setProcessEnvironment(python_process_environment())
+        process.start('python', ['-u', self.WORKER_SCRIPT, ','.join(self.preload)])
+        self.idle.append(process)
+
+    # 取出一个已启动的工作进程，并在后台补充一个新的进程
+    def acquire(self):
+        while self.idle:
+            process = self.idle.pop(0)
+            if process.state() != QProcess.NotRunning:
+                QTimer.singleShot(0, self.spawn)  # 回收：使用过的进程运行结束后即退出，由新进程补位
+                return process
+            process.deleteLater()  # 已意外退出的进程直接丢弃
+        self.spawn()
+        return self.idle.pop(0)
+
+    # 修改预导入模块后重启全部空闲进程
+    def set_preload(self, preload):
+        self.preload = list(preload)
+        self.shutdown()
+        for _ in range(self.size):
+            self.spawn()
+
+    # 结束全部空闲进程
+    def shutdown(self):
+        for process in self.idle:
+            process.kill()
+            process.waitForFinished(1000)
+            process.deleteLater()
+        self.idle = []
+
+
+# 一个标签页的运行会话，拥有自己的进程、临时文件和输出面板，同一会话同时只运行一次
+class RunSession(QObject):
+    state_changed = pyqtSignal(object)  # 会话
+    finished = pyqtSignal(object)  # 会话，运行结束、被停止或启动失败
+
+    def __init__(self, session_id, tab, title, max_lines=10000, parent=None):
+        super().__init__(parent)
+        self.session_id = session_id
+        self.tab = tab  # 运行的标签页，关闭后为None
+        self.title = title
+        self.output = ConsoleView(max_lines)  # 输出面板
+        self.output.setStyleSheet("background-color: black; color: white;")
+        self.temp_path = None  # 普通运行使用的临时文件，第一次运行时创建，文件名不会与其它编辑器实例冲突
+        self.process = None
+        self.state = 'idle'  # idle、queued、running、finished、failed、stopped
+        self.code = None
+        self.mode = None  # None为普通运行，fast、profile、memory
+        self.script_name = None
+        self.stats_path = None  # 性能分析结果文件
+        self.stopping = False
+        self.started_at = self.finished_at = None
+        self.exit_code = None
+        self.cpu_percent = None
+        self.peak_memory = None
+        self.last_sample = None  # 上一次采样的 (CPU时间, 时刻)
+
+    def is_active(self):
+        return self.state in ('queued', 'running')
+
+    # 准备一次运行，由调度器决定何时启动
+    def prepare(self, code, mode=None, script_name='temp_script.py', stats_path=None):
+        self.code = code
+        self.mode = mode
+        self.script_name = script_name
+        self.stats_path = stats_path
+        self.stopping = False
+        self.exit_code = None
+        self.cpu_percent = self.peak_memory = self.last_sample = None
+        self.started_at = self.finished_at = None
+        self.set_state('queued')
+
+    def set_state(self, state):
+        self.state = state
+        self.state_changed.emit(self)
+
+    # 启动进程，快速运行时从预热解释器池中取出已启动的进程
+    def start(self, pool=None):
+        self.stdout_decoder = StreamDecoder()
+        self.stderr_decoder = StreamDecoder()
+        if self.mode == 'fast':
+            process = pool.acquire()
+        else:
+            process = QProcess(self)
+            process.setProcessEnvironment(python_process_environment())
+        process.readyReadStandardOutput.connect(self.handle_stdout)
+        process.readyReadStandardError.connect(self.handle_stderr)
+        process.finished.connect(self.process_finished)
+        process.errorOccurred.connect(self.process_error)
+        self.process = process
+        self.started_at = time.perf_counter()
+        self.last_sample = (0.0, self.started_at)  # 新进程的CPU时间从0开始
+        self.set_state('running')
+        self.output.append(f"--- {self.title} ---")
+
+        if self.mode is None:
+            # 代码写入临时文件，由工作进程以源文件的路径运行，标准输入留给用户代码
+            if self.temp_path is None:
+                fd, self.temp_path = tempfile.mkstemp(prefix=f'run_{self.session_id}_', suffix='.py',
+                                                      dir=data_path('runs'))
+                os.close(fd)
+            with open(self.temp_path, 'w', encoding='utf-8') as script_file:
+                script_file.write(self.code)
+            process.start('python', [WarmInterpreterPool.WORKER_SCRIPT, '', self.script_name, 'file', self.temp_path])
+            return
+        if self.mode in ('profile', 'memory'):
+            # 工作进程不预导入模块，代码通过标准输入发送
+            process.start('python', ['-u', WarmInterpreterPool.WORKER_SCRIPT, '',
+                                     self.script_name, self.mode, self.stats_path])
+        else:
+            # 预热进程启动时还不知道要运行的脚本，先发送一行JSON编码的脚本名，与其它运行方式一致
+            process.write(json.dumps(self.script_name).encode('utf-8') + b'\n')
+        process.write(self.code.encode('utf-8'))
+        process.closeWriteChannel()  # 关闭写通道，工作进程读到EOF后开始执行
+
+    # 停止运行，排队中的运行直接取消，运行中的进程先尝试正常终止，2秒后仍未退出则强制结束
+    def stop(self):
+        if self.state == 'queued':
+            self.output.append("Run cancelled.")
+            self.set_state('stopped')
+            self.finished.emit(self)
+        elif self.state == 'running':
+            self.stopping = True
+            self.process.terminate()
+            QTimer.singleShot(2000, self.force_kill)
+
+    def force_kill(self):
+        if self.process is not None and self.process.state() != QProcess.NotRunning:
+            self.process.kill()
+
+    # 采样进程的CPU占用和峰值内存
+    def sample(self):
+        if self.process is None or self.process.state() != QProcess.Running:
+            return
+        usage = process_usage(self.process.processId())
+        if usage is None:
+            return
+        cpu_time, peak = usage
+        now = time.perf_counter()
+        if self.last_sample is not None and now > self.last_sample[1]:
+            self.cpu_percent = (cpu_time - self.last_sample[0]) / (now - self.last_sample[1]) * 100
+        self.last_sample = (cpu_time, now)
+        if peak is not None:
+            self.peak_memory = max(self.peak_memory or 0, peak)
+
+    # 已运行的时间（秒）
+    def elapsed(self):
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @timed('run.stdout')
+    def handle_stdout(self):
+        self.output.write(self.stdout_decoder.feed(self.process.readAllStandardOutput()), 'stdout')
+
+    @timed('run.stderr')
+    def handle_stderr(self):
+        self.output.write(self.stderr_decoder.feed(self.process.readAllStandardError()), 'stderr')
+
+    def process_finished(self, exit_code, exit_status):
+        self.handle_stdout()  # 读取进程退出前剩余的输出
+        self.handle_stderr()
+        self.output.write(self.stdout_decoder.flush(), 'stdout')
+        self.output.write(self.stderr_decoder.flush(), 'stderr')
+        self.finish(exit_code if exit_status == QProcess.NormalExit else -1)
+
+    def process_error(self, error):
+        if error == QProcess.FailedToStart:
+            self.output.append(f"Error: {self.process.errorString()}", 'stderr')
+            self.finish(-1)
+
+    def finish(self, exit_code):
+        if self.state != 'running':
+            return
+        self.finished_at = time.perf_counter()
+        self.exit_code = exit_code
+        self.process.deleteLater()  # 快速运行的工作进程用过即退出，普通进程每次运行重新创建
+        self.process = None
+        if self.stopping:
+            self.output.append("Code execution stopped.")
+            self.set_state('stopped')
+        else:
+            self.output.append(f"Exited with code {exit_code} ({self.elapsed():.2f}s)")
+            self.set_state('finished' if exit_code == 0 else 'failed')
+        self.finished.emit(self)
+
+    # 编辑器关闭时直接结束进程
+    def kill(self):
+        if self.process is not None and self.process.state() != QProcess.NotRunning:
+            self.process.kill()
+            self.process.waitForFinished(1000)
+
+    def remove_files(self):
+        if self.temp_path is not None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+
+
+# 运行调度器，同时运行的会话数不超过CPU核数，其余的排队等待
+class RunScheduler(QObject):
+    changed = pyqtSignal()  # 会话列表或会话状态发生了变化
+    SAMPLE_INTERVAL = 1000  # 采样CPU和内存的间隔（毫秒）
+
+    def __init__(self, limit, pool_provider, parent=None):
+        super().__init__(parent)
+        self.limit = max(1, limit)  # 同时运行的最大会话数
+        self.pool_provider = pool_provider  # 返回快速运行使用的预热解释器池
+        self.sessions = []  # 全部会话，按创建顺序
+        self.queue = collections.deque()  # 排队中的会话
+        self.counter = 0
+
+        self.sample_timer = QTimer(self)
+        self.sample_timer.setInterval(self.SAMPLE_INTERVAL)
+        self.sample_timer.timeout.connect(self.sample)
+
+    def create_session(self, tab, title, max_lines=10000):
+        self.counter += 1
+        session = RunSession(self.counter, tab, title, max_lines, self)
+        session.state_changed.connect(lambda _: self.changed.emit())
+        session.finished.connect(self.session_finished)
+        self.sessions.append(session)
+        self.changed.emit()
+        return session
+
+    def running_count(self):
+        return sum(1 for session in self.sessions if session.state == 'running')
+
+    # 提交一次已准备好的运行，有空闲名额时立即启动
+    def submit(self, session):
+        self.queue.append(session)
+        self.start_queued()
+
+    def start_queued(self):
+        while self.queue and self.running_count() < self.limit:
+            session = self.queue.popleft()
+            if session.state != 'queued':
+                continue  # 排队期间已被取消
+            session.start(self.pool_provider() if session.mode == 'fast' else None)
+        if self.running_count() and not self.sample_timer.isActive():
+            self.sample_timer.start()
+
+    # 一个会话结束后启动排队中的下一个会话
+    def session_finished(self, session):
+        QTimer.singleShot(0, self.start_queued)  # 在finished信号处理完之后再启动，避免重入
+        if not self.running_count():
+            self.sample_timer.stop()
+
+    def sample(self):
+        for session in self.sessions:
+            if session.state == 'running':
+                session.sample()
+        self.changed.emit()
+
+    # 移除已结束的会话，返回被移除的会话
+    def clear_finished(self):
+        removed = [session for session in self.sessions if not session.is_active()]
+        self.sessions = [session for session in self.sessions if session.is_active()]
+        for session in removed:
+            session.remove_files()
+            session.deleteLater()
+        self.changed.emit()
+        return removed
+
+    # 编辑器关闭时结束全部运行
+    def shutdown(self):
+        self.queue.clear()
+        for session in self.sessions:
+            session.kill()
+            session.remove_files()
+
+# 根据插件的来源地址生成插件名，直接输入的代码使用 injected
+def plugin_name(source):
+    if not source:
+        return 'injected'
+    path = source.split('?', 1)[0].split('#', 1)[0].rstrip('/')
+    name = os.path.splitext(path.rsplit('/', 1)[-1])[0]
+    return re.sub(r'\W', '_', name) or 'plugin'
+
+
+# 插件宿主进程：插件作为模块常驻在一个长期运行的Python进程中，与运行用户代码的进程互不影响
+# 消息格式与 plugin_host.py 相同：4 字节大端长度 + UTF-8 编码的 JSON
+class PluginHostProcess(QObject):
+    HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plugin_host.py')
+    message = pyqtSignal(dict)  # 宿主进程返回的消息
+    error_output = pyqtSignal(str)  # 宿主进程直接写到标准错误的输出
+    exited = pyqtSignal(int)  # 宿主进程意外退出，参数为退出码
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = None
+        self.buffer = bytearray()  # 尚未组成完整消息的数据
+        self.stderr_decoder = StreamDecoder()
+        self.request_counter = 0
+        self.stopping = False
+
+    # 第一次发送请求时启动宿主进程，进程退出后再次发送时重新启动
+    def ensure_started(self):
+        if self.process is not None and self.process.state() != QProcess.NotRunning:
+            return
+        self.buffer.clear()
+        self.stderr_decoder = StreamDecoder()
+        process = QProcess(self)
+        process.setProcessEnvironment(python_process_environment())
+        process.readyReadStandardOutput.connect(self.read_messages)
+        process.readyReadStandardError.connect(self.read_stderr)
+        process.finished.connect(self.process_finished)
+        process.start('python', ['-u', self.HOST_SCRIPT])
+        self.process = process
+
+    # 发送一条请求，返回请求编号
+    def send(self, command, **fields):
+        self.ensure_started()
+        self.request_counter += 1
+        fields.update(id=self.request_counter, cmd=command)
+        payload = json.dumps(fields, ensure_ascii=False).encode('utf-8')
+        self.process.write(len(payload).to_bytes(4, 'big') + payload)
+        return self.request_counter
+
+    def load(self, name, code, source=None):
+        return self.send('load', name=name, code=code, source=source)
+
+    def unload(self, name):
+        return self.send('unload', name=name)
+
+    def list_plugins(self):
+        return self.send('list')
+
+    # 解析宿主进程发来的消息，一次读取的数据可能包含多条或不完整的消息
+    def read_messages(self):
+        self.buffer += bytes(self.process.readAllStandardOutput())
+        while len(self.buffer) >= 4:
+            size = int.from_bytes(self.buffer[:4], 'big')
+            if len(self.buffer) < 4 + size:
+                break
+            payload = bytes(self.buffer[4:4 + size])
+            del self.buffer[:4 + size]
+            self.message.emit(json.loads(payload.decode('utf-8')))
+
+    def read_stderr(self):
+        self.error_output.emit(self.stderr_decoder.feed(self.process.readAllStandardError()))
+
+    def process_finished(self, exit_code):
+        self.read_messages()
+        self.read_stderr()
+        if not self.stopping:
+            self.exited.emit(exit_code)
+
+    # 结束宿主进程：关闭标准输入后宿主进程会调用各插件的 teardown() 再退出
+    def stop(self):
+        if self.process is None or self.process.state() == QProcess.NotRunning:
+            return
+        self.stopping = True
+        self.process.closeWriteChannel()
+        if not self.process.waitForFinished(2000):
+            self.process.kill()
+            self.process.waitForFinished(1000)
+        self.stopping = False
+
+
+# PyHub的数据目录（缓存、崩溃恢复副本等），位于用户主目录下
+def data_path(*parts):
+    directory = os.path.join(os.path.expanduser('~'), '.pyhub', *parts)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+# 计算文本内容的哈希，用于判断内容是否真正发生了变化
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# 代码编辑器，记录文档对应的真实文件路径和已保存内容的哈希
+class CodeEditor(QsciScintilla):
+    ERROR_INDICATOR = 8  # 指示器编号，0-7由词法分析器使用
+    WARNING_INDICATOR = 9
+    ERROR_MARKER = 1  # 页边标记编号
+    WARNING_MARKER = 2
+    DIAGNOSTIC_MARGIN = 1  # 显示检查标记的页边
+    SNIPPET_FIELD_INDICATOR = 10  # 代码片段中带默认值的占位符
+    SNIPPET_STOP_INDICATOR = 11  # 空占位符，标在占位符之后的一个字符上，在占位符处输入的文字可能并入其中，
+    SNIPPET_END_INDICATOR = 12  # 所以位置取范围的最后一个字符。代码片段展开后光标最终的位置也这样标记
+    WORD = re.compile(r'\w+')
+
+    def __init__(self, file_path=None, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path  # 文件的绝对路径，新建文件为None
+        self.saved_hash = None  # 磁盘上内容的哈希
+        self.recovery_id = uuid.uuid4().hex  # 崩溃恢复副本的文件名
+        self.diagnostics = {}  # 后台检查的结果 {行号: [消息]}，行号从0开始
+
+        # 错误用红色波浪线和圆点标记，警告用黄色
+        for indicator, marker, color in ((self.ERROR_INDICATOR, self.ERROR_MARKER, '#F14C4C'),
+                                         (self.WARNING_INDICATOR, self.WARNING_MARKER, '#CCA700')):
+            self.indicatorDefine(QsciScintilla.SquiggleIndicator, indicator)
+            self.setIndicatorForegroundColor(QColor(color), indicator)
+            self.markerDefine(QsciScintilla.Circle, marker)
+            self.setMarkerBackgroundColor(QColor(color), marker)
+            self.setMarkerForegroundColor(QColor(color), marker)
+        self.setMarginType(self.DIAGNOSTIC_MARGIN, QsciScintilla.SymbolMargin)
+        self.setMarginWidth(self.DIAGNOSTIC_MARGIN, 14)
+        self.setMarginMarkerMask(self.DIAGNOSTIC_MARGIN, (1 << self.ERROR_MARKER) | (1 << self.WARNING_MARKER))
+
+        # 代码片段的占位符：展开后用方框标出，按Tab键依次跳转；指示器会随编辑移动，无需自己记录位置
+        self.snippet_handler = None  # 按Tab键时调用，返回True表示已处理
+        self.snippet_active = False
+        self.indicatorDefine(QsciScintilla.BoxIndicator, self.SNIPPET_FIELD_INDICATOR)
+        self.setIndicatorForegroundColor(QColor('#808080'), self.SNIPPET_FIELD_INDICATOR)
+        self.indicatorDefine(QsciScintilla.HiddenIndicator, self.SNIPPET_STOP_INDICATOR)
+        self.indicatorDefine(QsciScintilla.HiddenIndicator, self.SNIPPET_END_INDICATOR)
+
+    def keyPressEvent(self, event):
+        if (event.key() == Qt.Key_Tab and not event.modifiers() and not self.isListActive()
+                and self.snippet_handler is not None and self.snippet_handler(self)):
+            return
+        super().keyPressEvent(event)
+
+    # 在光标处插入代码片段，replace_length是光标前要替换的字节数（触发词），多行片段按当前行缩进
+    def insert_snippet(self, body, replace_length=0):
+        self.clear_snippet()
+        line, index = self.getCursorPosition()
+        indent = re.match(r'[ \t]*', self.text(line)).group()
+        text, fields, stops, final = expand_snippet(body.replace('\n', '\n' + indent))
+        position = self.SendScintilla(QsciScintilla.SCI_GETCURRENTPOS) - replace_length
+        self.beginUndoAction()
+        self.SendScintilla(QsciScintilla.SCI_SETSEL, position, position + replace_length)
+        self.replaceSelectedText(text)
+        self.endUndoAction()
+        self.fill_indicator(self.SNIPPET_FIELD_INDICATOR, [(position + start, end - start) for start, end in fields])
+        self.fill_indicator(self.SNIPPET_STOP_INDICATOR, [(position + stop, 1) for stop in stops])
+        self.fill_indicator(self.SNIPPET_END_INDICATOR, [(position + final, 1)])
+        self.snippet_active = True
+        self.SendScintilla(QsciScintilla.SCI_SETSEL, position, position)
+        if not self.next_snippet_field(True):
+            self.SendScintilla(QsciScintilla.SCI_GOTOPOS, position + final)
+
+    def fill_indicator(self, indicator, ranges):
+        self.SendScintilla(QsciScintilla.SCI_SETINDICATORCURRENT, indicator)
+        for start, length in ranges:
+            if length > 0 and start + length <= self.length():  # 位于文档末尾的位置无法标记，视为文档末尾
+                self.SendScintilla(QsciScintilla.SCI_INDICATORFILLRANGE, start, length)
+
+    # 文档中某个指示器的全部范围 [(起始, 结束)]
+    def indicator_ranges(self, indicator):
+        ranges = []
+        position = 0
+        length = self.length()
+        while position < length:
+            end = self.SendScintilla(QsciScintilla.SCI_INDICATOREND, indicator, position)
+            if self.SendScintilla(QsciScintilla.SCI_INDICATORVALUEAT, indicator, position):
+                ranges.append((position, end))
+            if end <= position:
+                break
+            position = end
+        return ranges
+
+    # 跳转到光标之后的下一个占位符（include_current时包括光标处的占位符），
+    # 没有占位符时跳转到最终位置并结束代码片段，返回是否已跳转
+    def next_snippet_field(self, include_current=False):
+        if not self.snippet_active:
+            return False
+        current = self.SendScintilla(QsciScintilla.SCI_GETSELECTIONSTART)
+        ends = self.indicator_ranges(self.SNIPPET_END_INDICATOR)
+        final = ends[0][1] - 1 if ends else self.length()
+        if current > final:
+            self.clear_snippet()  # 光标已离开代码片段
+            return False
+        targets = self.indicator_ranges(self.SNIPPET_FIELD_INDICATOR)
+        targets += [(end - 1, end - 1) for _, end in self.indicator_ranges(self.SNIPPET_STOP_INDICATOR)]
+        targets = sorted(target for target in targets
+                         if target[0] > current or (include_current and target[0] == current))
+        if targets:
+            start, end = targets[0]
+            self.SendScintilla(QsciScintilla.SCI_SETSEL, start, end)
+        else:
+            self.SendScintilla(QsciScintilla.SCI_GOTOPOS, final)
+            self.clear_snippet()
+        return True
+
+    def clear_snippet(self):
+        for indicator in (self.SNIPPET_FIELD_INDICATOR, self.SNIPPET_STOP_INDICATOR, self.SNIPPET_END_INDICATOR):
+            self.SendScintilla(QsciScintilla.SCI_SETINDICATORCURRENT, indicator)
+            self.SendScintilla(QsciScintilla.SCI_INDICATORCLEARRANGE, 0, self.length())
+        self.snippet_active = False
+
+    # 显示后台检查的结果：标出出错的单词，在页边添加标记
+    @timed('editor.show_diagnostics')
+    def show_diagnostics(self, diagnostics):
+        for indicator in (self.ERROR_INDICATOR, self.WARNING_INDICATOR):
+            self.SendScintilla(QsciScintilla.SCI_SETINDICATORCURRENT, indicator)
+            self.SendScintilla(QsciScintilla.SCI_INDICATORCLEARRANGE, 0, self.length())
+        self.markerDeleteAll(self.ERROR_MARKER)
+        self.markerDeleteAll(self.WARNING_MARKER)
+        self.diagnostics = {}
+        last_line = max(self.lines() - 1, 0)
+        for line_no, column, severity, message in diagnostics:
+            line = min(line_no - 1, last_line)
+            text = self.text(line).rstrip('\r\n')
+            column = min(column, len(text))
+            match = self.WORD.match(text, column)
+            end = match.end() if match else len(text)
+            if end <= column:
+                column = max(column - 1, 0)  # 错误位置在行尾时标出最后一个字符
+                end = len(text)
+            error = severity == 'error'
+            self.fillIndicatorRange(line, column, line, end,
+                                    self.ERROR_INDICATOR if error else self.WARNING_INDICATOR)
+            self.markerAdd(line, self.ERROR_MARKER if error else self.WARNING_MARKER)
+            self.diagnostics.setdefault(line, []).append(message)
+
+    # 加载文件内容，不标记为已修改
+    def load_text(self, text):
+        self.setText(text)
+        self.saved_hash = content_hash(text)
+        self.setModified(False)
+
+    # QScintilla在绘制时才对可见区域做语法高亮，绘制的耗时包括词法分析的耗时
+    @timed('editor.paint (lexer)')
+    def paintEvent(self, event):
+        super().paintEvent(event)
+
+
+# 编辑器样式配置：一个设置好字体的QsciLexerPython，颜色由主题决定
+# QScintilla允许多个编辑器共用同一个词法分析器，修改颜色时所有编辑器会一起更新
+class EditorProfile:
+    def __init__(self, font, parent=None):
+        self.lexer = QsciLexerPython(parent)
+        self.lexer.setFont(font)  # 字体只设置一次，应用到所有样式
+        self.styles = [style for style in range(128) if self.lexer.description(style)]  # 词法分析器定义的样式
+        self.colors = {}  # 当前的 {样式: (文字颜色, 背景颜色)}
+
+    # 应用主题的颜色，主题没有指定的样式使用词法分析器的默认颜色，只修改发生变化的样式
+    def apply_theme(self, theme):
+        for style in self.styles:
+            color = theme.styles.get(style) or theme.color or self.lexer.defaultColor(style)
+            paper = theme.paper or self.lexer.defaultPaper(style)
+            current = self.colors.get(style)
+            if current is None or current[0] != color:
+                self.lexer.setColor(color, style)
+            if current is None or current[1] != paper:
+                self.lexer.setPaper(paper, style)
+            self.colors[style] = (color, paper)
+
+
+# 标签页工厂：每个文档只创建一个编辑器，所有编辑器共享同一个样式配置
+class EditorFactory:
+    def __init__(self, parent=None):
+        self.profile = EditorProfile(QFont("Segoe UI", 10, QFont.Normal), parent)
+
+    # 创建一个编辑器并载入文本
+    def create(self, text='', file_path=None):
+        editor = CodeEditor(file_path)
+        editor.setLexer(self.profile.lexer)  # 使用共享的词法分析器，无需重新配置颜色和字体
+        editor.load_text(text)  # 设置初始文本
+        editor.setMinimumSize(800, 600)  # 设置编辑器最小大小
+        return editor
+
+
+# 光标前的代码片段触发词
+SNIPPET_TRIGGER = re.compile(r'\w+$')
+SNIPPET_LIST_ID = 1  # 代码片段触发词列表的编号，用于区分QScintilla的用户列表
+
+# 光标前的补全上下文：可选的"模块别名."和正在输入的名称前缀
+COMPLETION_CONTEXT = re.compile(r'(?:([A-Za-z_]\w*)\.)?([A-Za-z_]\w*)?$')
+
+
+# 大文件行索引线程：分块扫描mmap中的换行符，逐步把行起始位置交给界面线程
+class LineIndexThread(QThread):
+    progress = pyqtSignal(object, bool)  # 新增的行起始位置（array），是否已扫描完成
+    CHUNK_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, mapped, parent=None):
+        super().__init__(parent)
+        self.mapped = mapped
+        self.cancelled = False
+
+    def run(self):
+        size = len(self.mapped)
+        position = 0
+        while position < size and not self.cancelled:
+            chunk = self.mapped[position:position + self.CHUNK_SIZE]
+            # 以每行长度累加出下一行的起始位置，全部在C层完成，避免逐行的Python循环
+            lengths = map(len, chunk.split(b'\n')[:-1])
+            offsets = array.array('q', map(position.__add__, itertools.accumulate(map((1).__add__, lengths))))
+            position += len(chunk)
+            self.progress.emit(offsets, position >= size)
+        if size == 0:
+            self.progress.emit(array.array('q'), True)
+
+
+# 大文件查找线程：分块在mmap中查找，每块查找之间释放GIL，查找整个文件时界面线程仍能响应
+class LargeFileSearchThread(QThread):
+    found = pyqtSignal(object, int)  # 查找线程，找到的位置，未找到时为-1
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, mapped, needle, start, parent=None):
+        super().__init__(parent)
+        self.mapped = mapped
+        self.needle = needle
+        self.start_position = start
+        self.cancelled = False
+
+    # 在[begin, end)中查找，相邻的块重叠len(needle)-1字节，跨越块边界的结果不会遗漏
+    def search(self, begin, end):
+        position = begin
+        while position < end and not self.cancelled:
+            found = self.mapped.find(self.needle, position, min(end, position + self.CHUNK_SIZE + len(self.needle) - 1))
+            if found >= 0:
+                return found
+            position += self.CHUNK_SIZE
+        return -1
+
+    def run(self):
+        position = self.search(self.start_position, len(self.mapped))
+        if position < 0:
+            position = self.search(0, self.start_position + len(self.needle))  # 回到文件开头继续查找
+        if not self.cancelled:
+            self.found.emit(self, position)
+
+
+# 大文件只读查看器：文件通过mmap映射，只解码并绘制可见区域的行，不做语法高亮和代码补全
+class LargeFileViewer(QAbstractScrollArea):
+    MAX_COLUMNS = 1000  # 每行最多显示的字符数
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.mapped)
+        self.line_offsets = array.array('q', [0])  # 每行的起始字节位置
+        self.indexed = False  # 行索引是否已建立完成
+        self.match = None  # 当前搜索结果 (起始位置, 长度)
+        self.last_search = ''
+        self.search_thread = None  # 正在进行的查找
+        self.closed = False
+
+        font = QFont("Consolas", 10)
+        font.setStyleHint(QFont.Monospace)
+        self.setFont(font)
+        self.viewport().setFont(font)
+        metrics = QFontMetrics(font)
+        self.line_height = metrics.height()
+        self.char_width = metrics.horizontalAdvance('0')
+        self.horizontalScrollBar().setRange(0, self.MAX_COLUMNS * self.char_width)
+        self.horizontalScrollBar().setSingleStep(self.char_width * 4)
+
+        # 在后台建立行索引，建立过程中已经可以查看前面的内容
+        self.index_thread = LineIndexThread(self.mapped, self)
+        self.index_thread.progress.connect(self.extend_index)
+        self.index_thread.start()
+
+    # 行索引增加了新的行
+    def extend_index(self, offsets, done):
+        if offsets and offsets[-1] >= self.size:
+            offsets = offsets[:-1]  # 文件以换行结尾时，最后一个位置不是新的一行
+        self.line_offsets.extend(offsets)
+        self.indexed = done
+        self.update_scrollbar()
+        self.viewport().update()
+
+    # 已知的行数
+    def line_count(self):
+        return len(self.line_offsets)
+
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.line_height)
+
+    def update_scrollbar(self):
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setRange(0, max(0, self.line_count() - self.visible_line_count()))
+        scrollbar.setPageStep(self.visible_line_count())
+
+    # 读取一行的内容
+    def line_text(self, line_no):
+        start = self.line_offsets[line_no]
+        if line_no + 1 < len(self.line_offsets):
+            end = self.line_offsets[line_no + 1] - 1
+        else:
+            end = self.mapped.find(b'\n', start, start + self.MAX_COLUMNS * 4)
+            end = min(self.size, start + self.MAX_COLUMNS * 4) if end < 0 else end
+        data = self.mapped[start:min(end, start + self.MAX_COLUMNS * 4)]
+        return data.rstrip(b'\r').decode('utf-8', errors='replace')[:self.MAX_COLUMNS].expandtabs(4)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbar()
+
+    # 只绘制可见区域的行
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), QColor('#1E1E1E'))
+        if self.closed:
+            return  # 映射已释放
+        first = self.verticalScrollBar().value()
+        last = min(self.line_count(), first + self.visible_line_count() + 1)
+        gutter = (len(str(self.line_count())) + 2) * self.char_width
+        x_offset = gutter - self.horizontalScrollBar().value()
+        ascent = painter.fontMetrics().ascent()
+        for i, line_no in enumerate(range(first, last)):
+            y = i * self.line_height
+            text = self.line_text(line_no)
+            if self.match is not None:
+                self.paint_match(painter, line_no, text, x_offset, y)
+            painter.setPen(QColor('#D4D4D4'))
+            painter.drawText(x_offset, y + ascent, text)
+            painter.fillRect(0, y, gutter - self.char_width, self.line_height, QColor('#2E2E2E'))
+            painter.setPen(QColor('#858585'))
+            painter.drawText(0, y + ascent, str(line_no + 1).rjust(len(str(self.line_count()))))
+
+    # 高亮搜索结果
+    def paint_match(self, painter, line_no, text, x_offset, y):
+        start, length = self.match
+        line_start = self.line_offsets[line_no]
+        line_end = self.line_offsets[line_no + 1] if line_no + 1 < self.line_count() else self.size + 1
+        if line_start <= start < line_end:
+            prefix = self.mapped[line_start:start].decode('utf-8', errors='replace').expandtabs(4)
+            matched = self.mapped[start:start + length].decode('utf-8', errors='replace')
+            painter.fillRect(x_offset + len(prefix) * self.char_width, y,
+                             len(matched) * self.char_width, self.line_height, QColor('#515C6A'))
+
+    def keyPressEvent(self, event):
+        scrollbar = self.verticalScrollBar()
+        key = event.key()
+        if key == Qt.Key_F3:
+            self.find(self.last_search)
+        elif key == Qt.Key_Down:
+            scrollbar.setValue(scrollbar.value() + 1)
+        elif key == Qt.Key_Up:
+            scrollbar.setValue(scrollbar.value() - 1)
+        elif key == Qt.Key_PageDown:
+            scrollbar.setValue(scrollbar.value() + scrollbar.pageStep())
+        elif key == Qt.Key_PageUp:
+            scrollbar.setValue(scrollbar.value() - scrollbar.pageStep())
+        elif key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            scrollbar.setValue(0)
+        elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            scrollbar.setValue(scrollbar.maximum())
+        else:
+            super().keyPressEvent(event)
 
-    # 编辑选中的代码片段
-    def edit_snippet(self):
-        item = self.snippets_list.currentItem()  # 获取当前选中的片段
-        if item:
-            new_snippet, ok = QInputDialog.getText(
-                self, "Edit Snippet", "Edit your snippet:", text=item.text()
-            )
-            if ok and new_snippet:
-                item.setText(new_snippet)  # 更新片段内容
+    # 在映射的文件中查找下一处，从当前结果之后（或当前可见的第一行）开始
+    # 查找在后台线程中进行，结果由search_finished处理，新的查找会取消尚未完成的查找
+    def find(self, text):
+        if not text or self.closed:
+            return
+        self.last_search = text
+        needle = text.encode('utf-8')
+        if self.match is not None:
+            start = self.match[0] + 1
+        else:
+            start = self.line_offsets[self.verticalScrollBar().value()]
+        self.cancel_search()
+        self.search_thread = LargeFileSearchThread(self.mapped, needle, start, self)
+        self.search_thread.found.connect(self.search_finished)
+        self.search_thread.finished.connect(self.search_thread.deleteLater)
+        self.search_thread.start()
 
-    # 删除选中的代码片段
-    def delete_snippet(self):
-        item = self.snippets_list.currentItem()  # 获取当前选中的片段
-        if item:
-            self.snippets_list.takeItem(self.snippets_list.row(item))  # 删除该片段
+    def cancel_search(self):
+        if self.search_thread is not None:
+            self.search_thread.cancelled = True
+            self.search_thread.wait()  # 最多等待一个块的查找
+            self.search_thread = None
 
+    # 查找完成，跳转到结果所在的行
+    def search_finished(self, thread, position):
+        if thread is not self.search_thread:
+            return  # 已取消的查找
+        self.search_thread = None
+        if position < 0:
+            QMessageBox.information(self.window(), "Find", f"'{self.last_search}' not found.")
+            return
+        self.match = (position, len(thread.needle))
+        line_no = bisect.bisect_right(self.line_offsets, position) - 1
+        if not self.indexed and line_no == self.line_count() - 1:
+            # 结果位于尚未建立索引的区域，暂时无法定位行号
+            QMessageBox.information(self.window(), "Find", "Match found beyond the indexed part of the file, "
+                                                    "please retry when indexing has finished.")
+            self.match = None
+            return
+        self.verticalScrollBar().setValue(max(0, line_no - self.visible_line_count() // 2))
+        self.viewport().update()
 
-# 资源管理器类，继承自QDockWidget，用于管理项目中的资源文件
-class ResourceManager(QDockWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Resource Manager")  # 设置窗口标题
-        self.setGeometry(400, 100, 250, 400)  # 设置窗口大小和位置
+    # 关闭文件，先结束仍在使用映射的线程再释放映射，可以重复调用
+    def close_file(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.cancel_search()
+        self.index_thread.cancelled = True
+        self.index_thread.wait()
+        self.mapped.close()
+        self.file.close()
 
-        self.resource_list = QListWidget(self)  # 创建资源列表
-        self.load_resources()  # 加载示例资源
 
-        self.setWidget(self.resource_list)  # 设置资源列表为DockWidget的主部件
+# 会话恢复时的占位标签页，只记录文件路径和视图位置，第一次切换到该标签页时才读取文件并创建编辑器
+class SessionPlaceholder(QLabel):
+    def __init__(self, record, parent=None):
+        super().__init__("Loading...", parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.file_path = record['path']
+        self.record = record  # 光标行列和第一可见行
 
-    # 加载示例资源
-    def load_resources(self):
-        self.resource_list.addItems(["image1.png", "style.css", "script.js"])  # 示例资源
+    # 把记录的光标和滚动位置应用到真正的标签页上
+    def restore_view(self, tab):
+        first_line = self.record.get('first_line', 0)
+        if isinstance(tab, LargeFileViewer):
+            tab.verticalScrollBar().setValue(first_line)
+        else:
+            tab.setCursorPosition(self.record.get('line', 0), self.record.get('index', 0))
+            tab.setFirstVisibleLine(first_line)
 
 
-# 任务管理器类，继承自QDockWidget，用于管理任务列表
-class TaskManager(QDockWidget):
-    def __init__(self, parent=None):
+# 自动保存：编辑停止一段时间后保存所有修改过的标签页，写文件在后台线程中进行
+# 有路径的文件原子写入原文件，新建文件写入崩溃恢复副本
+class AutoSaver(QObject):
+    write_done = pyqtSignal(object, object, str)  # 编辑器，写入任务，内容哈希
+
+    def __init__(self, delay=2000, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Task Manager")  # 设置窗口标题
-        self.setGeometry(600, 100, 300, 400)  # 设置窗口大小和位置
+        self.dirty = set()  # 有未保存修改的编辑器
+        self.pending = {}  # {编辑器: 尚未完成的写入数}
+        self.forgotten = set()  # 已停止跟踪但仍有写入未完成的编辑器，写入完成后忽略结果
+        self.writer = None  # 单线程顺序写入，第一次保存时创建
+        self.recovery_dir = data_path('recovery')
+        self.write_done.connect(self.finish_write)
 
-        self.task_list = QListWidget()  # 创建任务列表
-        self.add_task_button = QPushButton("Add Task", self)  # 添加任务按钮
-        self.add_task_button.clicked.connect(self.add_task)  # 按钮点击时，添加任务
+        # 防抖定时器：每次编辑都会重新计时，停止输入后才保存
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
 
-        # 设置布局，将任务列表和添加按钮放入布局
-        layout = QVBoxLayout()
-        layout.addWidget(self.task_list)
-        layout.addWidget(self.add_task_button)
+    # 开始跟踪一个编辑器
+    def track(self, editor):
+        editor.textChanged.connect(lambda: self.mark_dirty(editor))
 
-        container = QWidget()
-        container.setLayout(layout)
-        self.setWidget(container)
+    def mark_dirty(self, editor):
+        if editor.isModified():
+            self.dirty.add(editor)
+            self.timer.start()
 
-    # 添加任务
-    def add_task(self):
-        task_text, ok = QInputDialog.getText(self, "New Task", "Task description:")  # 弹出输入框
-        if ok and task_text:
-            self.task_list.addItem(task_text)  # 将任务添加到任务列表中
+    # 停止跟踪编辑器，关闭标签页时调用，标签页可能在写入完成前就被删除
+    def forget(self, editor):
+        self.dirty.discard(editor)
+        if editor in self.pending:
+            self.forgotten.add(editor)
+        self.discard_recovery(editor)
 
+    # 保存所有修改过的编辑器，内容与上次保存相同时跳过写入
+    def save_dirty(self):
+        if self.dirty and self.writer is None:
+            import concurrent.futures
+            self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        for editor in list(self.dirty):
+            self.dirty.discard(editor)
+            text = editor.text()
+            digest = content_hash(text)
+            if digest == editor.saved_hash:
+                editor.setModified(False)  # 改动已被撤销，无需写入
+                self.discard_recovery(editor)
+                continue
+            if editor.file_path:
+                future = self.writer.submit(atomic_write, editor.file_path, text)
+            else:
+                record = {'title': '新建文件', 'text': text}
+                future = self.writer.submit(
+                    atomic_write, self.recovery_path(editor), json.dumps(record, ensure_ascii=False)
+                )
+            self.pending[editor] = self.pending.get(editor, 0) + 1
+            self.forgotten.discard(editor)  # 仍在编辑，之后的写入结果需要处理
+            future.add_done_callback(lambda future, editor=editor, digest=digest:
+                                     self.write_done.emit(editor, future, digest))
 
-# 查找替换对话框，继承自QDialog，允许用户查找和替换代码中的文本
-class FindReplaceDialog(QDialog):
-    def __init__(self, editor, parent=None):
-        super().__init__(parent)
-        self.editor = editor  # 保存传入的编辑器实例，QsciScintilla
-        self.setWindowTitle("Find and Replace")  # 设置窗口标题
-        self.setGeometry(300, 300, 400, 150)  # 设置窗口大小和位置
+    # 写入完成，回到界面线程更新编辑器状态
+    def finish_write(self, editor, future, digest):
+        self.pending[editor] -= 1
+        if not self.pending[editor]:
+            del self.pending[editor]
+        if editor in self.forgotten:
+            # 标签页已关闭（部件可能已被删除）或已手动保存，删除写入晚于forget的恢复副本
+            if editor not in self.pending:
+                self.forgotten.discard(editor)
+            self.discard_recovery(editor)
+            return
+        error = future.exception()
+        if error is not None:
+            self.parent().statusBar().showMessage(f"Autosave failed: {error}")
+            return
+        if not editor.file_path:
+            return  # 恢复副本只用于崩溃恢复，文档仍是未保存状态
+        editor.saved_hash = digest
+        self.discard_recovery(editor)
+        if content_hash(editor.text()) == digest:
+            editor.setModified(False)  # 写入期间没有新的编辑
+        self.parent().statusBar().showMessage(f"Autosaved: {editor.file_path}")
 
-        # 创建查找和替换输入框
-        find_label = QLabel("Find:")
-        self.find_input = QLineEdit()
-        replace_label = QLabel("Replace:")
-        self.replace_input = QLineEdit()
+    def recovery_path(self, editor):
+        return os.path.join(self.recovery_dir, f"{editor.recovery_id}.json")
 
-        # 匹配大小写按钮
-        self.case_checkbox = QPushButton("Match Case")
-        self.case_checkbox.setCheckable(True)  # 使按钮可切换
+    def discard_recovery(self, editor):
+        try:
+            os.remove(self.recovery_path(editor))
+        except OSError:
+            pass
 
-        # 查找、替换和全部替换按钮
-        find_button = QPushButton("Find")
-        find_button.clicked.connect(self.find_text)
-        replace_button = QPushButton("Replace")
-        replace_button.clicked.connect(self.replace_text)
-        replace_all_button = QPushButton("Replace All")
-        replace_all_button.clicked.connect(self.replace_all_text)
+    # 读取上次异常退出时留下的恢复副本
+    def pending_recoveries(self):
+        records = []
+        for name in sorted(os.listdir(self.recovery_dir)):
+            path = os.path.join(self.recovery_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    records.append((path, json.load(file)))
+            except (OSError, ValueError):
+                continue
+        return records
 
-        # 设置布局
-        layout = QVBoxLayout()
+    # 等待后台写入完成，程序正常退出时调用
+    def shutdown(self):
+        self.timer.stop()
+        self.save_dirty()
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
 
-        # 查找输入框布局
-        find_layout = QHBoxLayout()
-        find_layout.addWidget(find_label)
-        find_layout.addWidget(self.find_input)
-        layout.addLayout(find_layout)
 
-        # 替换输入框布局
-        replace_layout = QHBoxLayout()
-        replace_layout.addWidget(replace_label)
-        replace_layout.addWidget(self.replace_input)
-        layout.addLayout(replace_layout)
+# 插件下载：在后台线程中通过连接池复用的requests.Session下载插件代码，并缓存到磁盘
+# 缓存按内容的SHA-256存放，相同的内容只保存一份；再次下载时用ETag/Last-Modified向服务器确认缓存是否仍然有效，
+# 服务器无法访问时使用缓存的副本
+class PluginFetcher(QObject):
+    fetch_done = pyqtSignal(str, object)  # 地址，下载任务
+    fetched = pyqtSignal(str, str, str)  # 地址，代码，来源：network（下载）、cache（缓存有效）、offline（服务器无法访问）
+    failed = pyqtSignal(str, str)  # 地址，错误信息
 
-        # 选项布局
-        options_layout = QHBoxLayout()
-        options_layout.addWidget(self.case_checkbox)
-        layout.addLayout(options_layout)
+    def __init__(self, timeout=15, parent=None):
+        super().__init__(parent)
+        self.timeout = timeout  # 读取超时（秒），连接超时不超过5秒
+        self.cache_dir = data_path('plugin_cache')
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        self.index = None  # {地址: {'sha256', 'etag', 'last_modified', 'encoding'}}，第一次下载时读取
+        self.lock = threading.Lock()  # 保护session和index，下载在多个线程中进行
+        self.session = None
+        self.executor = None
+        self.hits = 0  # 使用缓存的次数
+        self.misses = 0  # 从服务器下载的次数
+        self.fetch_done.connect(self.finish_fetch)
 
-        # 按钮布局
-        buttons_layout = QHBoxLayout()
-        buttons_layout.addWidget(find_button)
-        buttons_layout.addWidget(replace_button)
-        buttons_layout.addWidget(replace_all_button)
-        layout.addLayout(buttons_layout)
+    # 在后台开始下载
+    def fetch(self, url):
+        if self.executor is None:
+            import concurrent.futures
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        future = self.executor.submit(self.download, url)
+        future.add_done_callback(lambda future: self.fetch_done.emit(url, future))
 
-        self.setLayout(layout)
+    # 在后台线程中下载插件，返回 (代码, 来源)
+    def download(self, url):
+        import requests
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
+            if self.index is None:
+                self.index = self.load_index()
+            entry = self.index.get(url)
+        if entry is not None and not os.path.exists(self.object_path(entry['sha256'])):
+            entry = None  # 缓存的内容已被删除
 
-    # 查找文本
-    def find_text(self):
-        find_str = self.find_input.text()  # 获取查找文本
-        if not find_str:
-            return
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.get(url, headers=headers, timeout=(min(5, self.timeout), self.timeout))
+            if response.status_code == 304 and entry is not None:
+                return self.read_object(entry), 'cache'
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            if entry is None:
+                raise
+            return self.read_object(entry), 'offline'
 
-        # 判断是否匹配大小写
-        flags = QsciScintilla.SCFIND_MATCHCASE if self.case_checkbox.isChecked() else 0
-        pos = self.editor.findFirst(
-            find_str,
-            False,
-            self.case_checkbox.isChecked(),
-            False,
-            False,
-            True
-        )
-        if not pos:
-            QMessageBox.information(self, "Find", f"'{find_str}' not found.")  # 未找到时提示
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        if not os.path.exists(self.object_path(digest)):
+            atomic_write(self.object_path(digest), content)
+        entry = {
+            'sha256': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'encoding': response.encoding or 'utf-8',
+        }
+        with self.lock:
+            self.index[url] = entry
+            atomic_write(self.index_path, json.dumps(self.index, indent=4))
+        return self.read_object(entry), 'network'
 
-    # 替换文本
-    def replace_text(self):
-        find_str = self.find_input.text()  # 获取查找文本
-        replace_str = self.replace_input.text()  # 获取替换文本
-        if not find_str:
+    # 下载完成，回到界面线程统计缓存命中并发出结果
+    def finish_fetch(self, url, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.failed.emit(url, str(error))
             return
+        code, source = future.result()
+        if source == 'network':
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.fetched.emit(url, code, source)
 
-        # 获取当前光标选中的文本并进行替换
-        cursor = self.editor.textCursor()
-        selected_text = self.editor.selectedText()
-        if (self.case_checkbox.isChecked() and selected_text == find_str) or \
-           (not self.case_checkbox.isChecked() and selected_text.lower() == find_str.lower()):
-            self.editor.replaceSelectedText(replace_str)
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
 
-        # 查找下一个匹配项
-        self.find_text()
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, digest)
 
-    # 替换所有匹配的文本
-    def replace_all_text(self):
-        find_str = self.find_input.text()  # 获取查找文本
-        replace_str = self.replace_input.text()  # 获取替换文本
-        if not find_str:
-            return
+    def read_object(self, entry):
+        with open(self.object_path(entry['sha256']), 'rb') as file:
+            return file.read().decode(entry.get('encoding') or 'utf-8', errors='replace')
 
-        # 保存当前光标位置
-        current_pos = self.editor.getCursorPosition()
+    # 程序退出时取消尚未开始的下载
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
-        self.editor.beginUndoAction()
-        self.editor.setCursorPosition(0, 0)
-        replaced = 0  # 记录替换次数
-        while self.editor.findFirst(
-            find_str,
-            False,
-            self.case_checkbox.isChecked(),
-            False,
-            False,
-            True
-        ):
-            self.editor.replaceSelectedText(replace_str)
-            replaced += 1  # 每次替换后计数
-        self.editor.endUndoAction()
 
-        # 显示替换结果
-        QMessageBox.information(self, "Replace All", f"Replaced {replaced} occurrences.")
+# 启动时间线：记录启动过程中各阶段完成的时间，可以连同各模块的导入耗时一起导出为JSON，用于跟踪启动速度的变化
+class StartupTimeline:
+    def __init__(self, started):
+        self.started = started
+        self.phases = []  # [(阶段名称, 距离开始的毫秒数)]
 
-        # 恢复光标位置
-        self.editor.setCursorPosition(*current_pos)
+    def mark(self, phase):
+        self.phases.append((phase, round((time.perf_counter() - self.started) * 1000, 1)))
 
-#主题切换
-class ThemeSwitcher(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Theme Switcher")  # 设置窗口标题
-        self.setGeometry(500, 300, 200, 100)  # 设置窗口大小和位置
-        # 创建主题列表
-        self.theme_list = QListWidget(self)
-        self.theme_list.addItems(["Default", "Dark", "Light"])
+    # 在子进程中以 -X importtime 导入本模块，返回每个模块的导入耗时（微秒）
+    def import_times(self):
+        import subprocess
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import PyHub'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        )
+        modules = []
+        for line in result.stderr.splitlines():
+            fields = line.partition('import time:')[2].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue  # 表头或其它输出
+            name = fields[2].rstrip()
+            modules.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,  # 嵌套导入的层级
+                'self_us': int(fields[0]),
+                'cumulative_us': int(fields[1]),
+            })
+        return modules
 
-        # 切换按钮
-        self.switch_button = QPushButton("Switch", self)
-        # 设置布局
-        layout = QVBoxLayout()
-        layout.addWidget(self.theme_list)
-        layout.addWidget(self.switch_button)
-        self.setLayout(layout)
+    # 导出时间线
+    def dump(self, file_path):
+        data = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'phases': [{'phase': phase, 'ms': ms} for phase, ms in self.phases],
+            'imports': self.import_times(),
+        }
+        atomic_write(file_path, json.dumps(data, indent=4))
 
-        # 切换按钮点击事件
-        self.switch_button.clicked.connect(self.apply_theme)
 
-    def apply_theme(self):
-        selected_theme = self.theme_list.currentItem().text()  # 获取当前选中的主题
-        if selected_theme == "Dark":
-            self.parent().setStyleSheet("background-color: #2E2E2E; color: white;")
-        elif selected_theme == "Light":
-            self.parent().setStyleSheet("background-color: white; color: black;")
-        else:
-            self.parent().setStyleSheet("""
-            QMainWindow {
-                background-color: #2E2E2E;
-                color: #FFFFFF;
-            }
-            QPushButton {
-                background-color: #007ACC;
-                color: #FFFFFF;
-                border-radius: 5px;
-                padding: 10px;
-            }
-            QPushButton:hover {
-                background-color: #005EA6;
-            }
-            QTextEdit {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-                border: 1px solid #444;
-            }
-            QListWidget {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-            }
-            QDockWidget {
-                background-color: #2E2E2E;
-            }
-            QLineEdit {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-                border: 1px solid #444;
-                padding: 5px;
-            }
-            QTabWidget::pane { /* The tab widget frame */
-                border-top: 2px solid #C2C7CB;
-            }
-            QTabBar::tab {
-                background: #2E2E2E;
-                color: white;
-                padding: 10px;
-                border: 1px solid #444;
-                border-bottom: none;
-            }
-            QTabBar::tab:selected {
-                background: #1E1E1E;
-                border-bottom: 2px solid #1E1E1E;
-            }
-        """)  # 默认样式
-        self.close()  # 关闭窗口
+startup_timeline = StartupTimeline(startup_started)
+
 
 # Python 编辑器主窗口类，继承自QMainWindow
 class PythonEditor(QMainWindow):
@@ -386,18 +4548,47 @@ class PythonEditor(QMainWindow):
         self.setWindowIcon(QIcon('icon.png'))  # 设置窗口图标
         self.setWindowTitle("PyHub")  # 设置窗口标题
         self.setGeometry(100, 100, 1000, 700)  # 设置窗口大小
+        self.load_user_preferences()  # 加载用户偏好设置
+        session = self.preferences.get('session', {})  # 上次关闭时保存的会话
+        startup_timeline.mark('preferences loaded')
+
+        # 自动保存功能，停止编辑一段时间后保存所有修改过的标签页
+        self.auto_saver = AutoSaver(self.preferences.get('autosave_delay_ms', 2000), self)
+        self.auto_saver.timer.timeout.connect(self.auto_save)
+
+        self.theme_engine = ThemeEngine()  # 主题在控制台和菜单栏创建后再应用
+        self.current_theme = "Default"
+        self.theme_stylesheet = ""  # 当前主题的样式表
+        self.editor_factory = EditorFactory(self)  # 创建编辑器标签页的工厂
 
-        self.apply_styles()  # 应用样式
+        # 项目索引，文件浏览器等功能共享
+        self.project_index = ProjectIndex(self.preferences.get('index_max_files', 200000),
+                                          self.preferences.get('index_max_file_bytes', 100 * 1024 * 1024), self)
+        # 符号索引，为代码补全提供名称
+        self.symbol_index = SymbolIndex(self.project_index, self)
+        # 代码片段库，第一次使用时才打开数据库
+        self.snippet_store = SnippetStore()
+        # 后台语法检查，停止输入一段时间后检查
+        self.lint_checker = LintChecker(self.preferences.get('lint_delay', 400), self)
+        # 项目中的TODO/FIXME/XXX标记，在进程池中扫描，显示在任务管理器中
+        self.todo_index = TodoIndex(self.project_index, self)
+        # 快速打开的路径索引，最近打开的文件排在前面
+        self.quick_open_index = QuickOpenIndex(self.project_index, self)
+        self.recent_files = self.preferences.get('recent_files', [])
         self.tabs = QTabWidget()  # 创建标签页组件
         self.tabs.setTabsClosable(True)  # 启用关闭按钮
         self.tabs.tabCloseRequested.connect(self.close_tab)  # 连接关闭标签页事件
         self.setCentralWidget(self.tabs)  # 将标签页设置为主窗口的中央部件
-        self.add_new_tab()  # 添加一个新标签页
+        self.restore_session_tabs(session)  # 恢复上次打开的文件，没有时添加一个新标签页
+        self.tabs.currentChanged.connect(self.materialize_tab)  # 切换到占位标签页时再加载文件
+        startup_timeline.mark('tabs restored')
 
         # 控制台输出显示框
-        self.console_output = QTextEdit()
-        self.console_output.setReadOnly(True)  # 设置为只读
+        self.console_output = ConsoleView(self.preferences.get('console_max_lines', 10000))
         self.console_output.setStyleSheet("background-color: black; color: white;")  # 设置样式
+        # 输出面板：控制台命令和插件的输出，以及每个运行会话各自的输出
+        self.output_tabs = QTabWidget()
+        self.output_tabs.addTab(self.console_output, "Console")
 
         # 控制台输入框
         self.console_input = QLineEdit()
@@ -405,7 +4596,7 @@ class PythonEditor(QMainWindow):
 
         # 运行按钮
         run_button = QPushButton("Run")
-        run_button.clicked.connect(self.run_code)  # 连接到运行代码的方法
+        run_button.clicked.connect(lambda: self.run_code())  # 连接到运行代码的方法
 
         # 停止按钮，初始隐藏
         self.stop_button = QPushButton("Stop", self)
@@ -416,7 +4607,7 @@ class PythonEditor(QMainWindow):
         console_layout = QVBoxLayout()
         console_layout.addWidget(run_button)
         console_layout.addWidget(self.stop_button)
-        console_layout.addWidget(self.console_output)
+        console_layout.addWidget(self.output_tabs)
         console_layout.addWidget(self.console_input)
 
         console_container = QWidget()
@@ -424,92 +4615,230 @@ class PythonEditor(QMainWindow):
 
         # 将控制台设置为底部停靠窗口
         self.console_dock = QDockWidget("Console", self)
+        self.console_dock.setObjectName("Console")  # 保存和恢复窗口布局时使用
         self.console_dock.setWidget(console_container)
         self.addDockWidget(Qt.BottomDockWidgetArea, self.console_dock)
 
-        # 文件浏览器
-        self.file_browser = FileBrowser(self)
-        self.addDockWidget(Qt.LeftDockWidgetArea, self.file_browser)
 
-        # 资源管理器
-        self.resource_manager = ResourceManager(self)
-        self.addDockWidget(Qt.RightDockWidgetArea, self.resource_manager)
+        startup_timeline.mark('console built')
 
-        # 任务管理器
-        self.task_manager = TaskManager(self)
-        self.addDockWidget(Qt.BottomDockWidgetArea, self.task_manager)
+        # 可选的停靠窗口在第一次打开时才创建：名称 -> (标题, 停靠区域, 创建函数)
+        self.dock_specs = {
+            'FileBrowser': ("File Browser", Qt.LeftDockWidgetArea,
+                            lambda: FileBrowser(self, self.project_index, self.project_folder)),
+            'ResourceManager': ("Resource Manager", Qt.RightDockWidgetArea, lambda: ResourceManager(
+                self.project_index, self.preferences.get('thumbnail_cache_mb', 64), self)),
+            'TaskManager': ("Task Manager", Qt.BottomDockWidgetArea, lambda: TaskManager(self.todo_index, self)),
+            'FindInFilesDock': ("Find in Files", Qt.BottomDockWidgetArea, lambda: FindInFilesDock(self)),
+            'ProfileDock': ("Profiler", Qt.BottomDockWidgetArea, lambda: ProfileDock(self)),
+            'RunsDock': ("Runs", Qt.BottomDockWidgetArea, lambda: RunsDock(self.run_scheduler, self)),
+        }
+        self.docks = {}  # 已创建的停靠窗口
+        self.dock_actions = {}  # View菜单中对应的显示开关
+        folder = session.get('folder')
+        self.project_folder = os.path.abspath(folder if folder and os.path.isdir(folder) else '.')
+        # 上次关闭时显示的停靠窗口，主窗口显示后再创建
+        self.startup_docks = session.get('docks', ['FileBrowser', 'ResourceManager', 'TaskManager'])
 
         self.create_menu()  # 创建菜单栏
-        self.load_user_preferences()  # 加载用户偏好设置
+        self.apply_theme(session.get('theme', "Default"))
+        self.restore_session_layout(session)  # 恢复窗口大小和停靠窗口布局
+        startup_timeline.mark('menu built')
 
-        # 自动保存功能，设置每30秒保存一次
-        self.auto_save_timer = QTimer(self)
-        self.auto_save_timer.timeout.connect(self.auto_save)
-        self.auto_save_timer.start(30000)
+        QTimer.singleShot(0, self.build_startup_docks)  # 主窗口显示后再创建停靠窗口
+        QTimer.singleShot(0, self.restore_recovered_buffers)  # 窗口显示后检查崩溃恢复副本
 
         # 当用户在控制台输入命令时，执行命令
         self.console_input.returnPressed.connect(self.execute_command)
 
-        # 使用QProcess来运行外部Python脚本
-        self.process = QProcess(self)
-        self.process.readyReadStandardOutput.connect(self.handle_stdout)
-        self.process.readyReadStandardError.connect(self.handle_stderr)
-        self.process.finished.connect(self.process_finished)
+        # 运行调度器，每个标签页的代码在自己的进程中运行，同时运行的数量不超过CPU核数
+        self.run_scheduler = RunScheduler(
+            self.preferences.get('max_concurrent_runs', os.cpu_count() or 2), self.run_interpreter_pool, self)
+        self.run_scheduler.changed.connect(self.update_stop_button)
+        self.run_sessions = {}  # {标签页: 运行会话}
+        self.tabs.currentChanged.connect(self.update_stop_button)
+
+        # 快速运行模式的预热解释器池，开启快速运行后才创建
+        self.interpreter_pool = None
+        self.command_jobs = {}  # 正在运行的控制台命令，按任务编号索引
+        self.command_counter = 0
+        self.fast_run_action.setChecked(self.preferences.get('fast_run', False))
+
+        # 插件下载，带磁盘缓存
+        self.plugin_fetcher = PluginFetcher(self.preferences.get('plugin_timeout', 15), self)
+        self.plugin_fetcher.fetched.connect(self.plugin_fetched)
+        self.plugin_fetcher.failed.connect(self.plugin_fetch_failed)
+
+        # 插件宿主进程，插件常驻其中，与运行用户代码的进程分开
+        self.plugin_host = PluginHostProcess(self)
+        self.plugin_host.message.connect(self.handle_plugin_message)
+        self.plugin_host.error_output.connect(lambda text: self.console_output.write(text, 'stderr'))
+        self.plugin_host.exited.connect(self.plugin_host_exited)
+        self.plugins = {}  # {插件名: (代码, 来源地址)}，用于重新加载
+
+        # 性能监视器，指示器显示在状态栏右侧，开启后才显示
+        self.performance_label = QLabel()
+        self.performance_label.hide()
+        self.statusBar().addPermanentWidget(self.performance_label)
+        self.performance_monitor = PerformanceMonitor(self.performance_label, self)
+        self.performance_action.setChecked(self.preferences.get('performance_monitor', False))
 
     # 关闭标签页
     def close_tab(self, index):
         if index >= 0:
             current_tab = self.tabs.widget(index)  # 获取要关闭的标签页
             if current_tab:
+                if isinstance(current_tab, CodeEditor):
+                    self.auto_saver.forget(current_tab)  # 不再自动保存该标签页
+                    self.close_run_session(current_tab)
+                    self.symbol_index.forget(current_tab)
+                    self.lint_checker.forget(current_tab)
+                    self.todo_index.forget(current_tab)
+                elif isinstance(current_tab, LargeFileViewer):
+                    current_tab.close_file()  # 释放文件映射
                 self.tabs.removeTab(index)  # 从标签页中移除该标签页
                 current_tab.deleteLater()  # 删除该部件
 
-    # 运行当前代码
+    # 运行当前代码，每个标签页有自己的运行会话，由调度器决定立即启动还是排队
+    @timed('run_code')
     def run_code(self):
+        mode = 'fast' if self.fast_run_action.isChecked() else None  # 快速运行模式交给预热的解释器执行
+        self.start_run(mode)
+
+    # 在cProfile或tracemalloc下运行当前代码，结果保存在数据目录中，运行结束后显示在Profiler停靠窗口
+    def run_code_measured(self, mode):
+        self.start_run(mode)
+
+    def start_run(self, mode):
         current_tab = self.tabs.currentWidget()
-        if isinstance(current_tab, QsciScintilla):
-            code = current_tab.text()
-            temp_file_path = 'temp_script.py'  # 临时文件路径
-            with open(temp_file_path, 'w', encoding='utf-8') as script_file:
-                script_file.write(code)  # 将代码保存到临时文件中
+        if not isinstance(current_tab, CodeEditor):
+            return
+        session = self.run_session(current_tab)
+        if session.is_active():
+            self.statusBar().showMessage("Code is already running.")  # 该标签页上一次运行尚未结束
+            return
 
-            self.stop_button.setVisible(True)  # 显示停止按钮
+        script_name = current_tab.file_path or 'temp_script.py'
+        stats_path = None
+        if mode in ('profile', 'memory'):
+            slug = os.path.splitext(os.path.basename(script_name))[0]
+            stats_path = os.path.join(data_path('profiles'),
+                                      f"{time.strftime('%Y%m%d-%H%M%S')}-{mode}-{slug}.json")
+        session.title = self.tabs.tabText(self.tabs.indexOf(current_tab))
+        self.output_tabs.setTabText(self.output_tabs.indexOf(session.output), session.title)
+        session.prepare(current_tab.text(), mode, script_name, stats_path)
+        self.run_scheduler.submit(session)
+        self.output_tabs.setCurrentWidget(session.output)
+        if session.state == 'queued':
+            self.statusBar().showMessage(f"Run queued: {self.run_scheduler.running_count()} runs in progress.")
+        else:
             self.statusBar().showMessage("Code is running...")  # 更新状态栏信息
 
-            # 使用QProcess运行Python脚本
-            self.process.start('python', [temp_file_path])
-            
-            
+    # 获取标签页的运行会话，第一次运行时创建，输出面板添加到控制台中
+    def run_session(self, tab):
+        session = self.run_sessions.get(tab)
+        if session is None:
+            title = self.tabs.tabText(self.tabs.indexOf(tab))
+            session = self.run_scheduler.create_session(
+                tab, title, self.preferences.get('console_max_lines', 10000))
+            session.finished.connect(self.run_finished)
+            self.output_tabs.addTab(session.output, title)
+            self.run_sessions[tab] = session
+        return session
 
-    # 停止正在运行的代码
-    def stop_code(self):
-        if self.process.state() == QProcess.ProcessState.Running:
-            self.process.terminate()  # 终止正在运行的进程
-            self.console_output.append("Code execution stopped.")  # 控制台输出停止信息
-            self.stop_button.setVisible(False)  # 隐藏停止按钮
-            self.statusBar().showMessage("Code execution stopped.")  # 更新状态栏信息
+    # 快速运行使用的预热解释器池，尚未创建时创建
+    def run_interpreter_pool(self):
+        if self.interpreter_pool is None:
+            self.create_interpreter_pool()
+        return self.interpreter_pool
 
-    # 处理标准输出
-    def handle_stdout(self):
-        data = self.process.readAllStandardOutput()
-        decoded_data = str(data, encoding='utf-8')  # 将标准输出添加到控制台
-        self.console_output.append(decoded_data.strip()) 
+    # 一次运行结束，性能分析运行显示结果
+    def run_finished(self, session):
+        self.update_stop_button()
+        if session.state == 'stopped':
+            self.statusBar().showMessage("Code execution stopped.")
+            return
+        self.statusBar().showMessage("Code execution finished.")  # 更新状态栏信息
+        if session.mode in ('profile', 'memory'):
+            self.show_profile(session.mode, session.stats_path, session.tab, session.script_name)
 
-    # 处理标准错误
-    def handle_stderr(self):
-        data = self.process.readAllStandardError()  # 获取标准错误
+    # 显示性能分析运行的结果，运行被停止时没有结果文件
+    def show_profile(self, mode, stats_path, tab, script_name):
         try:
-            decoded_data = str(data, encoding='utf-8')
-        except UnicodeDecodeError:
-            decoded_data = str(data, encoding='latin-1')  # 处理解码错误
+            with open(stats_path, 'r', encoding='utf-8') as file:
+                stats = json.load(file)
+        except (OSError, ValueError):
+            self.statusBar().showMessage("No profile data was recorded.")
+            return
+        dock = self.dock('ProfileDock')
+        dock.show_stats(stats, stats_path, tab, script_name)
+        self.set_dock_visible('ProfileDock', True)
 
-        self.console_output.append(decoded_data.strip())  # 去除前后空白字符并添加到控制台
+    # 切换快速运行模式
+    def toggle_fast_run(self, enabled):
+        self.preferences['fast_run'] = enabled
+        self.save_user_preferences()
+        if enabled and self.interpreter_pool is None:
+            self.create_interpreter_pool()
+        elif not enabled and self.interpreter_pool is not None:
+            self.interpreter_pool.shutdown()
+            self.interpreter_pool.deleteLater()
+            self.interpreter_pool = None
+
+    # 创建解释器池，开启快速运行时提前创建，使第一次运行也无需等待
+    def create_interpreter_pool(self):
+        self.interpreter_pool = WarmInterpreterPool(
+            self.preferences.get('fast_run_pool_size', 2),
+            self.preferences.get('fast_run_preload', DEFAULT_PRELOAD_MODULES),
+            self
+        )
+
+    # 配置快速运行模式预先导入的模块
+    def configure_preload_modules(self):
+        current = ','.join(self.preferences.get('fast_run_preload', DEFAULT_PRELOAD_MODULES))
+        text, ok = QInputDialog.getText(
+            self, "Preloaded Modules", "Modules to import in warm interpreters (comma separated):",
+            text=current
+        )
+        if ok:
+            modules = [name.strip() for name in text.split(',') if name.strip()]
+            self.preferences['fast_run_preload'] = modules
+            self.save_user_preferences()
+            if self.interpreter_pool is not None:
+                self.interpreter_pool.set_preload(modules)  # 用新的模块列表重启空闲进程
+
+    # 停止当前标签页正在运行的代码
+    def stop_code(self):
+        session = self.run_sessions.get(self.tabs.currentWidget())
+        if session is not None and session.is_active():
+            session.stop()
+            self.statusBar().showMessage("Stopping code execution...")
+
+    # 当前标签页有正在运行或排队的代码时显示停止按钮
+    def update_stop_button(self):
+        session = self.run_sessions.get(self.tabs.currentWidget())
+        self.stop_button.setVisible(session is not None and session.is_active())
+
+    # 关闭标签页时停止其运行，输出面板保留到清除已结束的运行时
+    def close_run_session(self, tab):
+        session = self.run_sessions.pop(tab, None)
+        if session is not None:
+            session.tab = None
+            session.stop()
+
+    # 移除已结束的运行及其输出面板
+    def clear_finished_runs(self):
+        for session in self.run_scheduler.clear_finished():
+            self.output_tabs.removeTab(self.output_tabs.indexOf(session.output))
+            self.run_sessions.pop(session.tab, None)
+
+    # 显示某次运行的输出面板
+    def show_run_output(self, session):
+        self.console_dock.show()
+        self.output_tabs.setCurrentWidget(session.output)
+        if session.tab is not None:
+            self.tabs.setCurrentWidget(session.tab)
 
-    # 进程完成后调用
-    def process_finished(self):
-        self.stop_button.setVisible(False)  # 隐藏停止按钮
-        self.statusBar().showMessage("Code execution finished.")  # 更新状态栏信息
-    
     # 弹出对话框让用户输入远程代码的URL
     def prompt_inject_code_from_url(self):
         url, ok = QInputDialog.getText(self, "Inject Code from URL", "Enter the URL:")
@@ -517,142 +4846,332 @@ class PythonEditor(QMainWindow):
             self.inject_code_from_url(url)  # 调用新方法从URL注入代码
 
     # 从URL获取并注入代码
+    # 插件在后台下载，完成后再注入，下载期间界面不会卡住
     def inject_code_from_url(self, url):
-        try:
-            response = requests.get(url)  # 发起GET请求获取代码
-            response.raise_for_status()  # 检查请求是否成功
-            code = response.text  # 获取返回的代码文本
+        self.statusBar().showMessage(f"Fetching {url}...")
+        self.plugin_fetcher.fetch(url)
 
-            # 检查是否为空
-            if not code.strip():
-                QMessageBox.warning(self, "Warning", "No code to inject from URL.")
-                return
+    # 插件下载完成，显示是否使用了缓存，然后注入代码
+    def plugin_fetched(self, url, code, source):
+        sources = {
+            'network': "downloaded",
+            'cache': "cache hit, not modified on server",
+            'offline': "server unreachable, using cached copy",
+        }
+        fetcher = self.plugin_fetcher
+        self.statusBar().showMessage(
+            f"{url}: {sources[source]} (cache hits: {fetcher.hits}, misses: {fetcher.misses})"
+        )
+
+        # 检查是否为空
+        if not code.strip():
+            QMessageBox.warning(self, "Warning", "No code to inject from URL.")
+            return
+
+        # 将获取的代码注入
+        self.inject_code(code, url)
 
-            # 将获取的代码注入
-            self.inject_code(code)
+    def plugin_fetch_failed(self, url, error):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to fetch code from {url}:\n{error}")
 
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Failed to fetch code from {url}:\n{e}")    
-    # 自动保存当前文件
+    # 自动保存所有修改过的文件
+    @timed('auto_save')
     def auto_save(self):
-        current_tab = self.tabs.currentWidget()  # 获取当前标签页
-        if isinstance(current_tab, QsciScintilla):
-            file_name = self.tabs.tabText(self.tabs.currentIndex())  # 获取文件名
-            if file_name and file_name != "新建文件":  # 检查文件名是否有效
-                with open(file_name, 'w', encoding='utf-8') as file:
-                    file.write(current_tab.text())  # 保存文件
-                self.statusBar().showMessage(f"Autosaved: {file_name}")  # 更新状态栏信息
+        self.auto_saver.save_dirty()
+
+    # 开始跟踪编辑器的修改状态
+    def track_editor(self, tab):
+        self.auto_saver.track(tab)
+        tab.modificationChanged.connect(lambda modified: self.update_tab_title(tab))
+
+    # 根据文件路径和修改状态更新标签页标题，未保存的文件标题带 *
+    def update_tab_title(self, tab):
+        index = self.tabs.indexOf(tab)
+        if index >= 0:
+            title = os.path.basename(tab.file_path) if tab.file_path else '新建文件'
+            self.tabs.setTabText(index, title + (' *' if tab.isModified() else ''))
+
+    # 启动时恢复上次未保存的新建文件（包括异常退出时丢失的内容）
+    def restore_recovered_buffers(self):
+        records = self.auto_saver.pending_recoveries()
+        if not records:
+            return
+        answer = QMessageBox.question(
+            self, "Restore Unsaved Files",
+            f"Restore {len(records)} unsaved file(s) from the last session?"
+        )
+        for path, record in records:
+            if answer == QMessageBox.Yes:
+                tab = self.add_new_tab(record.get('text', ''), record.get('title', '新建文件'))
+                tab.saved_hash = None
+                tab.setModified(True)
+                self.update_tab_title(tab)
+                self.auto_saver.mark_dirty(tab)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
     # 添加新的标签页
-    def add_new_tab(self, text='', title='新建文件'):
-        tab = QsciScintilla()
-        lexer = QsciLexerPython()
-
-        # 设置不同类型的高亮颜色
-        lexer.setColor(QColor('#1165e4'), QsciLexerPython.Keyword)   # 关键字
-        lexer.setColor(QColor('#11e460'), QsciLexerPython.Comment)  # 注释
-        lexer.setColor(QColor('#de8a02'), 2)                         # 字符串 (通常在 QScintilla 中对应的索引)
-        lexer.setColor(QColor("#9006cb"), 3)                       # 数字 (通常在 QScintilla 中对应的索引)
-
-        tab.setLexer(lexer)
-        tab.setText(text)
-        tab.setMinimumSize(800, 600)
-        #设置字体
-        font = QFont("Segoe UI", 10, QFont.Normal)  # 指定字体名称、字号和样式
-        tab.setFont(font)
-        self.tabs.addTab(tab, title)
-
-        # 设置代码补全
+    def add_new_tab(self, text='', title='新建文件', file_path=None, index=None):
+        tab = self.editor_factory.create(text, file_path)  # 每个文档只创建一个编辑器
+        if index is None:
+            self.tabs.addTab(tab, title)  # 添加标签页
+        else:
+            self.tabs.insertTab(index, tab, title)  # 替换占位标签页时插入到原来的位置
+
+        # 设置代码补全功能和后台语法检查
         self.setup_autocomplete(tab)
+        self.setup_lint(tab)
+        self.setup_snippets(tab)
+        self.track_editor(tab)
+        return tab
 
-        tab = QsciScintilla()  # 创建新的编辑器
-        lexer = QsciLexerPython()  # 使用Python语法高亮
-        tab.setLexer(lexer)
-        tab.setText(text)  # 设置初始文本
-        tab.setMinimumSize(800, 600)  # 设置编辑器最小大小
-        self.tabs.addTab(tab, title)  # 添加标签页
+    # 恢复会话中的标签页，只添加占位标签页，当前标签页立即加载，其余标签页在第一次切换到时加载
+    def restore_session_tabs(self, session):
+        for record in session.get('tabs', []):
+            self.tabs.addTab(SessionPlaceholder(record), os.path.basename(record['path']))
+        if self.tabs.count() == 0:
+            self.add_new_tab()  # 添加一个新标签页
+            return
+        current = min(session.get('current', 0), self.tabs.count() - 1)
+        self.tabs.setCurrentIndex(current)
+        self.materialize_tab(current)
 
-        # 设置代码补全功能
-        self.setup_autocomplete(tab)
+    # 恢复窗口大小和停靠窗口布局
+    def restore_session_layout(self, session):
+        if session.get('geometry'):
+            self.restoreGeometry(QByteArray.fromBase64(session['geometry'].encode('ascii')))
+        if session.get('state'):
+            self.restoreState(QByteArray.fromBase64(session['state'].encode('ascii')))
 
-    # 设置自动补全
+    # 窗口显示后开始索引项目目录，并创建上次显示的停靠窗口
+    def build_startup_docks(self):
+        self.project_index.set_root(self.project_folder)
+        for name in self.startup_docks:
+            if name in self.dock_specs:
+                self.dock(name)
+        startup_timeline.mark('docks built')
+
+    # 获取停靠窗口，尚未创建时创建并显示，按restoreState记录的布局放置
+    def dock(self, name):
+        dock = self.docks.get(name)
+        if dock is None:
+            title, area, factory = self.dock_specs[name]
+            dock = factory()
+            dock.setStyleSheet(self.theme_stylesheet)
+            self.addDockWidget(area, dock)
+            self.restoreDockWidget(dock)
+            dock.show()  # 主窗口显示后才添加的子部件需要显式显示
+            action = self.dock_actions[name]
+            action.setChecked(True)
+            dock.toggleViewAction().toggled.connect(action.setChecked)
+            self.docks[name] = dock
+        return dock
+
+    # 显示或隐藏停靠窗口
+    def set_dock_visible(self, name, visible):
+        if not visible and name not in self.docks:
+            return
+        dock = self.dock(name)
+        dock.setVisible(visible)
+        if visible:
+            dock.raise_()
+
+    # 把占位标签页替换为真正的编辑器，文件不存在时移除该标签页
+    # 移除后没有标签页时添加一个新标签页，当前标签页变为另一个占位标签页时加载它
+    @timed('materialize_tab')
+    def materialize_tab(self, index):
+        placeholder = self.tabs.widget(index)
+        if not isinstance(placeholder, SessionPlaceholder):
+            return placeholder
+        was_current = self.tabs.currentIndex() == index
+        self.tabs.blockSignals(True)  # 替换过程中当前标签页会临时变化，不触发加载其它占位标签页
+        self.tabs.removeTab(index)
+        tab = self.open_file(placeholder.file_path, index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+        if tab is not None:
+            placeholder.restore_view(tab)
+            if was_current:
+                self.tabs.setCurrentIndex(index)
+        elif self.tabs.count() == 0:
+            self.add_new_tab()
+        elif was_current:
+            self.materialize_tab(self.tabs.currentIndex())
+        return tab
+
+    # 保存会话：打开的文件及其光标和滚动位置、窗口布局、主题和当前文件夹
+    def save_session(self):
+        tabs = []
+        current = 0
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if isinstance(tab, SessionPlaceholder):
+                record = tab.record  # 从未加载过，保留原来的位置
+            elif isinstance(tab, LargeFileViewer):
+                record = {'path': tab.file_path, 'first_line': tab.verticalScrollBar().value()}
+            elif isinstance(tab, CodeEditor) and tab.file_path:
+                line, column = tab.getCursorPosition()
+                record = {'path': tab.file_path, 'line': line, 'index': column,
+                          'first_line': tab.firstVisibleLine()}
+            else:
+                continue  # 新建文件由崩溃恢复副本负责恢复
+            if index == self.tabs.currentIndex():
+                current = len(tabs)
+            tabs.append(record)
+        self.preferences['session'] = {
+            'tabs': tabs,
+            'current': current,
+            'geometry': bytes(self.saveGeometry().toBase64()).decode('ascii'),
+            'state': bytes(self.saveState().toBase64()).decode('ascii'),
+            'theme': self.current_theme,
+            'folder': self.project_index.root or self.project_folder,
+            'docks': [name for name, dock in self.docks.items() if not dock.isHidden()],
+        }
+        self.preferences['recent_files'] = self.recent_files
+        self.save_user_preferences()
+
+    # 设置自动补全，补全内容来自符号索引，不再由QScintilla在每次按键时扫描整个文档
     def setup_autocomplete(self, tab):
-        tab.setAutoCompletionSource(QsciScintilla.AcsAll)  # 使用所有补全来源
-        tab.setAutoCompletionThreshold(1)  # 设置触发补全的阈值
+        tab.setAutoCompletionSource(QsciScintilla.AcsNone)
+        tab.SCN_CHARADDED.connect(lambda char: self.show_completions(tab, char))
+        tab.textChanged.connect(lambda: self.symbol_index.schedule(tab))
+        self.symbol_index.schedule(tab)
+
+    # 设置代码片段：输入触发词后按Tab键展开，只输入了开头时列出匹配的触发词
+    def setup_snippets(self, tab):
+        tab.snippet_handler = self.handle_snippet_tab
+        tab.userListActivated.connect(lambda list_id, trigger: self.expand_snippet_trigger(tab, trigger))
+
+    # 编辑器中按下Tab键：跳转到下一个占位符，或展开光标前的触发词
+    def handle_snippet_tab(self, tab):
+        if tab.next_snippet_field():
+            return True
+        if tab.hasSelectedText():
+            return False
+        line, index = tab.getCursorPosition()
+        match = SNIPPET_TRIGGER.search(tab.text(line)[:index])
+        if match is None:
+            return False
+        word = match.group()
+        if self.snippet_store.get(word) is not None:
+            self.expand_snippet_trigger(tab, word)
+            return True
+        triggers = self.snippet_store.complete(word)
+        if triggers:
+            tab.showUserList(SNIPPET_LIST_ID, triggers)
+            return True
+        return False
 
-    # 执行命令行命令
+    # 用代码片段替换光标前的触发词（或触发词的开头）
+    def expand_snippet_trigger(self, tab, trigger):
+        snippet = self.snippet_store.get(trigger)
+        if snippet is None:
+            return
+        tab.cancelList()
+        line, index = tab.getCursorPosition()
+        match = SNIPPET_TRIGGER.search(tab.text(line)[:index])
+        tab.insert_snippet(snippet[1], len(match.group().encode('utf-8')) if match else 0)
+
+    # 打开代码片段管理器
+    def open_snippet_manager(self):
+        self.snippet_manager = SnippetManager(self.snippet_store, self)
+        self.snippet_manager.show()
+
+    # 设置后台语法检查和标记查找，光标所在行有问题时在状态栏中显示
+    def setup_lint(self, tab):
+        tab.textChanged.connect(lambda: self.lint_checker.schedule(tab))
+        tab.textChanged.connect(lambda: self.todo_index.schedule(tab))
+        tab.cursorPositionChanged.connect(lambda line, index: self.show_line_diagnostics(tab, line))
+        self.lint_checker.schedule(tab)
+
+    def show_line_diagnostics(self, tab, line):
+        messages = tab.diagnostics.get(line)
+        if messages:
+            self.statusBar().showMessage("; ".join(messages), 5000)
+
+    # 输入字符后查询符号索引并弹出补全列表
+    @timed('show_completions')
+    def show_completions(self, tab, char):
+        line, index = tab.getCursorPosition()
+        match = COMPLETION_CONTEXT.search(tab.text(line)[:index])
+        module_alias, prefix = match.group(1), match.group(2) or ''
+        if module_alias is None and len(prefix) < self.preferences.get('completion_threshold', 2):
+            return
+        if module_alias is not None and not prefix and char != ord('.'):
+            return
+        items = self.symbol_index.completions(tab, prefix, module_alias)
+        # 不使用QsciAPIs：每次符号变化后都要对整个API列表重新prepare()，弹出时QScintilla还要在全部条目中再查找一次前缀；
+        # 这里直接把符号索引按前缀查到的少量结果交给SCI_AUTOCSHOW显示
+        if items:
+            tab.SendScintilla(QsciScintilla.SCI_AUTOCSHOW, len(prefix.encode('utf-8')),
+                              ' '.join(items).encode('utf-8'))
+
+    # 执行命令行命令，命令在后台异步运行，输出逐行显示到控制台
+    @timed('execute_command')
     def execute_command(self):
         command = self.console_input.text().strip()  # 获取输入的命令
         if command:
-            self.console_output.append(f"$ {command}")  # 在控制台输出命令
-            try:
-                # 使用subprocess执行命令
-                process = subprocess.Popen(
-                    command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            self.console_input.clear()  # 清空输入框
+            if self.run_console_builtin(command):
+                return
+
+            self.command_counter += 1
+            job = ShellCommand(self.command_counter, command, self)
+            job.output.connect(self.handle_command_output)
+            job.finished.connect(self.command_finished)
+            self.command_jobs[job.job_id] = job
+            self.console_output.append(f"[{job.job_id}] $ {command}")  # 在控制台输出命令
+            job.start()
+
+    # 控制台内置命令：jobs 列出正在运行的命令，kill [编号] 取消命令
+    def run_console_builtin(self, command):
+        parts = command.split()
+        if parts[0] == 'jobs' and len(parts) == 1:
+            if not self.command_jobs:
+                self.console_output.append("No running commands.")
+            for job in self.command_jobs.values():
+                elapsed = time.perf_counter() - job.started_at
+                self.console_output.append(
+                    f"[{job.job_id}] running {elapsed:.1f}s, "
+                    f"max UI slice {job.max_slice * 1000:.1f} ms: {job.command}"
                 )
-                stdout, stderr = process.communicate()
-                self.console_output.append(stdout.decode())  # 输出标准输出
-                self.console_output.append(stderr.decode())  # 输出错误信息
-            except Exception as e:
-                self.console_output.append(f"Error: {e}")  # 捕获异常并输出错误
+            return True
+        if parts[0] == 'kill' and len(parts) <= 2 and all(p.isdigit() for p in parts[1:]):
+            job_ids = [int(parts[1])] if len(parts) == 2 else list(self.command_jobs)
+            for job_id in job_ids:
+                job = self.command_jobs.get(job_id)
+                if job is None:
+                    self.console_output.append(f"kill: no such command [{job_id}]")
+                else:
+                    job.cancel()
+            return True
+        return False
 
-            self.console_input.clear()  # 清空输入框
+    # 显示控制台命令的输出
+    @timed('handle_command_output')
+    def handle_command_output(self, job_id, text, stream):
+        if len(self.command_jobs) > 1:
+            text = '\n'.join(f"[{job_id}] {line}" for line in text.split('\n'))  # 同时运行多个命令时标明来源
+        self.console_output.append(text, stream)
 
-    # 应用样式
-    def apply_styles(self):
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #2E2E2E;
-                color: #FFFFFF;
-            }
-            QPushButton {
-                background-color: #007ACC;
-                color: #FFFFFF;
-                border-radius: 5px;
-                padding: 10px;
-            }
-            QPushButton:hover {
-                background-color: #005EA6;
-            }
-            QTextEdit {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-                border: 1px solid #444;
-            }
-            QListWidget {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-            }
-            QDockWidget {
-                background-color: #2E2E2E;
-            }
-            QLineEdit {
-                background-color: #1E1E1E;
-                color: #D4D4D4;
-                border: 1px solid #444;
-                padding: 5px;
-            }
-            QTabWidget::pane { /* The tab widget frame */
-                border-top: 2px solid #C2C7CB;
-            }
-            QTabBar::tab {
-                background: #2E2E2E;
-                color: white;
-                padding: 10px;
-                border: 1px solid #444;
-                border-bottom: none;
-            }
-            QTabBar::tab:selected {
-                background: #1E1E1E;
-                border-bottom: 2px solid #1E1E1E;
-            }
-        """)
+    # 控制台命令结束，显示退出码
+    def command_finished(self, job_id, exit_code, elapsed):
+        job = self.command_jobs.pop(job_id, None)
+        if job is None:
+            return
+        self.console_output.append(f"[{job_id}] exited with code {exit_code} ({elapsed:.2f}s)")
+        job.deleteLater()
 
     # 创建菜单栏
     def create_menu(self):
         menu_bar = self.menuBar()
         file_menu = menu_bar.addMenu("File")
         edit_menu = menu_bar.addMenu("Edit")
+        view_menu = menu_bar.addMenu("View")
+        run_menu = menu_bar.addMenu("Run")
         help_menu = menu_bar.addMenu("Help")
 
         # 打开文件动作
@@ -664,6 +5183,12 @@ class PythonEditor(QMainWindow):
         # 添加从URL注入代码的动作
         
 
+        # 快速打开动作，在项目中按文件名模糊查找
+        quick_open_action = QAction("Go to File...", self)
+        quick_open_action.triggered.connect(self.open_quick_open)
+        quick_open_action.setShortcut(QKeySequence("Ctrl+P"))
+        file_menu.addAction(quick_open_action)
+
         # 打开文件夹动作
         open_folder_action = QAction("Open Folder", self)
         open_folder_action.triggered.connect(self.prompt_open_folder)
@@ -674,6 +5199,12 @@ class PythonEditor(QMainWindow):
         save_action.triggered.connect(self.save_file)
         save_action.setShortcut(QKeySequence("Ctrl+S"))
         file_menu.addAction(save_action)
+
+        # 另存为动作
+        save_as_action = QAction("Save As...", self)
+        save_as_action.triggered.connect(self.save_file_as)
+        save_as_action.setShortcut(QKeySequence("Ctrl+Shift+S"))
+        file_menu.addAction(save_as_action)
         
         # 注入代码动作
         inject_action = QAction("Inject Code", self)
@@ -685,6 +5216,16 @@ class PythonEditor(QMainWindow):
         inject_code_url_action.triggered.connect(self.prompt_inject_code_from_url)  # 设定触发的方法
         edit_menu.addAction(inject_code_url_action)
 
+        # 重新加载插件动作
+        reload_plugins_action = QAction("Reload Plugins", self)
+        reload_plugins_action.triggered.connect(self.reload_plugins)
+        edit_menu.addAction(reload_plugins_action)
+
+        # 列出插件动作
+        list_plugins_action = QAction("List Plugins", self)
+        list_plugins_action.triggered.connect(self.list_plugins)
+        edit_menu.addAction(list_plugins_action)
+
         # 查找和替换动作
         find_action = QAction("Find", self)
         find_action.triggered.connect(self.open_find_dialog)
@@ -695,36 +5236,142 @@ class PythonEditor(QMainWindow):
         replace_action.triggered.connect(self.open_replace_dialog)
         replace_action.setShortcut(QKeySequence("Ctrl+H"))
         edit_menu.addAction(replace_action)
-    def inject_code(self, code):
+
+        # 在文件中查找动作
+        find_in_files_action = QAction("Find in Files", self)
+        find_in_files_action.triggered.connect(self.open_find_in_files)
+        find_in_files_action.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        edit_menu.addAction(find_in_files_action)
+
+        # 主题切换动作
+        theme_action = QAction("Theme...", self)
+        theme_action.triggered.connect(self.topic)
+        edit_menu.addAction(theme_action)
+
+        # 代码片段管理
+        snippets_action = QAction("Snippets...", self)
+        snippets_action.triggered.connect(self.open_snippet_manager)
+        snippets_action.setShortcut(QKeySequence("Ctrl+J"))
+        edit_menu.addAction(snippets_action)
+
+        # 停靠窗口的显示开关，可选的停靠窗口在第一次打开时才创建
+        view_menu.addAction(self.console_dock.toggleViewAction())
+        for name, (title, area, factory) in self.dock_specs.items():
+            action = QAction(title, self)
+            action.setCheckable(True)
+            action.triggered.connect(lambda checked, name=name: self.set_dock_visible(name, checked))
+            view_menu.addAction(action)
+            self.dock_actions[name] = action
+
+        # 性能监视器开关和导出记录
+        view_menu.addSeparator()
+        self.performance_action = QAction("Performance Monitor", self)
+        self.performance_action.setCheckable(True)
+        self.performance_action.toggled.connect(self.toggle_performance_monitor)
+        view_menu.addAction(self.performance_action)
+        export_trace_action = QAction("Export Performance Trace...", self)
+        export_trace_action.triggered.connect(self.export_performance_trace)
+        view_menu.addAction(export_trace_action)
+
+        # 运行动作
+        run_action = QAction("Run", self)
+        run_action.triggered.connect(lambda: self.run_code())
+        run_action.setShortcut(QKeySequence("F5"))
+        run_menu.addAction(run_action)
+
+        # 快速运行模式，使用预热的解释器运行代码
+        self.fast_run_action = QAction("Fast Run", self)
+        self.fast_run_action.setCheckable(True)
+        self.fast_run_action.toggled.connect(self.toggle_fast_run)
+        run_menu.addAction(self.fast_run_action)
+
+        # 配置快速运行预先导入的模块
+        preload_action = QAction("Preloaded Modules...", self)
+        preload_action.triggered.connect(self.configure_preload_modules)
+        run_menu.addAction(preload_action)
+
+        # 性能分析和内存跟踪运行，结果显示在Profiler停靠窗口中
+        run_menu.addSeparator()
+        profile_action = QAction("Run with Profiler", self)
+        profile_action.triggered.connect(lambda: self.run_code_measured('profile'))
+        run_menu.addAction(profile_action)
+        memory_action = QAction("Run with Memory Trace", self)
+        memory_action.triggered.connect(lambda: self.run_code_measured('memory'))
+        run_menu.addAction(memory_action)
+    # 注入代码：作为插件加载到常驻的插件宿主进程中，同名插件会被替换
+    def inject_code(self, code, source=None):
         # 检查是否为空
         if not code.strip():
             QMessageBox.warning(self, "Warning", "No code to inject.")
             return
-        
-        # 创建一个临时文件来保存注入的代码
-        temp_file_path = 'injected_code.py'  # 临时文件路径
-        with open(temp_file_path, 'w', encoding='utf-8') as inject_file:
-            inject_file.write(code)
 
-        # 使用QProcess执行注入的代码
-        self.process.start('python', [temp_file_path])
+        name = plugin_name(source)
+        self.plugins[name] = (code, source)
+        self.plugin_host.load(name, code, source)
+        self.statusBar().showMessage(f"Loading plugin {name}...")
 
+    # 重新加载全部插件，来自URL的插件重新下载（服务器上没有变化时使用缓存）
+    def reload_plugins(self):
+        for name, (code, source) in self.plugins.items():
+            if source:
+                self.plugin_fetcher.fetch(source)
+            else:
+                self.plugin_host.load(name, code)
 
+    # 在控制台中列出已加载的插件和加载耗时
+    def list_plugins(self):
+        self.plugin_host.list_plugins()
 
-    # 运行当前代码的方法，决定是否允许用户注入代码
-    def run_code(self):
-        current_tab = self.tabs.currentWidget()
-        if isinstance(current_tab, QsciScintilla):
-            code = current_tab.text()
-            # 这里可以选择是否运行当前代码或仅执行注入代码
+    # 处理插件宿主进程返回的消息
+    def handle_plugin_message(self, message):
+        if message['event'] == 'output':
+            self.console_output.write(message['text'], message['stream'])
+            return
+        name = message.get('name')
+        if not message['ok']:
+            self.console_output.write(message['error'], 'stderr')
+            self.statusBar().showMessage(f"Plugin {name} failed")
+        elif message['cmd'] == 'load':
+            self.console_output.append(f"[plugin] {name} loaded in {message['elapsed_ms']} ms")
+            self.statusBar().showMessage(f"Plugin {name} loaded")
+        elif message['cmd'] == 'list':
+            if not message['plugins']:
+                self.console_output.append("[plugin] no plugins loaded")
+            for plugin in message['plugins']:
+                state = "loaded" if plugin['loaded'] else "failed"
+                self.console_output.append(
+                    f"[plugin] {plugin['name']} ({plugin['source'] or 'inline'}): {state}, "
+                    f"{plugin['loads']} load(s), last load {plugin['load_ms']} ms"
+                )
+
+    # 开启或关闭性能监视器
+    def toggle_performance_monitor(self, enabled):
+        if enabled:
+            self.performance_monitor.start()
+        else:
+            self.performance_monitor.stop()
+        self.preferences['performance_monitor'] = enabled
+        self.save_user_preferences()
+
+    # 将性能监视器记录的耗时导出为Chrome trace文件
+    def export_performance_trace(self):
+        if not self.performance_monitor.spans:
+            QMessageBox.information(self, "Export Performance Trace",
+                                    "Nothing recorded yet, turn on View > Performance Monitor first.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Performance Trace", "pyhub-trace.json", "Trace Files (*.json)"
+        )
+        if file_path:
+            count = self.performance_monitor.export_trace(file_path)
+            self.statusBar().showMessage(f"Exported {count} events to {file_path}")
 
-            with open('temp_script.py', 'w', encoding='utf-8') as script_file:
-                script_file.write(code)
+    # 插件宿主进程意外退出，下次注入插件时会重新启动
+    def plugin_host_exited(self, exit_code):
+        self.console_output.append(f"[plugin] plugin host exited with code {exit_code}, "
+                                   f"use Reload Plugins to load the plugins again")
 
-            self.stop_button.setVisible(True)
-            self.statusBar().showMessage("Code is running...")
 
-            self.process.start('python', ['temp_script.py'])
 
     
     # 弹出对话框让用户输入要注入的代码
@@ -743,53 +5390,204 @@ class PythonEditor(QMainWindow):
         if file_path:
             self.open_file(file_path)
 
+    # 打开快速打开面板
+    def open_quick_open(self):
+        self.quick_open_dialog = QuickOpenDialog(self.quick_open_index, self.recent_files, self)
+        self.quick_open_dialog.show()
+
+    # 记录最近打开的文件，供快速打开排序
+    def remember_recent_file(self, file_path):
+        if file_path in self.recent_files:
+            self.recent_files.remove(file_path)
+        self.recent_files.insert(0, file_path)
+        del self.recent_files[self.preferences.get('recent_files_limit', 50):]
+
     # 提示打开文件夹
     def prompt_open_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Open Folder", "")
         if folder_path:
-            self.file_browser.set_directory(folder_path)
+            self.set_dock_visible('FileBrowser', True)
+            self.dock('FileBrowser').set_directory(folder_path)
 
-    # 打开文件
-    def open_file(self, file_path):
+    # 打开文件，文件已经打开时切换到对应的标签页
+    @timed('open_file')
+    def open_file(self, file_path, index=None):
+        file_path = os.path.abspath(file_path)
+        for tab_index in range(self.tabs.count()):
+            tab = self.tabs.widget(tab_index)
+            if isinstance(tab, (CodeEditor, LargeFileViewer, SessionPlaceholder)) and tab.file_path == file_path:
+                tab = self.materialize_tab(tab_index)
+                if tab is not None:
+                    self.tabs.setCurrentIndex(tab_index)
+                    self.remember_recent_file(file_path)
+                return tab
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                self.add_new_tab(content, os.path.basename(file_path))  # 将内容添加到新标签页中
+            # 超过阈值的大文件使用只读查看器打开
+            if os.path.getsize(file_path) > self.preferences.get('large_file_threshold', 20 * 1024 * 1024):
+                tab = self.open_large_file(file_path, index)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    content = file.read()
+                # 将内容添加到新标签页中
+                tab = self.add_new_tab(content, os.path.basename(file_path), file_path, index)
+            self.remember_recent_file(file_path)
+            return tab
         except Exception as e:
             self.statusBar().showMessage(f"Error reading file: {e}")
 
-    # 保存文件
+    # 使用大文件查看器打开文件
+    def open_large_file(self, file_path, index=None):
+        viewer = LargeFileViewer(file_path)
+        viewer.setStyleSheet(self.theme_stylesheet)
+        title = f"{os.path.basename(file_path)} [read-only]"
+        if index is None:
+            self.tabs.addTab(viewer, title)
+        else:
+            self.tabs.insertTab(index, viewer, title)
+        self.tabs.setCurrentWidget(viewer)
+        self.statusBar().showMessage(f"Opened large file in read-only mode: {file_path}")
+        return viewer
+
+    # 在给定的文件中，已打开且有未保存修改的文件
+    def modified_files(self, paths):
+        paths = set(paths)
+        return [tab.file_path for tab in map(self.tabs.widget, range(self.tabs.count()))
+                if isinstance(tab, CodeEditor) and tab.file_path in paths and tab.isModified()]
+
+    # 文件在编辑器之外被改写后重新载入对应的标签页，保留光标和滚动位置
+    # 有未保存修改的标签页不重新载入，返回False；尚未加载的会话占位标签页在切换时才读取文件，无需处理
+    def reload_file(self, file_path):
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if isinstance(tab, LargeFileViewer) and tab.file_path == file_path:
+                # 原子写入替换了文件，映射仍指向旧文件，重新打开
+                current = self.tabs.currentIndex()
+                self.close_tab(index)
+                self.open_large_file(file_path, index)
+                self.tabs.setCurrentIndex(current)
+                return True
+            if isinstance(tab, CodeEditor) and tab.file_path == file_path:
+                if tab.isModified():
+                    return False
+                line, column = tab.getCursorPosition()
+                first_line = tab.firstVisibleLine()
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as file:
+                        tab.load_text(file.read())
+                except (OSError, UnicodeDecodeError):
+                    return False
+                line = min(line, tab.lines() - 1)
+                tab.setCursorPosition(line, min(column, tab.lineLength(line)))
+                tab.setFirstVisibleLine(first_line)
+                return True
+        return True
+
+    # 打开文件并跳转到指定的行和列
+    def open_file_at(self, file_path, line_no, column=0):
+        tab = self.open_file(file_path)
+        if isinstance(tab, LargeFileViewer):
+            tab.verticalScrollBar().setValue(line_no - 1)
+        elif tab is not None:
+            self.tabs.setCurrentWidget(tab)
+            tab.setCursorPosition(line_no - 1, column)
+            tab.ensureLineVisible(line_no - 1)
+            tab.setFocus()
+
+    # 保存文件，已有路径的文件直接保存，否则弹出另存为对话框
     def save_file(self):
+        current_tab = self.tabs.currentWidget()
+        if isinstance(current_tab, QsciScintilla):
+            if current_tab.file_path:
+                self.write_tab(current_tab, current_tab.file_path)
+            else:
+                self.save_file_as()
+
+    # 另存为
+    def save_file_as(self):
         current_tab = self.tabs.currentWidget()
         if isinstance(current_tab, QsciScintilla):
             file_path, _ = QFileDialog.getSaveFileName(
                 self, "Save Python File", "", "Python Files (*.py)"
             )
             if file_path:
-                try:
-                    with open(file_path, 'w', encoding='utf-8') as file:
-                        file.write(current_tab.text())  # 保存当前代码
-                    self.tabs.setTabText(self.tabs.currentIndex(), os.path.basename(file_path))  # 更新标签页标题
-                    self.statusBar().showMessage(f"Saved: {file_path}")  # 更新状态栏信息
-                except Exception as e:
-                    self.statusBar().showMessage(f"Error saving file: {e}")
+                self.write_tab(current_tab, os.path.abspath(file_path))
+
+    # 将标签页内容写入文件
+    def write_tab(self, tab, file_path):
+        try:
+            text = tab.text()
+            atomic_write(file_path, text)  # 保存当前代码
+            self.auto_saver.forget(tab)  # 已保存，删除恢复副本
+            tab.file_path = file_path
+            tab.saved_hash = content_hash(text)
+            tab.setModified(False)
+            self.todo_index.file_saved(file_path)
+            self.update_tab_title(tab)  # 更新标签页标题
+            self.statusBar().showMessage(f"Saved: {file_path}")  # 更新状态栏信息
+        except Exception as e:
+            self.statusBar().showMessage(f"Error saving file: {e}")
 
     # 加载用户偏好设置
     def load_user_preferences(self):
+        self.preferences = {}
         try:
-            with open("preferences.json", "r") as prefs_file:
+            with open("preferences.json", "r", encoding="utf-8") as prefs_file:
                 preferences = json.load(prefs_file)
                 # 根据需要应用用户偏好设置
+                self.preferences.update(preferences)
         except FileNotFoundError:
             pass
 
+    # 保存用户偏好设置
+    def save_user_preferences(self):
+        try:
+            with open("preferences.json", "w", encoding="utf-8") as prefs_file:
+                json.dump(self.preferences, prefs_file, ensure_ascii=False, indent=4)
+        except OSError as e:
+            self.statusBar().showMessage(f"Error saving preferences: {e}")
+
+    # 关闭窗口时保存会话，结束预热的解释器进程
+    def closeEvent(self, event):
+        self.save_session()
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if isinstance(tab, LargeFileViewer):
+                tab.close_file()  # 结束行索引和查找线程，释放文件映射
+        if self.interpreter_pool is not None:
+            self.interpreter_pool.shutdown()
+        for job in list(self.command_jobs.values()):
+            job.force_kill()  # 结束仍在运行的控制台命令
+        if 'FindInFilesDock' in self.docks:
+            self.docks['FindInFilesDock'].cancel_search()
+        if 'ResourceManager' in self.docks:
+            self.docks['ResourceManager'].shutdown()  # 丢弃尚未生成的缩略图
+        self.run_scheduler.shutdown()  # 结束仍在运行的代码
+        self.todo_index.shutdown()  # 保存标记索引
+        shutdown_process_pool()
+        self.plugin_fetcher.shutdown()
+        self.plugin_host.stop()
+        self.performance_monitor.stop()
+        self.auto_saver.shutdown()  # 保存尚未写入的修改
+        self.snippet_store.close()
+        super().closeEvent(event)
+
     # 打开查找对话框
     def open_find_dialog(self):
         current_tab = self.tabs.currentWidget()
-        if isinstance(current_tab, QsciScintilla):
+        if isinstance(current_tab, LargeFileViewer):
+            # 大文件直接在映射的内容中查找，F3查找下一个
+            text, ok = QInputDialog.getText(self, "Find", "Find:", text=current_tab.last_search)
+            if ok and text:
+                current_tab.find(text)  # 在后台查找，未找到时由查看器提示
+        elif isinstance(current_tab, QsciScintilla):
             self.find_dialog = FindReplaceDialog(current_tab, self)
             self.find_dialog.show()
 
+    # 打开在文件中查找窗口
+    def open_find_in_files(self):
+        self.set_dock_visible('FindInFilesDock', True)
+        self.docks['FindInFilesDock'].find_input.setFocus()
+
     # 打开替换对话框
     def open_replace_dialog(self):
         current_tab = self.tabs.currentWidget()
@@ -807,8 +5605,48 @@ class PythonEditor(QMainWindow):
 
     # 帮助文档
     def Help_documentation(self):
+        import webbrowser
         webbrowser.open("https://e0ds3o5azc.feishu.cn/docx/TyozdBek4oTnZvxJFqQceG3vnxb?from=from_copylink")
 
+    # 应用主题，主题名称会保存到会话中
+    @timed('apply_theme')
+    def apply_theme(self, name):
+        theme = self.theme_engine.theme(name) or self.theme_engine.theme("Default")
+        if theme is None:
+            return  # 没有可用的主题文件
+        self.current_theme = theme.name
+        self.theme_stylesheet = theme.stylesheet
+        for widget in self.themed_widgets():
+            if widget.styleSheet() != theme.stylesheet:
+                widget.setStyleSheet(theme.stylesheet)
+        self.apply_tab_pane_colors()
+        self.editor_factory.profile.apply_theme(theme)  # 所有编辑器共用同一个词法分析器
+
+    # 设置主题样式表的部件。样式表不设置在整个主窗口上，否则每次切换主题时所有编辑器都要重新应用样式，
+    # 编辑器的颜色由词法分析器决定。以主窗口为父部件的对话框、大文件查看器中没有编辑器，直接设置样式表
+    def themed_widgets(self):
+        viewers = [tab for tab in map(self.tabs.widget, range(self.tabs.count())) if isinstance(tab, LargeFileViewer)]
+        return ([self.menuBar(), self.statusBar(), self.tabs.tabBar(), self.console_dock] + list(self.docks.values()) +
+                self.findChildren(QDialog, options=Qt.FindDirectChildrenOnly) + viewers)
+
+    # 标签页组件中有全部编辑器，不设置样式表，只把标签栏按主题计算出的背景和文字颜色设置到调色板上，
+    # 用于绘制标签栏右侧的空白区域和标签页的边框；调色板只包含这两种颜色，编辑器的颜色不受影响
+    def apply_tab_pane_colors(self):
+        tab_bar = self.tabs.tabBar()
+        tab_bar.ensurePolished()
+        palette = QPalette()
+        for role in (QPalette.Window, QPalette.WindowText):
+            palette.setColor(role, tab_bar.palette().color(role))
+        self.tabs.setPalette(palette)
+        self.tabs.setAutoFillBackground(True)
+
+    # 以主窗口为父部件的对话框（包括消息框和输入框）在显示前应用主题样式表，对话框的子窗口从对话框继承样式表
+    def event(self, event):
+        if event.type() == QEvent.ChildPolished and isinstance(event.child(), QDialog):
+            if event.child().styleSheet() != self.theme_stylesheet:
+                event.child().setStyleSheet(self.theme_stylesheet)
+        return super().event(event)
+
     # 主题切换
     def topic(self):
         current_tab = self.tabs.currentWidget()
@@ -820,6 +5658,12 @@ class PythonEditor(QMainWindow):
 if __name__ == "__main__":
     import os
     app = QApplication(sys.argv)
+    startup_timeline.mark('application created')
     editor = PythonEditor()
     editor.show()
+    startup_timeline.mark('window shown')
+    # 使用 --startup-timeline <文件> 启动时，在停靠窗口创建完成后导出启动时间线
+    if '--startup-timeline' in sys.argv[1:-1]:
+        timeline_path = sys.argv[sys.argv.index('--startup-timeline') + 1]
+        QTimer.singleShot(0, lambda: startup_timeline.dump(timeline_path))
     sys.exit(app.exec_())
\ No newline at end of file
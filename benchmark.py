@@ -0,0 +1,543 @@
+# PyHub 性能基准测试，在无界面模式（QT_QPA_PLATFORM=offscreen）下运行编辑器的常用操作并计时
+# 每次运行的结果追加到JSON历史文件中，并与上一次（或指定的）结果比较，变慢超过阈值时以退出码1结束
+#
+# 用法：
+#   python benchmark.py                     运行全部基准测试并与上一次结果比较
+#   python benchmark.py --only open_file    只运行名称以 open_file 开头的测试
+#   python benchmark.py --compare -2 -1     只比较历史中的两次结果，不运行测试
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(os.path.expanduser('~'), '.pyhub', 'benchmark_history.json')
+NOISE_FLOOR_MS = 0.5  # 差值小于该值时不算作变慢，避免极短的测试因抖动误报
+
+
+# 生成测试用的Python源代码
+def python_source(lines):
+    chunk = ("def function_{0}(value):\n"
+             "    result = value * {0}  # needle\n"
+             "    return result\n")
+    return ''.join(chunk.format(i) for i in range(lines // 3))
+
+
+# 生成包含指定数量目录和文件的项目目录树
+def make_tree(root, file_count, files_per_dir=50):
+    for i in range(file_count):
+        directory = os.path.join(root, f"pkg_{i // files_per_dir // 20}", f"sub_{i // files_per_dir}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"module_{i}.py"), 'w') as file:
+            file.write("x = 1\n")
+
+
+# 生成包含指定数量图片的目录，先生成一张再复制，复制比逐张编码快得多
+def make_images(root, count, per_dir=500):
+    from PIL import Image
+    os.makedirs(root, exist_ok=True)
+    sample = os.path.join(root, "sample.png")
+    Image.new('RGB', (640, 480), (200, 120, 40)).save(sample)
+    for i in range(count - 1):
+        directory = os.path.join(root, f"images_{i // per_dir}")
+        os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(sample, os.path.join(directory, f"image_{i}.png"))
+
+
+# 生成指定大小的文本文件，用于测试大文件查看器
+def make_large_file(path, size):
+    line = b"2024-01-01 12:00:00 INFO worker-7 processed request id=0123456789 status=200\n"
+    block = line * (1024 * 1024 // len(line))
+    with open(path, 'wb') as file:
+        for _ in range(size // len(block)):
+            file.write(block)
+
+
+# 清零进程的内存峰值（Linux），之后读取的峰值只包含当前测试
+def reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+# 进程的常驻内存和峰值（MB），Linux读取/proc，其它平台使用psutil（未安装时不记录）
+def memory_usage():
+    try:
+        with open('/proc/self/status') as file:
+            fields = dict(line.split(':', 1) for line in file if ':' in line)
+        return {'rss_mb': round(int(fields['VmRSS'].split()[0]) / 1024, 1),
+                'peak_rss_mb': round(int(fields['VmHWM'].split()[0]) / 1024, 1)}
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return {}
+    info = psutil.Process().memory_info()
+    usage = {'rss_mb': round(info.rss / 1048576, 1)}
+    if hasattr(info, 'peak_wset'):  # Windows的峰值无法清零，包含之前的测试
+        usage['peak_rss_mb'] = round(info.peak_wset / 1048576, 1)
+    return usage
+
+
+# 在Qt事件循环中等待，直到条件满足或超时
+def wait_until(app, condition, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step timed out")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+# 多次运行一个操作，setup和teardown不计入耗时，返回各轮耗时（毫秒）
+def measure(operation, rounds, setup=None, teardown=None):
+    timings = []
+    for i in range(rounds + 1):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        operation(state)
+        elapsed = (time.perf_counter() - started) * 1000
+        if teardown:
+            teardown(state)
+        if i > 0:
+            timings.append(elapsed)  # 第一轮为预热，不计入结果
+    return timings
+
+
+# 模拟QProcess的标准输出，每次读取返回一块数据，用于测试控制台的输出处理
+class ChunkSource:
+    def __init__(self, chunks):
+        self.chunks = list(reversed(chunks))
+
+    def readAllStandardOutput(self):
+        return self.chunks.pop()
+
+
+class BenchmarkSuite:
+    def __init__(self, app, editor, fixtures, rounds):
+        self.app = app
+        self.editor = editor
+        self.fixtures = fixtures  # 测试数据所在的临时目录
+        self.rounds = rounds
+
+    def close_current(self, state=None):
+        self.editor.close_tab(self.editor.tabs.count() - 1)
+        self.app.processEvents()
+
+    def bench_add_new_tab(self, lines):
+        text = python_source(lines)
+        return measure(lambda state: self.editor.add_new_tab(text), self.rounds, teardown=self.close_current)
+
+    def bench_open_file(self, lines):
+        path = os.path.join(self.fixtures, f"open_{lines}.py")
+        with open(path, 'w') as file:
+            file.write(python_source(lines))
+        return measure(lambda state: self.editor.open_file(path), self.rounds, teardown=self.close_current)
+
+    # 依次打开多个文件，所有标签页共享一个词法分析器，内存峰值反映每个标签页的开销
+    def bench_open_tabs(self, tabs, lines=1000):
+        directory = os.path.join(self.fixtures, f"tabs_{tabs}")
+        os.makedirs(directory, exist_ok=True)
+        text = python_source(lines)
+        paths = []
+        for i in range(tabs):
+            paths.append(os.path.join(directory, f"module_{i}.py"))
+            with open(paths[-1], 'w') as file:
+                file.write(text)
+
+        def open_all(state):
+            for path in paths:
+                self.editor.open_file(path)
+            self.app.processEvents()
+
+        def close_all(state):
+            for _ in paths:
+                self.close_current()
+        return measure(open_all, self.rounds, teardown=close_all)
+
+    # 打开大文件直到第一屏绘制完成，行索引在后台建立，完成后才关闭，内存峰值包含完整的行索引
+    def bench_large_file_open(self, megabytes):
+        path = os.path.join(self.fixtures, f"large_{megabytes}mb.log")
+        if not os.path.exists(path):
+            make_large_file(path, megabytes * 1024 * 1024)
+
+        def open_large(state):
+            viewer = self.editor.open_file(path)
+            viewer.viewport().repaint()
+
+        def close(state):
+            viewer = self.editor.tabs.currentWidget()
+            wait_until(self.app, lambda: viewer.indexed, timeout=600)
+            self.close_current()
+        try:
+            return measure(open_large, self.rounds, teardown=close)
+        finally:
+            os.remove(path)
+
+    def bench_replace_all(self, matches):
+        import PyHub
+        from PyQt5.QtWidgets import QDialog
+        text = python_source(matches * 3)
+        tab = self.editor.add_new_tab()
+        dialog = PyHub.FindReplaceDialog(tab, self.editor)
+        dialog.find_input.setText("needle")
+        dialog.replace_input.setText("pin")
+        # 跳过预览和结果提示框，只测量查找和替换本身
+        preview_exec = PyHub.ReplacePreviewDialog.exec_
+        information = PyHub.QMessageBox.information
+        PyHub.ReplacePreviewDialog.exec_ = lambda self: QDialog.Accepted
+        PyHub.QMessageBox.information = lambda *args: None
+        try:
+            return measure(lambda state: dialog.replace_all_text(), self.rounds, setup=lambda: tab.setText(text))
+        finally:
+            PyHub.ReplacePreviewDialog.exec_ = preview_exec
+            PyHub.QMessageBox.information = information
+            dialog.deleteLater()
+            self.close_current()
+
+    def bench_console(self, lines):
+        line = "output line from a running script 0123456789\n"
+        chunk_lines = 64 * 1024 // len(line)  # 与管道一次读取的数据量相当
+        chunks = [(line * chunk_lines).encode('utf-8')] * (lines // chunk_lines)
+
+        import PyHub
+        session = PyHub.RunSession(0, None, "benchmark", parent=self.editor)
+
+        def ingest(state):
+            session.process = ChunkSource(chunks)
+            session.stdout_decoder = PyHub.StreamDecoder()
+            for _ in chunks:
+                session.handle_stdout()
+            session.output.flush()
+
+        def reset(state):
+            session.process = None
+            session.output.clear()
+
+        return measure(ingest, self.rounds, teardown=reset)
+
+    # 运行代码直到控制台收到第一段输出：普通运行每次启动新的解释器并导入模块，快速运行交给已导入模块的预热解释器
+    def bench_run_first_output(self, mode):
+        modules = ['asyncio', 'decimal', 'json', 'email.parser']  # 导入较慢的标准库模块，不依赖第三方包
+        self.editor.preferences['fast_run_preload'] = modules
+        self.editor.fast_run_action.setChecked(mode == 'fast')
+        code = ''.join(f"import {module}\n" for module in modules) + "print('first output', flush=True)\n"
+        tab = self.editor.add_new_tab(code)
+        self.editor.tabs.setCurrentWidget(tab)
+        session = self.editor.run_session(tab)
+        outputs = []
+        write = session.output.write
+        session.output.write = lambda text, stream='stdout': (stream == 'stdout' and text and outputs.append(text),
+                                                             write(text, stream))
+
+        def run(state):
+            outputs.clear()
+            self.editor.run_code()
+            wait_until(self.app, lambda: outputs)
+
+        # 等待运行结束，并留出时间让解释器池补充的进程完成预导入
+        def finish(state):
+            wait_until(self.app, lambda: not session.is_active())
+            deadline = time.perf_counter() + 1
+            wait_until(self.app, lambda: time.perf_counter() > deadline)
+        try:
+            finish(None)
+            return measure(run, self.rounds, teardown=finish)
+        finally:
+            self.editor.fast_run_action.setChecked(False)
+            self.editor.close_tab(self.editor.tabs.indexOf(tab))
+
+    def bench_file_browser(self, files):
+        tree = os.path.join(self.fixtures, f"tree_{files}")
+        if not os.path.isdir(tree):
+            make_tree(tree, files)
+        empty = os.path.join(self.fixtures, "empty")
+        os.makedirs(empty, exist_ok=True)
+        browser = self.editor.dock('FileBrowser')
+        index = self.editor.project_index
+
+        def load(state):
+            browser.set_directory(tree)
+            wait_until(self.app, lambda: index.ready and index.root == tree)
+            self.app.processEvents()  # 处理索引完成后填充文件树的信号
+
+        return measure(load, self.rounds, setup=lambda: browser.set_directory(empty),
+                       teardown=lambda state: wait_until(self.app, lambda: index.ready))
+
+    # 逐页滚动资源列表，缩略图在后台生成，滚动不应等待图片解码
+    def bench_resource_scroll(self, images):
+        tree = os.path.join(self.fixtures, f"images_{images}")
+        if not os.path.isdir(tree):
+            make_images(tree, images)
+        manager = self.editor.dock('ResourceManager')
+        index = self.editor.project_index
+        index.set_root(tree)
+        wait_until(self.app, lambda: index.ready and index.root == tree)
+        self.app.processEvents()
+        view = manager.resource_list
+        bar = view.verticalScrollBar()
+
+        def scroll(state):
+            for value in range(0, bar.maximum() + bar.pageStep(), bar.pageStep()):
+                bar.setValue(value)
+                view.viewport().repaint()
+                self.app.processEvents()
+
+        return measure(scroll, self.rounds, setup=lambda: bar.setValue(0))
+
+    # 在快速打开的路径索引中逐个字符输入查询，每次按键都重新查询
+    def bench_quick_open(self, paths):
+        import PyHub
+        index = self.editor.quick_open_index
+        names = [f"pkg_{i // 1000}/sub_{i // 50}/module_{i}.py" for i in range(paths)]
+        index.load(PyHub.build_path_bitmaps(names))
+        query = "sub12mod7"
+
+        def type_query(state):
+            for end in range(1, len(query) + 1):
+                index.search(query[:end], [])
+        try:
+            return measure(type_query, self.rounds)
+        finally:
+            index.rebuild()  # 恢复为项目目录的索引
+
+    def bench_theme_switch(self, tabs=0):
+        text = python_source(300)
+        for _ in range(tabs):
+            self.editor.add_new_tab(text)  # 打开的标签页越多，样式表和词法分析器颜色的更新越慢
+
+        def switch(state):
+            for theme in ("Dark", "Light", "Default"):
+                self.editor.apply_theme(theme)
+                self.app.processEvents()
+        try:
+            return measure(switch, self.rounds)
+        finally:
+            for _ in range(tabs):
+                self.close_current()
+
+    # 在子进程中启动编辑器，测量从启动Python到主窗口显示的时间
+    def bench_startup(self):
+        def start(state):
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--startup-probe'],
+                                     stdout=subprocess.PIPE, cwd=self.fixtures, text=True)
+            child.stdout.readline()
+            child.terminate()
+            child.wait()
+        return measure(start, self.rounds)
+
+    # 在子进程中恢复有多个标签页的会话，测量到主窗口显示的时间
+    # lazy为当前的行为，只加载当前标签页；eager在显示前加载全部标签页，作为对照
+    def bench_session_restore(self, mode, tabs=50, lines=2000):
+        directory = os.path.join(self.fixtures, f"session_{tabs}")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+            text = python_source(lines)
+            records = []
+            for i in range(tabs):
+                path = os.path.join(directory, f"module_{i}.py")
+                with open(path, 'w') as file:
+                    file.write(text)
+                records.append({'path': path, 'line': 0, 'index': 0, 'first_line': 0})
+            with open(os.path.join(directory, 'preferences.json'), 'w', encoding='utf-8') as file:
+                json.dump({'session': {'tabs': records, 'current': 0}}, file)
+        command = [sys.executable, os.path.abspath(__file__), '--startup-probe']
+        if mode == 'eager':
+            command.append('--eager-restore')
+
+        def start(state):
+            child = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=directory, text=True)
+            child.stdout.readline()
+            child.terminate()
+            child.wait()
+        return measure(start, self.rounds)
+
+    # 全部基准测试：名称 -> 运行函数
+    def cases(self):
+        cases = {}
+        for lines in (1000, 10000, 100000):
+            cases[f"add_new_tab[lines={lines}]"] = lambda lines=lines: self.bench_add_new_tab(lines)
+            cases[f"open_file[lines={lines}]"] = lambda lines=lines: self.bench_open_file(lines)
+        cases["open_tabs[tabs=200]"] = lambda: self.bench_open_tabs(200)
+        for megabytes, label in ((100, '100MB'), (1024, '1GB')):
+            cases[f"large_file_open[size={label}]"] = lambda megabytes=megabytes: self.bench_large_file_open(megabytes)
+        for matches in (100, 10000, 100000, 1000000):
+            cases[f"replace_all[matches={matches}]"] = lambda matches=matches: self.bench_replace_all(matches)
+        for lines in (10000, 200000, 1000000):
+            cases[f"console[lines={lines}]"] = lambda lines=lines: self.bench_console(lines)
+        for mode in ('cold', 'fast'):
+            cases[f"run_first_output[mode={mode}]"] = lambda mode=mode: self.bench_run_first_output(mode)
+        for files in (1000, 20000):
+            cases[f"file_browser[files={files}]"] = lambda files=files: self.bench_file_browser(files)
+        cases["resource_scroll[images=10000]"] = lambda: self.bench_resource_scroll(10000)
+        cases["quick_open[paths=200000]"] = lambda: self.bench_quick_open(200000)
+        cases["theme_switch"] = self.bench_theme_switch
+        cases["theme_switch[tabs=100]"] = lambda: self.bench_theme_switch(100)
+        cases["startup"] = self.bench_startup
+        for mode in ('eager', 'lazy'):
+            cases[f"session_restore[tabs=50,mode={mode}]"] = lambda mode=mode: self.bench_session_restore(mode)
+        return cases
+
+
+def summarize(timings):
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'rounds': len(timings),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(only, rounds):
+    # 编辑器的偏好设置、缓存等写到临时目录中，不影响真实的用户数据
+    fixtures = tempfile.mkdtemp(prefix='pyhub-bench-')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['HOME'] = fixtures
+    os.chdir(fixtures)
+    sys.path.insert(0, PACKAGE_DIR)
+    from PyQt5.QtWidgets import QApplication
+    import PyHub
+
+    app = QApplication(sys.argv[:1])
+    editor = PyHub.PythonEditor()
+    editor.show()
+    wait_until(app, lambda: 'FileBrowser' in editor.docks)  # 等待启动时延后创建的停靠窗口
+    suite = BenchmarkSuite(app, editor, fixtures, rounds)
+    results = {}
+    try:
+        for name, case in suite.cases().items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            reset_peak_memory()
+            results[name] = summarize(case())
+            results[name].update(memory_usage())
+            peak = results[name].get('peak_rss_mb')
+            print(f"{name:32} {results[name]['median_ms']:10.2f} ms" +
+                  (f" {peak:10.1f} MB peak" if peak is not None else ""), flush=True)
+    finally:
+        editor.close()
+        shutil.rmtree(fixtures, ignore_errors=True)
+    return results
+
+
+def load_history(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(history, file, indent=4)
+
+
+# 合并历史记录，每个测试取最近一次的结果，只运行部分测试时也能与之前的结果比较
+def latest_results(history):
+    results = {}
+    for run in reversed(history):
+        for name, result in run['results'].items():
+            results.setdefault(name, result)
+    return {'results': results}
+
+
+# 比较两次运行的中位数，返回变慢超过阈值的测试名称
+def compare(baseline, current, threshold):
+    regressions = []
+    print(f"\n{'benchmark':32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:32} {'-':>10} {result['median_ms']:10.2f}      new")
+            continue
+        old, new = base['median_ms'], result['median_ms']
+        change = (new - old) / old if old else 0.0
+        regressed = change > threshold and new - old > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:32} {old:10.2f} {new:10.2f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+# 子进程模式：启动编辑器，窗口显示后输出一行，供bench_startup计时，eager时在显示前加载会话中的全部标签页
+def startup_probe(eager=False):
+    sys.path.insert(0, PACKAGE_DIR)
+    from PyQt5.QtWidgets import QApplication
+    import PyHub
+    app = QApplication(sys.argv[:1])
+    editor = PyHub.PythonEditor()
+    if eager:
+        for index in range(editor.tabs.count()):
+            editor.materialize_tab(index)
+    editor.show()
+    app.processEvents()
+    print("ready", flush=True)
+    app.exec_()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PyHub hot paths.")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSON file with previous results")
+    parser.add_argument('--rounds', type=int, default=5, help="timed rounds per benchmark")
+    parser.add_argument('--only', nargs='*', default=[], help="run only benchmarks starting with these names")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown, 0.2 means 20%%")
+    parser.add_argument('--baseline', type=int, help="history entry to compare against "
+                                                      "(default: latest earlier result of each benchmark)")
+    parser.add_argument('--compare', nargs=2, type=int, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two history entries without running")
+    parser.add_argument('--no-save', action='store_true', help="do not append this run to the history")
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--eager-restore', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_probe:
+        startup_probe(args.eager_restore)
+        return 0
+
+    history = load_history(args.history)
+    if args.compare:
+        baseline, current = (history[i] for i in args.compare)
+    else:
+        current = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': current_commit(),
+            'python': sys.version.split()[0],
+            'results': run_benchmarks(args.only, args.rounds),
+        }
+        if args.baseline is not None:
+            baseline = history[args.baseline]
+        else:
+            baseline = latest_results(history)
+        if not args.no_save:
+            history.append(current)
+            save_history(args.history, history)
+    if not baseline or not baseline['results']:
+        print("\nNo previous run to compare with.")
+        return 0
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +0,0 @@
-print("1")
\ No newline at end of file
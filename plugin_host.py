@@ -0,0 +1,150 @@
+# 插件宿主进程，由 PyHub 在第一次注入插件时启动，之后一直运行
+# 插件作为模块加载并常驻内存，可以在多次调用之间保存状态
+# 与编辑器之间通过标准输入输出通信，每条消息为 4 字节大端长度 + UTF-8 编码的 JSON
+import os
+import sys
+import json
+import time
+import types
+import struct
+import builtins
+import linecache
+import traceback
+
+HEADER = struct.Struct('>I')  # 消息长度
+
+
+# 消息通道，使用复制出来的标准输出文件描述符，插件的输出不会混入通道
+class Channel:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    # 读取一条消息，编辑器关闭管道时返回None
+    def receive(self):
+        header = self.reader.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        payload = self.reader.read(HEADER.unpack(header)[0])
+        return json.loads(payload.decode('utf-8'))
+
+    def send(self, message):
+        payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        self.writer.write(HEADER.pack(len(payload)) + payload)
+        self.writer.flush()
+
+
+# 插件的print等输出通过通道发送给编辑器，显示在控制台中
+class ChannelWriter:
+    def __init__(self, channel, stream):
+        self.channel = channel
+        self.stream = stream
+        self.request_id = None  # 当前正在执行的请求
+
+    def write(self, text):
+        if text:
+            self.channel.send({'id': self.request_id, 'event': 'output', 'stream': self.stream, 'text': text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class PluginHost:
+    def __init__(self, channel):
+        self.channel = channel
+        self.plugins = {}  # {插件名: {'module', 'source', 'failed', 'load_ms', 'loads'}}
+        self.stdout = ChannelWriter(channel, 'stdout')
+        self.stderr = ChannelWriter(channel, 'stderr')
+
+    # 在新的模块中执行插件代码，同名插件已加载时先调用其 teardown() 再替换
+    def load(self, name, code, source):
+        self.unload(name)
+        module_name = f"pyhub_plugins.{name}"
+        filename = source or f"<plugin {name}>"
+        # 代码不落盘，登记到linecache中，使错误信息中能显示出错的源代码行
+        linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+        module = types.ModuleType(module_name)
+        module.__file__ = filename
+        module.__builtins__ = builtins
+        record = self.plugins.get(name, {'loads': 0})
+        sys.modules[module_name] = module
+        started = time.perf_counter()
+        record.update(module=module, source=source, failed=True)
+        record['loads'] += 1
+        self.plugins[name] = record
+        try:
+            exec(compile(code, filename, 'exec'), module.__dict__)
+            record['failed'] = False
+        finally:
+            record['load_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return record['load_ms']
+
+    # 卸载插件，插件可以定义 teardown() 释放自己占用的资源
+    def unload(self, name):
+        record = self.plugins.get(name)
+        if record is None or record.get('module') is None:
+            return
+        module = record.pop('module')
+        sys.modules.pop(module.__name__, None)
+        teardown = getattr(module, 'teardown', None)
+        if callable(teardown):
+            teardown()
+
+    def describe(self):
+        return [{'name': name, 'source': record['source'], 'load_ms': record['load_ms'],
+                 'loads': record['loads'], 'loaded': record.get('module') is not None and not record['failed']}
+                for name, record in self.plugins.items()]
+
+    # 处理一条请求，执行结果和耗时通过done消息返回
+    def handle(self, message):
+        request_id = message.get('id')
+        command = message.get('cmd')
+        name = message.get('name')
+        self.stdout.request_id = self.stderr.request_id = request_id
+        reply = {'id': request_id, 'event': 'done', 'cmd': command, 'name': name, 'ok': True}
+        try:
+            if command == 'load':
+                reply['elapsed_ms'] = self.load(name, message['code'], message.get('source'))
+            elif command == 'unload':
+                self.unload(name)
+            elif command == 'list':
+                reply['plugins'] = self.describe()
+            else:
+                raise ValueError(f"Unknown command: {command}")
+        except SystemExit:
+            reply['ok'] = False
+            reply['error'] = "Plugin called exit()"
+        except BaseException:
+            # 去掉宿主进程自身的栈帧，只显示插件代码的错误信息
+            exc_type, exc_value, tb = sys.exc_info()
+            while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+                tb = tb.tb_next
+            reply['ok'] = False
+            reply['error'] = ''.join(traceback.format_exception(exc_type, exc_value, tb))
+        self.channel.send(reply)
+
+    def serve(self):
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        while True:
+            message = self.channel.receive()
+            if message is None:
+                break
+            self.handle(message)
+        for name in list(self.plugins):
+            try:
+                self.unload(name)
+            except BaseException:
+                pass
+
+
+if __name__ == "__main__":
+    # 复制一份标准输出作为消息通道，再把文件描述符1指向标准错误，
+    # 这样插件启动的子进程等直接写文件描述符的输出也不会破坏消息通道
+    channel_out = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    sys.stdin = open(os.devnull, 'r')  # 插件不能从标准输入读取，标准输入是消息通道
+    PluginHost(Channel(sys.__stdin__.buffer, channel_out)).serve()
@@ -0,0 +1,116 @@
+# 预热解释器工作进程，由 PyHub 的快速运行模式启动
+# 启动后先导入常用模块，然后阻塞等待编辑器通过标准输入发送一行JSON编码的脚本名和代码，运行一次后退出
+# 性能分析模式下也使用该脚本：python run_worker.py <预导入模块> <脚本名> profile|memory <结果文件>
+# 普通运行时代码保存在临时文件中，标准输入留给用户代码：python run_worker.py '' <脚本名> file <临时文件>
+import os
+import sys
+import json
+import builtins
+import linecache
+import traceback
+
+PROFILE_LIMIT = 300  # 性能分析结果最多保留的函数数，按累计耗时排序
+MEMORY_LIMIT = 100  # 内存跟踪结果最多保留的分配位置数，按分配大小排序
+
+
+# 预先导入模块，导入失败的模块直接跳过
+def preload_modules(names):
+    for name in names:
+        if not name:
+            continue
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+
+# 在干净的命名空间中运行代码，finish在代码运行结束后、命名空间释放之前调用
+def run(code, script_name, finish=None):
+    sys.argv = [script_name]
+    # 已保存的文件在其所在目录中运行，与直接运行 python 文件路径 一致；新建文件在当前目录中运行
+    if os.path.isabs(script_name):
+        os.chdir(os.path.dirname(script_name))
+    sys.path[0] = os.getcwd()
+    # 代码不落盘，登记到linecache中，使错误信息中能显示出错的源代码行
+    linecache.cache[script_name] = (len(code), None, code.splitlines(True), script_name)
+    namespace = {'__name__': '__main__', '__file__': script_name, '__builtins__': builtins}
+    try:
+        exec(compile(code, script_name, 'exec'), namespace)
+    except SystemExit:
+        raise
+    except BaseException:
+        # 去掉工作进程自身的栈帧，只显示用户代码的错误信息
+        exc_type, exc_value, tb = sys.exc_info()
+        traceback.print_exception(exc_type, exc_value, tb.tb_next)
+        sys.exit(1)
+    finally:
+        if finish is not None:
+            finish()
+
+
+# 使用cProfile运行代码，把按累计耗时排序的函数统计写入结果文件
+def run_profiled(code, script_name, stats_path):
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+
+    def finish():
+        profiler.disable()
+        stats = pstats.Stats(profiler).stats
+        functions = []
+        for (file_name, line, function), (primitive, calls, own, cumulative, callers) in stats.items():
+            if file_name == __file__:
+                continue  # 工作进程自身的函数
+            functions.append({'file': file_name, 'line': line, 'function': function, 'calls': calls,
+                              'primitive_calls': primitive, 'own': own, 'cumulative': cumulative})
+        functions.sort(key=lambda entry: entry['cumulative'], reverse=True)
+        total = sum(entry['own'] for entry in functions)
+        write_stats(stats_path, {'mode': 'profile', 'total': total, 'entries': functions[:PROFILE_LIMIT]})
+
+    profiler.enable()
+    run(code, script_name, finish)
+
+
+# 使用tracemalloc运行代码，把仍未释放的内存按分配位置汇总写入结果文件
+def run_traced(code, script_name, stats_path):
+    import tracemalloc
+
+    def finish():
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        tracemalloc.stop()
+        sites = [{'file': stat.traceback[0].filename, 'line': stat.traceback[0].lineno,
+                  'size': stat.size, 'count': stat.count}
+                 for stat in snapshot.statistics('lineno')[:MEMORY_LIMIT]]
+        write_stats(stats_path, {'mode': 'memory', 'current': current, 'peak': peak, 'entries': sites})
+
+    tracemalloc.start()
+    run(code, script_name, finish)
+
+
+def write_stats(stats_path, stats):
+    with open(stats_path, 'w', encoding='utf-8') as file:
+        json.dump(stats, file)
+
+
+if __name__ == "__main__":
+    preload_modules(sys.argv[1].split(',') if len(sys.argv) > 1 else [])
+    mode = sys.argv[3] if len(sys.argv) > 4 else None
+    if len(sys.argv) > 2:
+        script_name = sys.argv[2]
+    else:
+        script_name = json.loads(sys.stdin.buffer.readline())  # 预热进程：脚本名在代码之前的第一行
+    if mode == 'file':
+        with open(sys.argv[4], 'rb') as file:
+            source = file.read().decode('utf-8')
+    else:
+        source = sys.stdin.buffer.read().decode('utf-8')  # 读取到EOF为止，即编辑器发送的全部代码
+    if mode == 'profile':
+        run_profiled(source, script_name, sys.argv[4])
+    elif mode == 'memory':
+        run_traced(source, script_name, sys.argv[4])
+    else:
+        run(source, script_name)
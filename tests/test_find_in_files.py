@@ -0,0 +1,24 @@
+import pytest
+
+import PyHub
+
+
+# 替换的匹配必须与搜索结果一致，包括非ASCII字符旁的全词匹配和忽略大小写
+@pytest.mark.parametrize('options', [
+    ('foo', False, True, False),
+    ('foo', False, False, True),
+    ('é', False, False, False),
+    (r'f(o+)', True, False, False),
+])
+def test_replace_matches_search_results(tmp_path, options):
+    path = tmp_path / 'sample.py'
+    path.write_bytes('foo = 1\nÉfoo = FOO\nname = "é É"\nfoofoo\n'.encode('utf-8'))
+    [(_, matches)] = PyHub.search_files([str(path)], *options)
+    assert PyHub.replace_in_file(str(path), options[0], 'x', *options[1:]) == len(matches)
+
+
+def test_replace_in_file_expands_groups(tmp_path):
+    path = tmp_path / 'sample.py'
+    path.write_bytes(b'value_1 = value_2\n')
+    assert PyHub.replace_in_file(str(path), r'value_(\d)', r'item_\1', True, False, True) == 2
+    assert path.read_bytes() == b'item_1 = item_2\n'
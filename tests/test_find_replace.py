@@ -0,0 +1,42 @@
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtWidgets import QApplication
+
+import PyHub
+
+app = QApplication.instance() or QApplication([])
+
+
+def make_dialog(text, find_str, replace_str, regex=False):
+    editor = QsciScintilla()
+    editor.setUtf8(True)
+    editor.setText(text)
+    editor.setCursorPosition(0, 0)
+    dialog = PyHub.FindReplaceDialog(editor)
+    dialog.find_input.setText(find_str)
+    dialog.replace_input.setText(replace_str)
+    dialog.regex_checkbox.setChecked(regex)
+    return editor, dialog
+
+
+# 查找、替换和全部替换使用同一套匹配规则，包括QScintilla正则不支持的前后断言
+def test_find_and_replace_share_match_semantics(monkeypatch):
+    messages = []
+    monkeypatch.setattr(PyHub.QMessageBox, 'information', lambda *args: messages.append(args[2]))
+    text = 'é = 1\nvalue_1 = 2\nitem_2 = value_3\n'
+    editor, dialog = make_dialog(text, r'(?<=value_)\d', 'N', regex=True)
+    dialog.find_text()
+    assert editor.selectedText() == '1'
+    dialog.replace_text()  # 替换选中的匹配并选中下一个
+    assert editor.selectedText() == '3'
+    dialog.replace_text()  # 没有更多的匹配
+    assert messages == [r"'(?<=value_)\d' not found."]
+    assert editor.text() == dialog.create_engine().run(text).new_text == 'é = 1\nvalue_N = 2\nitem_2 = value_N\n'
+
+
+def test_replace_refuses_selection_that_is_not_a_match():
+    editor, dialog = make_dialog('ab ab\n', r'(?<=a)b', 'X', regex=True)
+    editor.setSelection(0, 3, 0, 4)  # 第二个 "a"，不是匹配
+    dialog.replace_text()  # 没有更多的匹配
+    assert messages == [r"'(?<=value_)\d' not found."]
+    assert editor.text() == 'ab ab\n'
+    assert editor.getSelection() == (0, 4, 0, 5)  # 跳到下一个匹配
@@ -0,0 +1,18 @@
+import pytest
+
+import PyHub
+
+
+def test_syntax_error_column_is_in_characters():
+    [(line, column, severity, _)] = PyHub.lint_source("name = '日本語' +\n", 'sample.py')
+    assert (line, severity) == (1, 'error')
+    assert column == len("name = '日本語' +")
+
+
+# pyflakes报告的是UTF-8字节偏移，前面有非ASCII字符时必须转换为字符偏移
+def test_warning_column_after_non_ascii_text():
+    pytest.importorskip('pyflakes')
+    source = "text = '日本語🐍'; undefined_name\n"
+    [(line, column, severity, message)] = PyHub.lint_source(source, 'sample.py')
+    assert (line, severity) == (1, 'warning')
+    assert source[column:].startswith('undefined_name')
@@ -0,0 +1,88 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+import PyHub
+
+PLUGIN_CODE = "def register(editor):\n    editor.statusBar().showMessage('插件')\n"
+
+
+# 本地插件服务器：带ETag返回插件代码，If-None-Match匹配时返回304，记录收到的请求
+class PluginHandler(http.server.BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path != '/plugin.py':
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PLUGIN_CODE.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/x-python; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    PluginHandler.requests_seen = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PluginHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('USERPROFILE', str(tmp_path))
+    fetcher = PyHub.PluginFetcher(timeout=2)
+    yield fetcher
+    if fetcher.session is not None:
+        fetcher.session.close()
+
+
+def url_of(server, path='/plugin.py'):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_first_fetch_downloads_and_caches(server, fetcher):
+    assert fetcher.download(url_of(server)) == (PLUGIN_CODE, 'network')
+    assert PluginHandler.requests_seen == [('/plugin.py', None)]
+    assert fetcher.index[url_of(server)]['etag'] == '"v1"'
+
+
+def test_revalidation_uses_cache_on_304(server, fetcher):
+    fetcher.download(url_of(server))
+    assert fetcher.download(url_of(server)) == (PLUGIN_CODE, 'cache')
+    assert PluginHandler.requests_seen[-1] == ('/plugin.py', '"v1"')
+
+
+# 缓存索引保存在磁盘上，新的下载器也能在服务器无法访问时使用缓存
+def test_offline_uses_cached_copy(server, fetcher):
+    url = url_of(server)
+    fetcher.download(url)
+    server.shutdown()
+    server.server_close()
+    assert PyHub.PluginFetcher(timeout=2).download(url) == (PLUGIN_CODE, 'offline')
+
+
+def test_offline_without_cache_fails(server, fetcher):
+    url = url_of(server)
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        fetcher.download(url)
@@ -0,0 +1,62 @@
+import time
+
+from PyQt5.QtWidgets import QApplication
+
+import PyHub
+
+app = QApplication.instance() or QApplication([])
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def make_index(root, max_files, max_file_bytes=1024):
+    index = PyHub.ProjectIndex(max_files, max_file_bytes)
+    index.set_root(str(root))
+    wait_until(lambda: index.ready)
+    return index
+
+
+def test_large_files_are_not_indexed(tmp_path):
+    (tmp_path / 'small.py').write_bytes(b'x' * 1024)
+    (tmp_path / 'large.bin').write_bytes(b'x' * 1025)
+    index = make_index(tmp_path, 100)
+    assert [path for path, _, _ in index.files()] == ['small.py']
+
+
+# 同时进行的多个增量扫描合并后，索引中的文件总数仍不超过上限
+def test_incremental_updates_respect_global_file_cap(tmp_path):
+    for name in 'ab':
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'existing.py').write_text('')
+    index = make_index(tmp_path, 5)
+    assert index.file_count() == 2
+    for name in 'ab':
+        for i in range(3):
+            (tmp_path / name / f'new_{i}.py').write_text('')
+        index.pending_updates.add(name)
+        index.apply_pending_updates()
+    wait_until(lambda: not index.update_threads)
+    assert index.file_count() == 5
+    assert {'a/existing.py', 'b/existing.py'} <= {path for path, _, _ in index.files()}
+
+
+# 文件浏览器返回上一级目录只是浏览，共享的项目索引仍然指向项目目录
+def test_browsing_up_keeps_the_project_root(tmp_path):
+    project = tmp_path / 'project'
+    project.mkdir()
+    (project / 'main.py').write_text('')
+    (tmp_path / 'notes.txt').write_text('')
+    index = make_index(project, 100)
+    browser = PyHub.FileBrowser(None, index, str(project))
+    browser.go_up_directory()
+    assert index.root == str(project) and index.scan_thread is None
+    root = browser.file_tree.invisibleRootItem()
+    assert [root.child(i).text(0) for i in range(root.childCount())] == ['project', 'notes.txt']
+    browser.load_children(root.child(0))
+    assert root.child(0).child(0).rel_path == str(project / 'main.py')
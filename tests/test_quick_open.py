@@ -0,0 +1,48 @@
+import os
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import PyHub
+
+
+class FakeProjectIndex(QObject):
+    indexed = pyqtSignal()
+    updated = pyqtSignal(object, object, object)
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+
+
+def make_index(paths, root='/proj'):
+    index = PyHub.QuickOpenIndex(FakeProjectIndex(root))
+    index.load(PyHub.build_path_bitmaps(paths))
+    return index
+
+
+# 大量路径包含查询的全部字符但顺序不符时，不能挤掉真正匹配的路径
+def test_rejected_candidates_do_not_count_against_cap():
+    paths = [f"tests/viewing/web_site_{i}.py" for i in range(5000)]
+    paths.append("src/app/controllers/user_settings_view.py")
+    index = make_index(paths)
+    assert index.search('settingsview', []) == ["src/app/controllers/user_settings_view.py"]
+
+
+# 逐个字符输入时复用上一次的结果，结果必须与重新查询相同
+def test_incremental_search_matches_fresh_search():
+    paths = [f"pkg_{i % 7}/module_{i}/view_{i % 13}.py" for i in range(6000)]
+    index = make_index(paths)
+    query = 'pkg3view12'
+    for end in range(1, len(query) + 1):
+        typed = index.search(query[:end], [])
+        index.last_search = None
+        assert typed == index.search(query[:end], [])
+
+
+def test_recent_files_outside_root_are_ignored(monkeypatch):
+    index = make_index(["src/main.py", "src/util.py"])
+
+    def relpath(path, start):
+        raise ValueError("path is on mount 'D:', start on mount 'C:'")
+    monkeypatch.setattr(os.path, 'relpath', relpath)
+    assert index.search('main', ['D:/other/main.py']) == ["src/main.py"]
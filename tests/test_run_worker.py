@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+import PyHub
+
+
+# 快速运行的预热进程从标准输入的第一行得到脚本名，与普通运行一样在源文件所在目录中运行
+def test_warm_worker_runs_as_the_script(tmp_path):
+    script = str(tmp_path / 'script.py')
+    code = 'import os, sys\nprint(__file__)\nprint(os.getcwd())\nprint(sys.path[0])\n'
+    result = subprocess.run([sys.executable, PyHub.WarmInterpreterPool.WORKER_SCRIPT, ''],
+                            input=(json.dumps(script) + '\n' + code).encode('utf-8'),
+                            capture_output=True, cwd=os.path.dirname(PyHub.__file__), timeout=30)
+    assert result.stdout.decode('utf-8').splitlines() == [script, str(tmp_path), str(tmp_path)]
+
+
+def test_warm_worker_traceback_names_the_script(tmp_path):
+    script = str(tmp_path / 'script.py')
+    result = subprocess.run([sys.executable, PyHub.WarmInterpreterPool.WORKER_SCRIPT, ''],
+                            input=(json.dumps(script) + '\n1 / 0\n').encode('utf-8'),
+                            capture_output=True, timeout=30)
+    assert result.returncode == 1
+    assert f'File "{script}", line 1' in result.stderr.decode('utf-8')
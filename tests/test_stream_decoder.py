@@ -0,0 +1,36 @@
+import random
+
+from PyQt5.QtCore import QByteArray
+
+import PyHub
+
+TEXT = "输出 output 日本語テキスト 🐍🎉 emoji 한국어\n" * 50 + "👨‍👩‍👧 末尾"
+
+
+# 多字节字符被任意拆分到不同的数据块中，解码结果必须与原文完全相同
+def test_random_splits_round_trip():
+    data = TEXT.encode('utf-8')
+    rng = random.Random(4)
+    for _ in range(200):
+        decoder = PyHub.StreamDecoder()
+        pieces = []
+        position = 0
+        while position < len(data):
+            size = rng.randint(1, 9)
+            pieces.append(decoder.feed(data[position:position + size]))
+            position += size
+        pieces.append(decoder.flush())
+        assert ''.join(pieces) == TEXT
+
+
+def test_accepts_qbytearray():
+    decoder = PyHub.StreamDecoder()
+    data = "🐍".encode('utf-8')
+    assert decoder.feed(QByteArray(data[:3])) == ''
+    assert decoder.feed(QByteArray(data[3:])) == "🐍"
+
+
+def test_flush_replaces_truncated_character():
+    decoder = PyHub.StreamDecoder()
+    assert decoder.feed("ok🐍".encode('utf-8')[:4]) == 'ok'
+    assert decoder.flush() == '�'
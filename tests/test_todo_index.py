@@ -0,0 +1,13 @@
+import os
+
+import PyHub
+
+
+def test_relative_path_on_other_drive(monkeypatch):
+    index = PyHub.TodoIndex.__new__(PyHub.TodoIndex)
+    index.root = 'C:/project'
+
+    def relpath(path, start):
+        raise ValueError("path is on mount 'D:', start on mount 'C:'")
+    monkeypatch.setattr(os.path, 'relpath', relpath)
+    assert index.relative_path('D:/notes/todo.py') is None